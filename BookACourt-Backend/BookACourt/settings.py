@@ -112,6 +112,32 @@ DATABASES = {
     }
 }
 
+if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    # sql_mode is MySQL only. Tests get a file database: threads sharing
+    # an in-memory one fail concurrent writers instead of making them wait
+    DATABASES['default']['OPTIONS'] = {'timeout': 30}
+    DATABASES['default']['TEST'] = {'NAME': BASE_DIR / 'test_db.sqlite3'}
+
+
+# Cache
+# Local memory by default. Processes do not share it, so multi-process
+# deployments should point cache_backend/cache_location at a shared cache,
+# e.g. django.core.cache.backends.redis.RedisCache and redis://host:6379/1
+CACHE_BACKEND = os.environ.get(
+    'cache_backend', 'django.core.cache.backends.locmem.LocMemCache')
+
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': os.environ.get('cache_location', 'bookacourt'),
+        'KEY_PREFIX': 'bookacourt',
+    }
+}
+
+if CACHE_BACKEND.endswith('LocMemCache'):
+    # The default of 300 entries is far too few for per court/day bitmaps
+    CACHES['default']['OPTIONS'] = {'MAX_ENTRIES': 10000}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -249,6 +275,17 @@ SPECTACULAR_SETTINGS = {
     'COMPONENT_SPLIT_REQUEST': True,
 }
 
+# Booking Settings
+# How long a slot hold reserves a court while the player checks out
+SLOT_HOLD_TTL_MINUTES = int(os.environ.get('SLOT_HOLD_TTL_MINUTES', 10))
+# Unexpired holds a player may have at once, across all courts
+SLOT_HOLD_MAX_ACTIVE = int(os.environ.get('SLOT_HOLD_MAX_ACTIVE', 3))
+
+# Court Search Settings
+# 'auto' uses MySQL FULLTEXT when available and an in-process index
+# otherwise; a dotted path selects a specific backend class
+COURT_SEARCH_BACKEND = os.environ.get('COURT_SEARCH_BACKEND', 'auto')
+
 # Phone Number Field Settings
 PHONENUMBER_DEFAULT_REGION = 'NP'  # Nepal
 PHONENUMBER_DB_FORMAT = 'INTERNATIONAL'
@@ -0,0 +1,85 @@
+"""
+Fixtures shared by the app test suites.
+
+Each helper creates one row with the fields every test needs and takes
+keyword overrides for the rest, so a test only spells out what it is about.
+"""
+from datetime import time, timedelta
+
+from django.utils import timezone
+
+from user_management.models import User, UserRole
+
+
+def future_date(days=3):
+    """A local date far enough ahead to be bookable"""
+    return timezone.localdate() + timedelta(days=days)
+
+
+def make_owner(**overrides):
+    fields = {
+        'phone_number': '+9779800000001',
+        'full_name': 'Owner',
+        'role': UserRole.COURT_OWNER,
+    }
+    fields.update(overrides)
+    return User.objects.create(**fields)
+
+
+def make_player(index=0, **overrides):
+    fields = {
+        'phone_number': f'+97798100{index:05d}',
+        'full_name': f'Player {index}',
+        'role': UserRole.PLAYER,
+    }
+    fields.update(overrides)
+    return User.objects.create(**fields)
+
+
+def make_players(count, start=0):
+    return User.objects.bulk_create([
+        User(
+            phone_number=f'+97798100{index:05d}',
+            full_name=f'Player {index}',
+            role=UserRole.PLAYER
+        )
+        for index in range(start, start + count)
+    ])
+
+
+def make_court(owner, **overrides):
+    from court_management.models import Court
+
+    fields = {
+        'name': 'Court',
+        'address': 'Street 1',
+        'city': 'Kathmandu',
+        'court_type': 'Tennis',
+        'base_hourly_rate': 100,
+        'opening_time': time(6),
+        'closing_time': time(22),
+        'phone_number': '1',
+    }
+    fields.update(overrides)
+    return Court.objects.create(owner=owner, **fields)
+
+
+def make_booking(court, player, booking_date=None, start_time=time(10),
+                 end_time=time(11), **overrides):
+    from booking_management.models import Booking
+
+    fields = {
+        'status': 'CONFIRMED',
+        'base_amount': 100,
+        'total_amount': 100,
+        'booking_reference': Booking.generate_reference(),
+    }
+    fields.update(overrides)
+    return Booking.objects.create(
+        court=court,
+        player=player,
+        booking_date=booking_date or future_date(),
+        start_time=start_time,
+        end_time=end_time,
+        **fields
+    )
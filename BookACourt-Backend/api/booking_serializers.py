@@ -1,15 +1,41 @@
 from rest_framework import serializers
 from booking_management.models import (
-    Booking, CancellationPolicy, BookingNotification,
+    Booking, CourtDayLock, SlotHold, CancellationPolicy, BookingNotification,
     EquipmentRental, MatchEvent, MatchParticipant,
     PlayerRating, BookingShare, RecurringBooking
 )
-from court_management.models import Court
+from court_management.models import Court, CourtBlockedSlot
+from court_management.occupancy import (
+    invalidate_day_occupancy, slot_conflict
+)
+from court_management.pricing import quote_price
+from user_management.models import User
+from django.conf import settings
+from django.db import transaction
 from django.utils import timezone
 from datetime import timedelta
 from decimal import Decimal
 
 
+def slot_is_taken(court, booking_date, start_time, end_time):
+    """
+    Authoritative overlap check against bookings, blocked slots and live
+    holds. Call it while holding the CourtDayLock for the court/day.
+    """
+    return (
+        Booking.overlapping(
+            court, booking_date, start_time, end_time).exists() or
+        CourtBlockedSlot.objects.filter(
+            court=court,
+            blocked_date=booking_date,
+            start_time__lt=end_time,
+            end_time__gt=start_time
+        ).exists() or
+        SlotHold.overlapping(
+            court, booking_date, start_time, end_time).exists()
+    )
+
+
 class BookingSerializer(serializers.ModelSerializer):
     """Serializer for bookings"""
     court_name = serializers.CharField(source='court.name', read_only=True)
@@ -43,13 +69,17 @@ class BookingCreateSerializer(serializers.ModelSerializer):
     total_amount = serializers.DecimalField(
         max_digits=10, decimal_places=2, required=False, allow_null=True
     )
+    hold_token = serializers.CharField(
+        write_only=True, required=False, allow_blank=True
+    )
 
     class Meta:
         model = Booking
         fields = [
             'court', 'booking_date', 'start_time', 'end_time',
             'payment_method', 'notes', 'special_requests',
-            'loyalty_points_used', 'base_amount', 'total_amount'
+            'loyalty_points_used', 'base_amount', 'total_amount',
+            'hold_token'
         ]
 
     def validate(self, data):
@@ -79,19 +109,35 @@ class BookingCreateSerializer(serializers.ModelSerializer):
                 f"Court operates from {court.opening_time} to {court.closing_time}"
             )
 
-        # Check for conflicts
-        conflicts = Booking.objects.filter(
-            court=court,
-            booking_date=booking_date,
-            status__in=['PENDING', 'CONFIRMED']
-        ).filter(
-            start_time__lt=end_time,
-            end_time__gt=start_time
-        )
-
-        if conflicts.exists():
+        # A live hold already reserves the slot for this player
+        hold_token = data.pop('hold_token', None)
+        if hold_token:
+            request = self.context.get('request')
+            hold = SlotHold.objects.filter(
+                hold_token=hold_token,
+                player=request.user
+            ).first()
+            if not hold or not hold.is_active():
+                raise serializers.ValidationError(
+                    "Your hold on this slot has expired")
+            if (hold.court_id, hold.hold_date, hold.start_time, hold.end_time) != (
+                    court.id, booking_date, start_time, end_time):
+                raise serializers.ValidationError(
+                    "Booking does not match the held slot")
+            data['hold'] = hold
+            return data
+
+        # Early rejection, mostly from the occupancy bitmap; the
+        # authoritative check runs under the court/day lock in create()
+        conflict = slot_conflict(court.id, booking_date, start_time, end_time)
+        if conflict == 'blocked':
+            raise serializers.ValidationError("This time slot is blocked")
+        if conflict == 'booked':
             raise serializers.ValidationError(
                 "This time slot is already booked")
+        if conflict == 'held':
+            raise serializers.ValidationError(
+                "This time slot is temporarily held by another player")
 
         return data
 
@@ -102,19 +148,13 @@ class BookingCreateSerializer(serializers.ModelSerializer):
         start_time = validated_data['start_time']
         end_time = validated_data['end_time']
 
-        # Calculate hours
-        duration = (
-            timezone.datetime.combine(timezone.datetime.today(), end_time) -
-            timezone.datetime.combine(timezone.datetime.today(), start_time)
-        )
-        hours = Decimal(str(duration.total_seconds() / 3600))
-
         # Use provided base_amount or calculate it
         if 'base_amount' in validated_data and validated_data['base_amount']:
             base_amount = validated_data['base_amount']
         else:
-            # Calculate base amount with proper Decimal handling
-            base_amount = court.base_hourly_rate * hours
+            # Price the slot against the court's dynamic pricing rules
+            base_amount = quote_price(
+                court, validated_data['booking_date'], start_time, end_time)
 
         # Apply loyalty points
         loyalty_points_used = validated_data.get('loyalty_points_used', 0)
@@ -131,21 +171,132 @@ class BookingCreateSerializer(serializers.ModelSerializer):
         # as we'll set them explicitly
         validated_data.pop('base_amount', None)
         validated_data.pop('total_amount', None)
-
-        # Create booking
-        booking = Booking.objects.create(
-            player=request.user,
-            base_amount=base_amount,
-            discount_amount=discount_amount,
-            total_amount=total_amount,
-            payment_status='PENDING',
-            created_by=request.user,
-            **validated_data
-        )
+        hold = validated_data.pop('hold', None)
+        booking_date = validated_data['booking_date']
+
+        # Serialize writes for this court/day so that two overlapping
+        # requests cannot both pass the conflict check
+        with transaction.atomic():
+            CourtDayLock.acquire(court, booking_date)
+
+            if hold:
+                # The hold guaranteed the slot; converting it only needs
+                # to confirm it has not expired in the meantime
+                converted, _ = SlotHold.objects.filter(
+                    pk=hold.pk, expires_at__gt=timezone.now()
+                ).delete()
+                if not converted:
+                    raise serializers.ValidationError({
+                        'non_field_errors': ["Your hold on this slot has expired"]
+                    })
+                invalidate_day_occupancy(court.id, booking_date)
+            elif slot_is_taken(court, booking_date, start_time, end_time):
+                raise serializers.ValidationError({
+                    'non_field_errors': ["This time slot is already booked"]
+                })
+
+            # Create booking
+            booking = Booking.objects.create(
+                player=request.user,
+                base_amount=base_amount,
+                discount_amount=discount_amount,
+                total_amount=total_amount,
+                payment_status='PENDING',
+                created_by=request.user,
+                **validated_data
+            )
 
         return booking
 
 
+class SlotHoldSerializer(serializers.ModelSerializer):
+    """Serializer for slot holds"""
+    court_name = serializers.CharField(source='court.name', read_only=True)
+
+    class Meta:
+        model = SlotHold
+        fields = [
+            'id', 'court', 'court_name', 'hold_date', 'start_time',
+            'end_time', 'hold_token', 'expires_at', 'created_at'
+        ]
+        read_only_fields = fields
+
+
+class SlotHoldCreateSerializer(serializers.ModelSerializer):
+    """Serializer for placing a hold on a slot before checkout"""
+
+    class Meta:
+        model = SlotHold
+        fields = ['court', 'hold_date', 'start_time', 'end_time']
+
+    def validate(self, data):
+        """Validate hold"""
+        court = data.get('court')
+        hold_date = data.get('hold_date')
+        start_time = data.get('start_time')
+        end_time = data.get('end_time')
+
+        if not court.is_active:
+            raise serializers.ValidationError(
+                "This court is not available for booking")
+
+        if hold_date < timezone.now().date():
+            raise serializers.ValidationError("Cannot hold past dates")
+
+        if start_time >= end_time:
+            raise serializers.ValidationError(
+                "End time must be after start time")
+
+        if start_time < court.opening_time or end_time > court.closing_time:
+            raise serializers.ValidationError(
+                f"Court operates from {court.opening_time} to {court.closing_time}"
+            )
+
+        if slot_conflict(court.id, hold_date, start_time, end_time):
+            raise serializers.ValidationError(
+                "This time slot is not available")
+
+        self.check_hold_limit(self.context['request'].user)
+        return data
+
+    def check_hold_limit(self, player):
+        """Refuse a hold beyond the player's SLOT_HOLD_MAX_ACTIVE"""
+        limit = settings.SLOT_HOLD_MAX_ACTIVE
+        if SlotHold.objects.filter(
+                player=player, expires_at__gt=timezone.now()).count() >= limit:
+            raise serializers.ValidationError({'non_field_errors': [
+                f"You can hold at most {limit} slots at a time"
+            ]})
+
+    def create(self, validated_data):
+        """Create hold under the player's row lock and the court/day lock"""
+        request = self.context.get('request')
+        court = validated_data['court']
+        hold_date = validated_data['hold_date']
+
+        with transaction.atomic():
+            # Holds on different courts do not share a day lock, so the
+            # player's row serializes their limit check
+            User.objects.select_for_update().only('pk').get(
+                pk=request.user.pk)
+            self.check_hold_limit(request.user)
+            CourtDayLock.acquire(court, hold_date)
+
+            if slot_is_taken(court, hold_date,
+                             validated_data['start_time'],
+                             validated_data['end_time']):
+                raise serializers.ValidationError({
+                    'non_field_errors': ["This time slot is not available"]
+                })
+
+            return SlotHold.objects.create(
+                player=request.user,
+                expires_at=timezone.now() + timedelta(
+                    minutes=settings.SLOT_HOLD_TTL_MINUTES),
+                **validated_data
+            )
+
+
 class CancellationPolicySerializer(serializers.ModelSerializer):
     """Serializer for cancellation policies"""
     court_name = serializers.CharField(source='court.name', read_only=True)
@@ -205,9 +356,9 @@ class MatchParticipantSerializer(serializers.ModelSerializer):
         model = MatchParticipant
         fields = [
             'id', 'match_event', 'player', 'player_name',
-            'joined_at', 'is_confirmed', 'attended'
+            'joined_at', 'is_confirmed', 'is_waitlisted', 'attended'
         ]
-        read_only_fields = ['joined_at']
+        read_only_fields = ['joined_at', 'is_waitlisted']
 
 
 class MatchEventSerializer(serializers.ModelSerializer):
@@ -324,7 +475,8 @@ class PlayerRatingCreateSerializer(serializers.ModelSerializer):
         # Check if both users participated
         if not MatchParticipant.objects.filter(
             match_event=match_event,
-            player=request.user
+            player=request.user,
+            is_waitlisted=False
         ).exists():
             raise serializers.ValidationError(
                 "You must have participated in this match to rate players"
@@ -332,7 +484,8 @@ class PlayerRatingCreateSerializer(serializers.ModelSerializer):
 
         if not MatchParticipant.objects.filter(
             match_event=match_event,
-            player=rated_player
+            player=rated_player,
+            is_waitlisted=False
         ).exists():
             raise serializers.ValidationError(
                 "This player did not participate in this match"
@@ -451,7 +604,7 @@ class RecurringBookingSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'court', 'court_name', 'player', 'player_name',
             'frequency', 'day_of_week', 'day_of_week_display',
-            'start_time', 'end_time', 'start_date', 'end_date',
+            'week_of_month', 'start_time', 'end_time', 'start_date', 'end_date',
             'base_amount', 'payment_method', 'status', 'notes',
             'created_at', 'updated_at'
         ]
@@ -469,8 +622,8 @@ class RecurringBookingCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = RecurringBooking
         fields = [
-            'court', 'frequency', 'day_of_week', 'start_time', 'end_time',
-            'start_date', 'end_date', 'base_amount', 'payment_method', 'notes'
+            'court', 'frequency', 'day_of_week', 'week_of_month',
+            'start_time', 'end_time', 'start_date', 'end_date', 'base_amount', 'payment_method', 'notes'
         ]
 
     def validate(self, data):
@@ -487,6 +640,16 @@ class RecurringBookingCreateSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError(
                 "Day of week must be between 0 (Monday) and 6 (Sunday)")
 
+        # Validate week of month
+        week_of_month = data.get('week_of_month')
+        if week_of_month is not None:
+            if data.get('frequency', 'WEEKLY') != 'MONTHLY':
+                raise serializers.ValidationError(
+                    "Week of month only applies to monthly bookings")
+            if week_of_month not in (1, 2, 3, 4, -1):
+                raise serializers.ValidationError(
+                    "Week of month must be 1-4, or -1 for the last week")
+
         # Validate time range
         if start_time >= end_time:
             raise serializers.ValidationError(
@@ -520,9 +683,22 @@ class RecurringBookingCreateSerializer(serializers.ModelSerializer):
         if not end_date:
             end_date = timezone.now().date() + timedelta(days=90)
 
-        bookings = recurring_booking.generate_bookings_for_period(
+        bookings, skipped = recurring_booking.generate_bookings_for_period(
             validated_data['start_date'],
             end_date
         )
+        recurring_booking.generation_report = (bookings, skipped)
 
         return recurring_booking
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        report = getattr(instance, 'generation_report', None)
+        if report:
+            bookings, skipped = report
+            data['bookings_created'] = len(bookings)
+            data['skipped_dates'] = [
+                {'date': str(item['date']), 'reason': item['reason']}
+                for item in skipped
+            ]
+        return data
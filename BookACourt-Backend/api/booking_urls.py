@@ -8,7 +8,8 @@ from .booking_views import (
     MatchEventViewSet,
     PlayerRatingViewSet,
     BookingShareViewSet,
-    RecurringBookingViewSet
+    RecurringBookingViewSet,
+    SlotHoldViewSet
 )
 
 # Create router
@@ -27,6 +28,7 @@ router.register(r'booking-shares', BookingShareViewSet,
                 basename='booking-share')
 router.register(r'recurring', RecurringBookingViewSet,
                 basename='recurring-booking')
+router.register(r'holds', SlotHoldViewSet, basename='slot-hold')
 
 # URL patterns
 urlpatterns = [
@@ -3,7 +3,7 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly
 from django.utils import timezone
-from django.db.models import Q
+from django.db.models import Q, Count
 from drf_spectacular.utils import extend_schema, OpenApiParameter
 from datetime import timedelta
 
@@ -11,19 +11,24 @@ from api import models
 from booking_management.models import (
     Booking, CancellationPolicy, BookingNotification,
     EquipmentRental, MatchEvent, MatchParticipant,
-    PlayerRating, BookingShare, RecurringBooking
+    PlayerRating, BookingShare, RecurringBooking, SlotHold
 )
+from court_management.access import managed_court_ids
+from court_management.occupancy import invalidate_days
+from .caching import ConditionalGetMixin
+from .pagination import CursorOrPageNumberPagination, KeysetPagination
 from .booking_serializers import (
     BookingSerializer, BookingCreateSerializer,
     CancellationPolicySerializer, BookingNotificationSerializer,
     EquipmentRentalSerializer, MatchEventSerializer,
     MatchEventCreateSerializer, MatchParticipantSerializer,
     PlayerRatingSerializer, PlayerRatingCreateSerializer,
-    BookingShareSerializer, BookingShareCreateSerializer, RecurringBookingCreateSerializer, RecurringBookingSerializer
+    BookingShareSerializer, BookingShareCreateSerializer, RecurringBookingCreateSerializer, RecurringBookingSerializer,
+    SlotHoldSerializer, SlotHoldCreateSerializer
 )
 
 
-class BookingViewSet(viewsets.ModelViewSet):
+class BookingViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     """
     ViewSet for Bookings
     Addresses User Stories: 13, 20, 22, 34, 35, 38
@@ -34,6 +39,7 @@ class BookingViewSet(viewsets.ModelViewSet):
     search_fields = ['booking_reference', 'court__name']
     ordering_fields = ['booking_date', 'created_at', 'total_amount']
     ordering = ['-booking_date', '-start_time']
+    pagination_class = CursorOrPageNumberPagination
 
     def get_serializer_class(self):
         if self.action == 'create':
@@ -50,11 +56,7 @@ class BookingViewSet(viewsets.ModelViewSet):
             pass
         elif user.is_court_owner or user.is_court_manager:
             # Court staff see bookings for their courts
-            from court_management.models import Court
-            managed_courts = Court.objects.filter(
-                Q(owner=user) | Q(managers=user)
-            )
-            queryset = queryset.filter(court__in=managed_courts)
+            queryset = queryset.filter(court_id__in=managed_court_ids(user))
         else:
             # Players see only their bookings
             queryset = queryset.filter(player=user)
@@ -76,14 +78,49 @@ class BookingViewSet(viewsets.ModelViewSet):
 
     @extend_schema(
         summary="Get my bookings",
-        description="Get all bookings for the current user"
+        description="Get the current user's bookings, a page at a time. "
+                    "Upcoming bookings come soonest first; past and all "
+                    "bookings most recent first.",
+        parameters=[
+            OpenApiParameter('when', str, enum=['upcoming', 'past'],
+                             description='Only upcoming or only past bookings'),
+            OpenApiParameter('cursor', str,
+                             description="Cursor from the previous page's next link"),
+            OpenApiParameter('page_size', int,
+                             description='Number of results per page (max 100)'),
+        ]
     )
     @action(detail=False, methods=['get'])
     def my_bookings(self, request):
         """Get current user's bookings"""
-        bookings = Booking.objects.filter(player=request.user)
-        serializer = self.get_serializer(bookings, many=True)
-        return Response(serializer.data)
+        bookings = Booking.objects.filter(
+            player=request.user).select_related('court', 'player')
+
+        now = timezone.localtime()
+        upcoming = (Q(booking_date__gt=now.date()) |
+                    Q(booking_date=now.date(), end_time__gt=now.time()))
+        when = request.query_params.get('when')
+        if when == 'upcoming':
+            bookings = bookings.filter(upcoming)
+            ordering = ('booking_date', 'start_time', 'id')
+        elif when == 'past':
+            bookings = bookings.exclude(upcoming)
+            ordering = ('-booking_date', '-start_time', '-id')
+        elif when:
+            return Response(
+                {'error': "when must be 'upcoming' or 'past'"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        else:
+            ordering = ('-booking_date', '-start_time', '-id')
+
+        def build():
+            paginator = KeysetPagination(ordering=ordering)
+            page = paginator.paginate_queryset(bookings, request, view=self)
+            serializer = self.get_serializer(page, many=True)
+            return paginator.get_paginated_response(serializer.data)
+
+        return self.conditional_response(request, bookings, build)
 
     @extend_schema(
         summary="Cancel booking",
@@ -139,7 +176,7 @@ class BookingViewSet(viewsets.ModelViewSet):
         booking = self.get_object()
 
         # Check permissions
-        if not request.user.can_manage_court(booking.court):
+        if not request.user.can_manage_court(booking.court_id):
             return Response(
                 {'error': 'You do not have permission to confirm this booking'},
                 status=status.HTTP_403_FORBIDDEN
@@ -158,6 +195,51 @@ class BookingViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
+class SlotHoldViewSet(viewsets.ModelViewSet):
+    """
+    ViewSet for Slot Holds
+    Reserve a slot for a few minutes while the player checks out
+    """
+    queryset = SlotHold.objects.all()
+    permission_classes = [IsAuthenticated]
+    http_method_names = ['get', 'post', 'delete', 'head', 'options']
+
+    def get_serializer_class(self):
+        if self.action == 'create':
+            return SlotHoldCreateSerializer
+        return SlotHoldSerializer
+
+    def get_queryset(self):
+        """Players see only their unexpired holds"""
+        return SlotHold.objects.filter(
+            player=self.request.user,
+            expires_at__gt=timezone.now()
+        ).select_related('court')
+
+    @extend_schema(
+        summary="Hold a slot",
+        description="Reserve a slot for a short time; pass the returned hold_token when creating the booking"
+    )
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        hold = serializer.save()
+        return Response(
+            SlotHoldSerializer(hold).data,
+            status=status.HTTP_201_CREATED
+        )
+
+    @extend_schema(
+        summary="Release a hold",
+        description="Give up a held slot before it expires"
+    )
+    def destroy(self, request, *args, **kwargs):
+        return super().destroy(request, *args, **kwargs)
+
+    def perform_destroy(self, instance):
+        instance.release()
+
+
 class CancellationPolicyViewSet(viewsets.ModelViewSet):
     """
     ViewSet for Cancellation Policies
@@ -176,7 +258,7 @@ class CancellationPolicyViewSet(viewsets.ModelViewSet):
         return queryset
 
 
-class BookingNotificationViewSet(viewsets.ReadOnlyModelViewSet):
+class BookingNotificationViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
     """
     ViewSet for Booking Notifications
     Addresses User Story: 41 - View booking notifications
@@ -186,6 +268,15 @@ class BookingNotificationViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = [IsAuthenticated]
     filter_backends = [filters.OrderingFilter]
     ordering = ['-sent_at']
+    pagination_class = CursorOrPageNumberPagination
+    conditional_modified_field = 'sent_at'
+
+    def get_conditional_aggregates(self):
+        # Notifications have no updated_at; is_read is the only field
+        # that changes after sending
+        aggregates = super().get_conditional_aggregates()
+        aggregates['read'] = Count('pk', filter=Q(is_read=True))
+        return aggregates
 
     def get_queryset(self):
         """Users see only their notifications"""
@@ -199,8 +290,10 @@ class BookingNotificationViewSet(viewsets.ReadOnlyModelViewSet):
     def unread(self, request):
         """Get unread notifications"""
         notifications = self.get_queryset().filter(is_read=False)
-        serializer = self.get_serializer(notifications, many=True)
-        return Response(serializer.data)
+        return self.conditional_response(
+            request, notifications,
+            lambda: Response(self.get_serializer(notifications, many=True).data)
+        )
 
     @extend_schema(
         summary="Mark as read",
@@ -245,10 +338,7 @@ class EquipmentRentalViewSet(viewsets.ModelViewSet):
         elif user.is_court_owner or user.is_court_manager:
             # Court staff see rentals for their courts
             queryset = queryset.filter(
-                equipment__court__owner=user
-            ) | queryset.filter(
-                equipment__court__managers=user
-            )
+                equipment__court_id__in=managed_court_ids(user))
         else:
             # Players see their own rentals
             queryset = queryset.filter(booking__player=user)
@@ -265,7 +355,7 @@ class EquipmentRentalViewSet(viewsets.ModelViewSet):
         rental = self.get_object()
 
         # Check permissions
-        if not request.user.can_manage_court(rental.equipment.court):
+        if not request.user.can_manage_court(rental.equipment.court_id):
             return Response(
                 {'error': 'You do not have permission to process returns'},
                 status=status.HTTP_403_FORBIDDEN
@@ -337,55 +427,43 @@ class MatchEventViewSet(viewsets.ModelViewSet):
 
     @extend_schema(
         summary="Join match",
-        description="Join an open match event"
+        description="Join an open match event, or its waitlist if the match is full"
     )
     @action(detail=True, methods=['post'])
     def join(self, request, pk=None):
         """Join a match"""
         match = self.get_object()
 
-        # Check if match is open
-        if match.status != 'OPEN':
+        outcome = MatchEvent.join(match.pk, request.user)
+        if outcome == 'closed':
             return Response(
                 {'error': 'Match is not open for joining'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-
-        # Check if full
-        if match.is_full():
-            return Response(
-                {'error': 'Match is full'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-
-        # Check if already joined
-        if MatchParticipant.objects.filter(
-            match_event=match,
-            player=request.user
-        ).exists():
+        if outcome == 'already_joined':
             return Response(
                 {'error': 'You have already joined this match'},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # Create participant
-        MatchParticipant.objects.create(
-            match_event=match,
-            player=request.user
-        )
-
-        # Update player count
-        match.current_players += 1
-        if match.current_players >= match.max_players:
-            match.status = 'FULL'
-        match.save()
+        match.refresh_from_db()
+        if outcome == 'waitlisted':
+            position = MatchParticipant.objects.filter(
+                match_event=match,
+                is_waitlisted=True
+            ).count()
+            return Response({
+                'message': 'Match is full. You have been added to the waitlist.',
+                'waitlist_position': position,
+                'match': self.get_serializer(match).data
+            }, status=status.HTTP_202_ACCEPTED)
 
         serializer = self.get_serializer(match)
         return Response(serializer.data)
 
     @extend_schema(
         summary="Leave match",
-        description="Leave a match event"
+        description="Leave a match event or its waitlist"
     )
     @action(detail=True, methods=['post'])
     def leave(self, request, pk=None):
@@ -399,26 +477,14 @@ class MatchEventViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # Check if participant
-        try:
-            participant = MatchParticipant.objects.get(
-                match_event=match,
-                player=request.user
-            )
-        except MatchParticipant.DoesNotExist:
+        outcome = MatchEvent.leave(match.pk, request.user)
+        if outcome == 'not_participant':
             return Response(
                 {'error': 'You are not a participant in this match'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-
-        # Remove participant
-        participant.delete()
-
-        # Update player count
-        match.current_players -= 1
-        if match.status == 'FULL':
-            match.status = 'OPEN'
-        match.save()
+        if outcome == 'left_waitlist':
+            return Response({'message': 'Successfully left the waitlist'})
 
         return Response({'message': 'Successfully left the match'})
 
@@ -561,11 +627,7 @@ class RecurringBookingViewSet(viewsets.ModelViewSet):
         if user.is_super_user:
             pass
         elif user.is_court_owner or user.is_court_manager:
-            from court_management.models import Court
-            managed_courts = Court.objects.filter(
-                Q(owner=user) | Q(managers=user)
-            )
-            queryset = queryset.filter(court__in=managed_courts)
+            queryset = queryset.filter(court_id__in=managed_court_ids(user))
         else:
             queryset = queryset.filter(player=user)
 
@@ -619,10 +681,17 @@ class RecurringBookingViewSet(viewsets.ModelViewSet):
         from datetime import timedelta
         end_date = recurring.end_date or (
             timezone.now().date() + timedelta(days=90))
-        recurring.generate_bookings_for_period(timezone.now().date(), end_date)
+        bookings, skipped = recurring.generate_bookings_for_period(
+            timezone.now().date(), end_date)
 
         serializer = self.get_serializer(recurring)
-        return Response(serializer.data)
+        data = serializer.data
+        data['bookings_created'] = len(bookings)
+        data['skipped_dates'] = [
+            {'date': str(item['date']), 'reason': item['reason']}
+            for item in skipped
+        ]
+        return Response(data)
 
     @extend_schema(
         summary="Cancel recurring booking",
@@ -646,16 +715,21 @@ class RecurringBookingViewSet(viewsets.ModelViewSet):
 
         if cancel_future:
             # Cancel all future bookings
-            Booking.objects.filter(
+            future_bookings = Booking.objects.filter(
                 court=recurring.court,
                 player=recurring.player,
                 booking_date__gte=timezone.now().date(),
                 start_time=recurring.start_time,
                 end_time=recurring.end_time,
                 status__in=['PENDING', 'CONFIRMED']
-            ).update(
+            )
+            # Bulk update() skips signals, so free the slots explicitly
+            invalidate_days(
+                future_bookings.values_list('court_id', 'booking_date'))
+            future_bookings.update(
                 status='CANCELLED',
                 cancelled_at=timezone.now(),
+                updated_at=timezone.now(),
                 cancellation_reason='Recurring booking cancelled'
             )
 
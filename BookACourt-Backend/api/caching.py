@@ -0,0 +1,212 @@
+"""
+HTTP caching helpers for the API.
+
+CachedResponseMixin is a response cache for read-mostly catalogue
+endpoints. ConditionalGetMixin answers If-None-Match on per-user
+endpoints from cheap aggregates, without caching or serializing.
+
+Cached responses are keyed on the view, action, URL kwargs, host and the
+normalized query string, plus the current generation of every scope the
+response depends on (e.g. 'courts' or 'court:12'). Writes never delete
+entries; the signals in api.signals bump the affected generations, so
+every key built afterwards is new and stale entries simply age out.
+
+A generation is the time of the scope's last bump in nanoseconds, so
+the Last-Modified of a cached response is the newest generation it was
+built on. It moves with every write the scopes cover, including bulk
+update()s and changes to related rows, which a Max(updated_at) over the
+rows would miss. HTTP dates have one-second resolution, so a response
+whose newest generation is under a second old gets no Last-Modified: a
+bump later in that second would not move it.
+"""
+from hashlib import md5
+from urllib.parse import urlencode
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Max
+from django.http import HttpResponse
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+from rest_framework.response import Response
+
+RESPONSE_CACHE_TIMEOUT = 60 * 10
+GENERATION_KEY_PREFIX = 'response_generation'
+
+
+def _generation_key(scope):
+    return f'{GENERATION_KEY_PREFIX}:{scope}'
+
+
+def get_generations(scopes):
+    """Current generation of each scope, starting new scopes now"""
+    keys = [_generation_key(scope) for scope in scopes]
+    generations = cache.get_many(keys)
+    for key in keys:
+        if key not in generations:
+            now = time.time_ns()
+            cache.add(key, now, None)
+            generations[key] = cache.get(key, now)
+    return [generations[key] for key in keys]
+
+
+def bump_generations(*scopes):
+    """Invalidate every cached response built on these scopes after commit"""
+    def bump():
+        for scope in scopes:
+            key = _generation_key(scope)
+            # Always move forward, even if the clock does not
+            cache.set(key, max(time.time_ns(), cache.get(key, 0) + 1), None)
+
+    transaction.on_commit(bump)
+
+
+def is_not_modified(request, etag, last_modified=None):
+    """
+    Whether the client's copy is current: If-None-Match (weak comparison)
+    takes precedence over If-Modified-Since. last_modified is a timestamp.
+    """
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match:
+        etags = [tag.strip().removeprefix('W/')
+                 for tag in if_none_match.split(',')]
+        return etag.removeprefix('W/') in etags or '*' in etags
+
+    if_modified_since = parse_http_date_safe(
+        request.headers.get('If-Modified-Since', ''))
+    return bool(last_modified and if_modified_since and
+                last_modified <= if_modified_since)
+
+
+class CachedResponseMixin:
+    """
+    Serve list and retrieve from the response cache, with ETag and
+    Last-Modified headers and 304s for matching conditional requests.
+    Views declare their dependencies in get_response_cache_scopes(),
+    which also date the response: see the module docstring.
+    """
+    response_cache_timeout = RESPONSE_CACHE_TIMEOUT
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
+
+    def get_response_cache_scopes(self):
+        raise NotImplementedError
+
+    def should_cache_response(self, request):
+        # The browsable API renders per user, only cache JSON
+        return request.accepted_renderer.format == 'json'
+
+    def get_response_cache_key(self, request, generations):
+        params = urlencode(sorted(
+            (key, value)
+            for key, values in request.query_params.lists()
+            for value in values
+        ))
+        kwargs = ','.join(f'{key}={value}'
+                          for key, value in sorted(self.kwargs.items()))
+        raw = (f'{request.get_host()}|{kwargs}|'
+               f'{".".join(map(str, generations))}|{params}')
+        return (f'response:{self.basename}:{self.action}:'
+                f'{md5(raw.encode()).hexdigest()}')
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        if not self.should_cache_response(request):
+            return handler(request, *args, **kwargs)
+
+        read_at = time.time_ns()
+        generations = get_generations(self.get_response_cache_scopes())
+        key = self.get_response_cache_key(request, generations)
+        entry = cache.get(key)
+        if entry is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+
+            # Render now so the bytes can be cached
+            response.accepted_renderer = request.accepted_renderer
+            response.accepted_media_type = request.accepted_media_type
+            response.renderer_context = self.get_renderer_context()
+            response.render()
+
+            newest = max(generations)
+            entry = {
+                'content': response.content,
+                'content_type': response['Content-Type'],
+                'etag': quote_etag(md5(response.content).hexdigest()),
+                'last_modified': (newest // 10 ** 9
+                                  if read_at - newest >= 10 ** 9 else None),
+            }
+            cache.set(key, entry, self.response_cache_timeout)
+            cache_status = 'MISS'
+        else:
+            cache_status = 'HIT'
+
+        if is_not_modified(request, entry['etag'], entry['last_modified']):
+            response = HttpResponse(status=304)
+        else:
+            response = HttpResponse(
+                entry['content'], content_type=entry['content_type'])
+        response['ETag'] = entry['etag']
+        if entry['last_modified']:
+            response['Last-Modified'] = http_date(entry['last_modified'])
+        response['X-Cache'] = cache_status
+        return response
+
+
+class ConditionalGetMixin:
+    """
+    Validate GETs on per-user collections with one aggregate query over
+    the queryset (row count, highest id and latest modified_field) and
+    reply 304 before anything is serialized. Bulk update()s on these
+    models must set the modified field for this to notice them.
+
+    Only the ETag is used: a latest-modified timestamp cannot see rows
+    that are deleted, leave the filter or arrive with an older
+    timestamp, so these responses carry no Last-Modified and
+    If-Modified-Since is ignored.
+    """
+    conditional_modified_field = 'updated_at'
+
+    def list(self, request, *args, **kwargs):
+        handler = super().list
+        queryset = self.filter_queryset(self.get_queryset())
+        return self.conditional_response(
+            request, queryset, lambda: handler(request, *args, **kwargs))
+
+    def get_conditional_aggregates(self):
+        """Aggregates whose values change whenever the payload does"""
+        aggregates = {'count': Count('pk'), 'max_id': Max('pk')}
+        if self.conditional_modified_field:
+            aggregates['last_modified'] = Max(self.conditional_modified_field)
+        return aggregates
+
+    def conditional_response(self, request, queryset, build):
+        """
+        Return 304 if the client's copy of queryset is current, otherwise
+        build() with an ETag header attached
+        """
+        if request.method not in ('GET', 'HEAD'):
+            return build()
+
+        validators = queryset.order_by().aggregate(
+            **self.get_conditional_aggregates())
+        raw = '|'.join([
+            request.get_full_path(),
+            str(request.user.pk),
+            request.accepted_media_type or '',
+            *(str(validators[key]) for key in sorted(validators))
+        ])
+        # Weak: it tracks the data, not the exact bytes
+        etag = 'W/' + quote_etag(md5(raw.encode()).hexdigest())
+
+        if is_not_modified(request, etag):
+            response = Response(status=304)
+        else:
+            response = build()
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+        return response
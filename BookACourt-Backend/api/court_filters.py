@@ -0,0 +1,48 @@
+from rest_framework import filters
+
+from court_management.search import get_backend, search_courts, tokenize
+from .pagination import RankedResults
+
+
+class CourtSearchFilter(filters.SearchFilter):
+    """
+    Search courts through the court search index instead of icontains
+    lookups. Results are ranked by relevance unless an ordering is given,
+    so list this backend after OrderingFilter.
+
+    Every match is kept. Backends that rank in SQL order the queryset by
+    its search_score; otherwise, or when such a backend hands the query
+    back (e.g. MySQL's typo fallback), the list pages through the ranked
+    ids with RankedResults rather than ordering by a CASE over every match.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '')
+        if not query.strip():
+            return queryset
+        if not tokenize(query):
+            return queryset.none()
+
+        ordered = bool(request.query_params.get(
+            filters.OrderingFilter.ordering_param))
+        backend = get_backend()
+        if backend.ranks_in_database:
+            ranked = backend.annotate_scores(queryset, query)
+            if ranked is not None:
+                if ordered:
+                    return ranked
+                return ranked.order_by('-search_score', 'id')
+
+        matches = [court_id for court_id, _ in search_courts(query)]
+        if getattr(view, 'action', None) != 'list':
+            # Nothing to page through, e.g. the availability matrix
+            return queryset.filter(id__in=matches)
+        if ordered:
+            matched = set(matches)
+            court_ids = [court_id
+                         for court_id in queryset.values_list('id', flat=True)
+                         if court_id in matched]
+        else:
+            allowed = set(queryset.values_list('id', flat=True))
+            court_ids = [court_id for court_id in matches if court_id in allowed]
+        return RankedResults(queryset, court_ids)
@@ -42,17 +42,16 @@ class IsCourtOwnerOrManager(permissions.BasePermission):
             return True
 
         # Check if user is the owner
-        if hasattr(obj, 'owner') and obj.owner == request.user:
+        if hasattr(obj, 'owner_id') and obj.owner_id == request.user.id:
             return True
 
         # Check if user is a manager
-        if hasattr(obj, 'managers') and obj.managers.filter(id=request.user.id).exists():
-            return True
+        if hasattr(obj, 'managers'):
+            return request.user.can_manage_court(obj)
 
         # For objects related to a court (like reviews, pricing)
-        if hasattr(obj, 'court'):
-            court = obj.court
-            return request.user.can_manage_court(court)
+        if hasattr(obj, 'court_id'):
+            return request.user.can_manage_court(obj.court_id)
 
         return False
 
@@ -1,8 +1,11 @@
 from rest_framework import serializers
 from court_management.models import (
     CourtCategory, CourtRegistration, Court, CourtImage,
-    DynamicPricing, CourtBlockedSlot, CourtReview, EquipmentItem
+    DynamicPricing, CourtBlockedSlot, CourtReview, CourtReviewSummary,
+    EquipmentItem
 )
+from court_management.moderation import MODERATION_ACTIONS
+from court_management.ratings import average
 from user_management.models import User
 
 
@@ -17,7 +20,10 @@ class CourtCategorySerializer(serializers.ModelSerializer):
         read_only_fields = ['created_at']
 
     def get_court_count(self, obj):
-        return obj.courts.filter(is_active=True).count()
+        # One cached aggregate shared by every row of a list
+        if not hasattr(self, '_court_counts'):
+            self._court_counts = CourtCategory.active_court_counts()
+        return self._court_counts.get(obj.id, 0)
 
 
 class CourtImageSerializer(serializers.ModelSerializer):
@@ -55,6 +61,7 @@ class CourtListSerializer(serializers.ModelSerializer):
         source='category.name', read_only=True)
     primary_image = serializers.SerializerMethodField()
     amenities_list = serializers.SerializerMethodField()
+    distance_km = serializers.SerializerMethodField()
 
     class Meta:
         model = Court
@@ -62,11 +69,15 @@ class CourtListSerializer(serializers.ModelSerializer):
             'id', 'name', 'owner_name', 'category_name', 'court_type',
             'city', 'is_indoor', 'base_hourly_rate', 'average_rating',
             'total_reviews', 'primary_image', 'amenities_list', 'is_active',
-            'is_verified'
+            'is_verified', 'distance_km'
         ]
 
     def get_primary_image(self, obj):
-        primary = obj.images.filter(is_primary=True).first()
+        if hasattr(obj, 'primary_images'):
+            # Prefetched by CourtViewSet
+            primary = obj.primary_images[0] if obj.primary_images else None
+        else:
+            primary = obj.images.filter(is_primary=True).first()
         if primary:
             request = self.context.get('request')
             if request:
@@ -78,6 +89,43 @@ class CourtListSerializer(serializers.ModelSerializer):
             return [a.strip() for a in obj.amenities.split(',')]
         return []
 
+    def get_distance_km(self, obj):
+        """Distance from the search point, only set for nearby searches"""
+        distance = self.context.get('distances', {}).get(obj.id)
+        if distance is None:
+            return None
+        return round(distance, 2)
+
+
+class CourtReviewSummarySerializer(serializers.ModelSerializer):
+    """Star histogram, recent average and response rate of visible reviews"""
+    histogram = serializers.SerializerMethodField()
+    total_reviews = serializers.IntegerField(read_only=True)
+    recent_average = serializers.SerializerMethodField()
+    recent_reviews = serializers.SerializerMethodField()
+    response_rate = serializers.SerializerMethodField()
+
+    class Meta:
+        model = CourtReviewSummary
+        fields = ['histogram', 'total_reviews', 'recent_average',
+                  'recent_reviews', 'response_rate']
+
+    def get_histogram(self, obj):
+        return {str(stars): obj.histogram.get(str(stars), 0)
+                for stars in range(1, 6)}
+
+    def get_recent_average(self, obj):
+        rating_sum, count = obj.recent_totals()
+        # Formatted like average_rating
+        return str(average(rating_sum, count)) if count else None
+
+    def get_recent_reviews(self, obj):
+        return obj.recent_totals()[1]
+
+    def get_response_rate(self, obj):
+        total = obj.total_reviews
+        return round(obj.responded_reviews / total, 2) if total else None
+
 
 class CourtDetailSerializer(serializers.ModelSerializer):
     """Detailed serializer for court details"""
@@ -88,6 +136,7 @@ class CourtDetailSerializer(serializers.ModelSerializer):
     pricing_rules = DynamicPricingSerializer(many=True, read_only=True)
     equipment = EquipmentItemSerializer(many=True, read_only=True)
     amenities_list = serializers.SerializerMethodField()
+    review_summary = serializers.SerializerMethodField()
 
     class Meta:
         model = Court
@@ -97,7 +146,8 @@ class CourtDetailSerializer(serializers.ModelSerializer):
             'capacity', 'amenities', 'amenities_list', 'base_hourly_rate',
             'opening_time', 'closing_time', 'is_active', 'is_verified',
             'average_rating', 'total_reviews', 'phone_number', 'email',
-            'images', 'pricing_rules', 'equipment', 'created_at', 'updated_at'
+            'images', 'pricing_rules', 'equipment', 'review_summary',
+            'created_at', 'updated_at'
         ]
         read_only_fields = ['average_rating',
                             'total_reviews', 'created_at', 'updated_at']
@@ -107,6 +157,13 @@ class CourtDetailSerializer(serializers.ModelSerializer):
             return [a.strip() for a in obj.amenities.split(',')]
         return []
 
+    def get_review_summary(self, obj):
+        # select_related by CourtViewSet; courts without reviews may have
+        # no summary row yet
+        summary = getattr(obj, 'review_summary', None)
+        return CourtReviewSummarySerializer(
+            summary or CourtReviewSummary(court=obj)).data
+
 
 class CourtCreateUpdateSerializer(serializers.ModelSerializer):
     """Serializer for creating/updating courts"""
@@ -229,6 +286,14 @@ class CourtReviewResponseSerializer(serializers.Serializer):
         return instance
 
 
+class ReviewModerationSerializer(serializers.Serializer):
+    """Serializer for moderating several reviews at once"""
+    review_ids = serializers.ListField(
+        child=serializers.IntegerField(), min_length=1, max_length=500)
+    action = serializers.ChoiceField(choices=list(MODERATION_ACTIONS))
+    reason = serializers.CharField(required=False, allow_blank=True)
+
+
 class CourtBlockedSlotSerializer(serializers.ModelSerializer):
     """Serializer for blocked time slots"""
     blocked_by_name = serializers.CharField(
@@ -1,32 +1,56 @@
 from rest_framework import viewsets, status, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated, AllowAny, IsAuthenticatedOrReadOnly
-from django.db.models import Q, Avg, Count
+from django.db.models import (
+    Q, Avg, Count, Exists, OuterRef, Prefetch
+)
+from django.http import StreamingHttpResponse
 from django.utils import timezone
-from datetime import datetime, timedelta
+from datetime import datetime, time, timedelta
+import json
 from drf_spectacular.utils import extend_schema, OpenApiParameter
 
 from court_management.models import (
     CourtCategory, CourtRegistration, Court, CourtImage,
     DynamicPricing, CourtBlockedSlot, CourtReview, EquipmentItem
 )
+from court_management.occupancy import (
+    ACTIVE_BOOKING_STATUSES, SLOT_MINUTES, get_day_occupancy, free_intervals,
+    build_occupancy_matrix, iter_occupancy_matrix, slot_conflict
+)
+from court_management.moderation import moderate_reviews
+from court_management.pricing import get_price_table
+from court_management.geo import (
+    MAX_RADIUS_KM, bounding_box, nearby_courts
+)
 from .court_serializers import (
     CourtCategorySerializer, CourtRegistrationSerializer,
     CourtRegistrationCreateSerializer, CourtListSerializer,
     CourtDetailSerializer, CourtCreateUpdateSerializer,
     CourtReviewSerializer, CourtReviewResponseSerializer,
-    CourtBlockedSlotSerializer, CourtImageSerializer,
+    ReviewModerationSerializer, CourtBlockedSlotSerializer, CourtImageSerializer,
     DynamicPricingSerializer, EquipmentItemSerializer,
     CourtSearchSerializer, CourtAvailabilitySerializer
 )
+from .caching import CachedResponseMixin
+from .court_filters import CourtSearchFilter
+from .pagination import CursorOrPageNumberPagination, RankedResults
 from .court_permissions import (
     IsCourtOwnerOrReadOnly, IsCourtOwnerOrManager,
     IsPlayerOrReadOnly, IsSuperUserOrReadOnly
 )
 
+# Upper bounds for a single availability matrix request
+MAX_MATRIX_DAYS = 92
+MAX_MATRIX_CELLS = 3000  # courts x days
+
+# Upper bound for a single price quote request
+MAX_QUOTE_DAYS = 31
 
-class CourtCategoryViewSet(viewsets.ReadOnlyModelViewSet):
+
+class CourtCategoryViewSet(CachedResponseMixin, viewsets.ReadOnlyModelViewSet):
     """
     ViewSet for Court Categories
     Addresses User Story: 9 - Browse courts by categories
@@ -39,6 +63,9 @@ class CourtCategoryViewSet(viewsets.ReadOnlyModelViewSet):
     ordering_fields = ['name', 'created_at']
     ordering = ['name']
 
+    def get_response_cache_scopes(self):
+        return ['categories']
+
     @extend_schema(
         summary="List all active court categories",
         description="Get a list of all active court categories with court counts"
@@ -179,15 +206,15 @@ class CourtRegistrationViewSet(viewsets.ModelViewSet):
         }, status=status.HTTP_200_OK)
 
 
-class CourtViewSet(viewsets.ModelViewSet):
+class CourtViewSet(CachedResponseMixin, viewsets.ModelViewSet):
     """
     ViewSet for Courts
     Addresses User Stories: 11, 13, 14, 16, 18, 32, 33
     """
     queryset = Court.objects.filter(is_active=True)
     permission_classes = [IsAuthenticatedOrReadOnly]
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
-    search_fields = ['name', 'city', 'court_type', 'description']
+    # Searched through court_management.search, see CourtSearchFilter
+    filter_backends = [filters.OrderingFilter, CourtSearchFilter]
     ordering_fields = ['name', 'city', 'base_hourly_rate',
                        'average_rating', 'created_at']
     ordering = ['-created_at']
@@ -224,7 +251,143 @@ class CourtViewSet(viewsets.ModelViewSet):
         if max_price:
             queryset = queryset.filter(base_hourly_rate__lte=max_price)
 
-        return queryset.select_related('owner', 'category').prefetch_related('images')
+        # Location and availability searches only narrow collections;
+        # detail actions such as available_slots take their own date
+        # parameter. The availability matrix has its own date range.
+        if self.action in ('list', 'availability_matrix'):
+            if self.request.query_params.get('lat') or self.request.query_params.get('lng'):
+                queryset = self.filter_nearby(queryset)
+        if self.action == 'list' and self.request.query_params.get('date'):
+            queryset = self.filter_available(queryset)
+
+        queryset = queryset.select_related('owner', 'category')
+        if self.action == 'list':
+            # The list only shows the primary image; fetch just those in one
+            # query instead of every image (or one query per court)
+            return queryset.prefetch_related(Prefetch(
+                'images',
+                queryset=CourtImage.objects.filter(is_primary=True),
+                to_attr='primary_images'
+            ))
+        return queryset.select_related(
+            'review_summary').prefetch_related('images')
+
+    def filter_nearby(self, queryset):
+        """Restrict to courts within `radius` km of lat/lng, nearest first"""
+        params = self.request.query_params
+        try:
+            lat = float(params.get('lat'))
+            lng = float(params.get('lng'))
+            radius = float(params.get('radius', 10))
+        except (TypeError, ValueError):
+            raise ValidationError(
+                {'error': 'lat, lng and radius must be numbers'})
+        if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+            raise ValidationError({'error': 'lat/lng out of range'})
+        if not 0 < radius <= MAX_RADIUS_KM:
+            raise ValidationError(
+                {'error': f'radius must be between 0 and {MAX_RADIUS_KM} km'})
+
+        self.court_distances = dict(nearby_courts(lat, lng, radius))
+
+        # The bounding box runs on the indexed columns and also keeps a
+        # stale grid from returning courts that have since moved away.
+        # Its corners are cut off against the grid in nearby_ids().
+        min_lat, max_lat, min_lng, max_lng = bounding_box(lat, lng, radius)
+        return queryset.filter(
+            latitude__range=(min_lat, max_lat),
+            longitude__range=(min_lng, max_lng)
+        )
+
+    def nearby_ids(self, queryset):
+        """
+        Ids of the courts in queryset within the search radius, nearest
+        first; an explicit ordering or a text search keeps its own order
+        """
+        ids = [court_id for court_id in queryset.values_list('id', flat=True)
+               if court_id in self.court_distances]
+        if (not self.request.query_params.get('ordering') and
+                not self.request.query_params.get('search', '').strip()):
+            ids.sort(key=self.court_distances.__getitem__)
+        return ids
+
+    def filter_available(self, queryset):
+        """
+        Restrict to courts that are open and free for the whole of
+        start_time-end_time on date, as one query with NOT EXISTS anti-joins
+        """
+        from booking_management.models import Booking, SlotHold
+
+        serializer = CourtAvailabilitySerializer(data=self.request.query_params)
+        serializer.is_valid(raise_exception=True)
+        date = serializer.validated_data['date']
+        start_time = serializer.validated_data.get('start_time')
+        end_time = serializer.validated_data.get('end_time')
+        if not start_time or not end_time:
+            raise ValidationError(
+                {'error': 'start_time and end_time are required with date'})
+
+        overlapping_bookings = Booking.objects.filter(
+            court=OuterRef('pk'),
+            booking_date=date,
+            start_time__lt=end_time,
+            end_time__gt=start_time,
+            status__in=ACTIVE_BOOKING_STATUSES
+        )
+        overlapping_blocks = CourtBlockedSlot.objects.filter(
+            court=OuterRef('pk'),
+            blocked_date=date,
+            start_time__lt=end_time,
+            end_time__gt=start_time
+        )
+        overlapping_holds = SlotHold.objects.filter(
+            court=OuterRef('pk'),
+            hold_date=date,
+            start_time__lt=end_time,
+            end_time__gt=start_time,
+            expires_at__gt=timezone.now()
+        )
+
+        return queryset.filter(
+            Q(closing_time__gte=end_time) | Q(closing_time=time(0, 0)),
+            opening_time__lte=start_time,
+        ).exclude(
+            Exists(overlapping_bookings)
+        ).exclude(
+            Exists(overlapping_blocks)
+        ).exclude(
+            Exists(overlapping_holds)
+        )
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if (self.action == 'list' and
+                getattr(self, 'court_distances', None) is not None):
+            # Ranked in Python and paginated over the ids, see RankedResults
+            if isinstance(queryset, RankedResults):
+                # Already in search relevance order
+                return RankedResults(queryset.queryset, [
+                    court_id for court_id in queryset.ids
+                    if court_id in self.court_distances
+                ])
+            return RankedResults(queryset, self.nearby_ids(queryset))
+        return queryset
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['distances'] = getattr(self, 'court_distances', {})
+        return context
+
+    def get_response_cache_scopes(self):
+        if self.action == 'retrieve':
+            # Detail nests the category, including its court count
+            return [f'court:{self.kwargs["pk"]}', 'categories']
+        return ['courts']
+
+    def should_cache_response(self, request):
+        # Availability searches depend on bookings, not just the catalogue
+        return (super().should_cache_response(request) and
+                not request.query_params.get('date'))
 
     @extend_schema(
         summary="List all courts",
@@ -241,6 +404,18 @@ class CourtViewSet(viewsets.ModelViewSet):
                              description='Minimum rating'),
             OpenApiParameter('max_price', float,
                              description='Maximum hourly rate'),
+            OpenApiParameter('lat', float,
+                             description='Latitude to search around'),
+            OpenApiParameter('lng', float,
+                             description='Longitude to search around'),
+            OpenApiParameter('radius', float,
+                             description=f'Search radius in km (default 10, max {MAX_RADIUS_KM})'),
+            OpenApiParameter('date', str,
+                             description='Only courts free on this date (YYYY-MM-DD), needs start_time and end_time'),
+            OpenApiParameter('start_time', str,
+                             description='Start of the wanted slot (HH:MM)'),
+            OpenApiParameter('end_time', str,
+                             description='End of the wanted slot (HH:MM)'),
         ]
     )
     def list(self, request, *args, **kwargs):
@@ -303,38 +478,39 @@ class CourtViewSet(viewsets.ModelViewSet):
                     }
                 })
 
-        # Check for blocked slots
-        blocked_slots = CourtBlockedSlot.objects.filter(
-            court=court,
-            blocked_date=date
-        )
-
+        # The occupancy bitmap answers the common "free" case without
+        # touching the database; details are only fetched on a conflict
         if start_time and end_time:
-            blocked_slots = blocked_slots.filter(
-                Q(start_time__lt=end_time) & Q(end_time__gt=start_time)
+            conflict = slot_conflict(court.id, date, start_time, end_time)
+        else:
+            conflict = get_day_occupancy(court.id, date).conflict()
+
+        if conflict == 'blocked':
+            blocked_slots = CourtBlockedSlot.objects.filter(
+                court=court,
+                blocked_date=date
             )
-
-        if blocked_slots.exists():
+            if start_time and end_time:
+                blocked_slots = blocked_slots.filter(
+                    Q(start_time__lt=end_time) & Q(end_time__gt=start_time)
+                )
             return Response({
                 'available': False,
                 'reason': 'Time slot is blocked',
                 'blocked_slots': CourtBlockedSlotSerializer(blocked_slots, many=True).data
             })
 
-        # Check for existing bookings
-        from booking_management.models import Booking
-        bookings = Booking.objects.filter(
-            court=court,
-            booking_date=date,
-            status__in=['PENDING', 'CONFIRMED']
-        )
-
-        if start_time and end_time:
-            bookings = bookings.filter(
-                Q(start_time__lt=end_time) & Q(end_time__gt=start_time)
+        if conflict == 'booked':
+            from booking_management.models import Booking
+            bookings = Booking.objects.filter(
+                court=court,
+                booking_date=date,
+                status__in=ACTIVE_BOOKING_STATUSES
             )
-
-        if bookings.exists():
+            if start_time and end_time:
+                bookings = bookings.filter(
+                    Q(start_time__lt=end_time) & Q(end_time__gt=start_time)
+                )
             return Response({
                 'available': False,
                 'reason': 'Time slot already booked',
@@ -344,6 +520,12 @@ class CourtViewSet(viewsets.ModelViewSet):
                 } for b in bookings]
             })
 
+        if conflict == 'held':
+            return Response({
+                'available': False,
+                'reason': 'Time slot is temporarily held by another player'
+            })
+
         return Response({
             'available': True,
             'message': 'Court is available for booking'
@@ -373,50 +555,199 @@ class CourtViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # Get all bookings and blocked slots for the date
-        from booking_management.models import Booking
-        bookings = Booking.objects.filter(
-            court=court,
-            booking_date=date,
-            status__in=['PENDING', 'CONFIRMED']
-        ).values_list('start_time', 'end_time')
-
-        blocked_slots = CourtBlockedSlot.objects.filter(
-            court=court,
-            blocked_date=date
-        ).values_list('start_time', 'end_time')
-
-        # Combine all unavailable slots
-        unavailable_slots = list(bookings) + list(blocked_slots)
-
-        # Generate available slots (hourly intervals)
-        available_slots = []
-        current_time = court.opening_time
-
-        while current_time < court.closing_time:
-            next_time = (datetime.combine(date, current_time) +
-                         timedelta(hours=1)).time()
-
-            # Check if slot overlaps with any unavailable slot
-            is_available = True
-            for start, end in unavailable_slots:
-                if current_time < end and next_time > start:
-                    is_available = False
-                    break
-
-            if is_available:
-                available_slots.append({
-                    'start_time': str(current_time),
-                    'end_time': str(next_time)
-                })
-
-            current_time = next_time
+        # Scan the cached occupancy bitmap in hourly steps
+        occupancy = get_day_occupancy(court.id, date)
+        available_slots = [{
+            'start_time': str(start),
+            'end_time': str(end)
+        } for start, end in free_intervals(
+            occupancy, court.opening_time, court.closing_time
+        )]
 
         return Response({
             'date': date_str,
             'available_slots': available_slots
         })
 
+    @extend_schema(
+        summary="Get priced availability",
+        description="Get every free slot for a date range with its price under the court's pricing rules",
+        parameters=[
+            OpenApiParameter('date_from', str, required=True,
+                             description='First date (YYYY-MM-DD)'),
+            OpenApiParameter('date_to', str,
+                             description='Last date (YYYY-MM-DD), defaults to date_from'),
+            OpenApiParameter('duration', int,
+                             description=f'Slot length in minutes, a multiple of {SLOT_MINUTES} (default 60)'),
+        ]
+    )
+    @action(detail=True, methods=['get'])
+    def quote(self, request, pk=None):
+        """Get free slots with their prices for a date range"""
+        court = self.get_object()
+
+        try:
+            date_from = datetime.strptime(
+                request.query_params.get('date_from', ''), '%Y-%m-%d').date()
+            date_to = datetime.strptime(
+                request.query_params.get('date_to', str(date_from)),
+                '%Y-%m-%d').date()
+        except ValueError:
+            return Response(
+                {'error': 'date_from is required. Use YYYY-MM-DD'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if date_to < date_from:
+            return Response(
+                {'error': 'date_to must not be before date_from'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if (date_to - date_from).days >= MAX_QUOTE_DAYS:
+            return Response(
+                {'error': f'Date range cannot exceed {MAX_QUOTE_DAYS} days'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            duration = int(request.query_params.get('duration', 60))
+        except ValueError:
+            duration = 0
+        if duration <= 0 or duration % SLOT_MINUTES:
+            return Response(
+                {'error': f'duration must be a positive multiple of {SLOT_MINUTES} minutes'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # One occupancy fetch for the whole range and one compiled price
+        # table; each day is then a single walk over both
+        matrix = build_occupancy_matrix([court.id], date_from, date_to)
+        prices = get_price_table(court)
+
+        days = []
+        for offset in range((date_to - date_from).days + 1):
+            day = date_from + timedelta(days=offset)
+            free = free_intervals(
+                matrix[court.id, day], court.opening_time,
+                court.closing_time, step_minutes=duration
+            )
+            days.append({
+                'date': str(day),
+                'slots': [{
+                    'start_time': str(start),
+                    'end_time': str(end),
+                    'price': str(price)
+                } for start, end, price in prices.price_intervals(
+                    day.weekday(), free)]
+            })
+
+        return Response({
+            'court_id': court.id,
+            'date_from': str(date_from),
+            'date_to': str(date_to),
+            'duration': duration,
+            'days': days
+        })
+
+    @extend_schema(
+        summary="Get availability matrix",
+        description=f"Get free hourly slots for many courts over a date range in one streamed call, up to {MAX_MATRIX_CELLS} court-days",
+        parameters=[
+            OpenApiParameter('date_from', str, required=True,
+                             description='First date (YYYY-MM-DD)'),
+            OpenApiParameter('date_to', str, required=True,
+                             description='Last date (YYYY-MM-DD)'),
+            OpenApiParameter('courts', str,
+                             description='Comma-separated court IDs (defaults to the list filters)'),
+        ]
+    )
+    @action(detail=False, methods=['get'])
+    def availability_matrix(self, request):
+        """Get available time slots for several courts and dates"""
+        try:
+            date_from = datetime.strptime(
+                request.query_params.get('date_from', ''), '%Y-%m-%d').date()
+            date_to = datetime.strptime(
+                request.query_params.get('date_to', ''), '%Y-%m-%d').date()
+        except ValueError:
+            return Response(
+                {'error': 'date_from and date_to are required. Use YYYY-MM-DD'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if date_to < date_from:
+            return Response(
+                {'error': 'date_to must not be before date_from'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if (date_to - date_from).days >= MAX_MATRIX_DAYS:
+            return Response(
+                {'error': f'Date range cannot exceed {MAX_MATRIX_DAYS} days'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        days = [date_from + timedelta(days=offset)
+                for offset in range((date_to - date_from).days + 1)]
+        max_courts = MAX_MATRIX_CELLS // len(days)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        court_ids = request.query_params.get('courts')
+        if court_ids:
+            try:
+                court_ids = [int(c) for c in court_ids.split(',') if c.strip()]
+            except ValueError:
+                return Response(
+                    {'error': 'courts must be a comma-separated list of IDs'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            queryset = queryset.filter(id__in=court_ids)
+
+        courts = queryset.prefetch_related(None).values_list(
+            'id', 'name', 'opening_time', 'closing_time')
+        if getattr(self, 'court_distances', None) is not None:
+            ids = self.nearby_ids(queryset)[:max_courts + 1]
+            rows = {row[0]: row for row in courts.filter(id__in=ids)}
+            courts = [rows[court_id] for court_id in ids]
+        else:
+            courts = list(courts[:max_courts + 1])
+        if len(courts) > max_courts:
+            return Response(
+                {'error': f'At most {max_courts} courts over {len(days)} days '
+                          f'({MAX_MATRIX_CELLS} court-days) per request. '
+                          'Narrow the filters or the date range.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        def stream():
+            # Occupancy is fetched a chunk of courts at a time as the
+            # response is sent, so neither the bitmaps nor the document
+            # are ever held for every court at once
+            yield '{"date_from": %s, "date_to": %s, "courts": [' % (
+                json.dumps(str(date_from)), json.dumps(str(date_to)))
+            occupancy_rows = iter_occupancy_matrix(
+                [court[0] for court in courts], date_from, date_to)
+            for index, ((court_id, name, opening, closing),
+                        (_, occupancies)) in enumerate(zip(courts, occupancy_rows)):
+                row = {
+                    'court_id': court_id,
+                    'court_name': name,
+                    'days': [{
+                        'date': str(day),
+                        'available_slots': [{
+                            'start_time': str(start),
+                            'end_time': str(end)
+                        } for start, end in free_intervals(
+                            occupancy, opening, closing
+                        )]
+                    } for day, occupancy in zip(days, occupancies)]
+                }
+                yield (',' if index else '') + json.dumps(row)
+            yield ']}'
+
+        return StreamingHttpResponse(stream(), content_type='application/json')
+
     @extend_schema(
         summary="Add court manager",
         description="Court owners can add managers to their courts"
@@ -495,7 +826,7 @@ class CourtViewSet(viewsets.ModelViewSet):
             )
 
 
-class CourtReviewViewSet(viewsets.ModelViewSet):
+class CourtReviewViewSet(CachedResponseMixin, viewsets.ModelViewSet):
     """
     ViewSet for Court Reviews
     Addresses User Story: 19, 39 - Review courts and respond to reviews
@@ -506,6 +837,7 @@ class CourtReviewViewSet(viewsets.ModelViewSet):
     filter_backends = [filters.OrderingFilter]
     ordering_fields = ['created_at', 'rating']
     ordering = ['-created_at']
+    pagination_class = CursorOrPageNumberPagination
 
     def get_queryset(self):
         queryset = CourtReview.objects.filter(is_visible=True)
@@ -516,6 +848,9 @@ class CourtReviewViewSet(viewsets.ModelViewSet):
 
         return queryset.select_related('player', 'court')
 
+    def get_response_cache_scopes(self):
+        return [f'reviews:{self.kwargs.get("court_pk")}']
+
     @extend_schema(
         summary="Create court review",
         description="Players can review courts they have booked"
@@ -546,9 +881,8 @@ class CourtReviewViewSet(viewsets.ModelViewSet):
     def respond(self, request, pk=None):
         """Court owner responds to a review"""
         review = self.get_object()
-        court = review.court
 
-        if not request.user.can_manage_court(court):
+        if not request.user.can_manage_court(review.court_id):
             return Response(
                 {'error': 'Only court owner/manager can respond to reviews'},
                 status=status.HTTP_403_FORBIDDEN
@@ -578,6 +912,46 @@ class CourtReviewViewSet(viewsets.ModelViewSet):
             'message': 'Review flagged for moderation'
         })
 
+    @extend_schema(
+        summary="Moderate reviews",
+        description="Approve, hide or flag several of the court's reviews at "
+                    "once (super users only). The court's rating is "
+                    "recalculated once for the whole batch.",
+        request=ReviewModerationSerializer
+    )
+    @action(detail=False, methods=['post'])
+    def moderate(self, request, court_pk=None):
+        """Bulk moderate reviews of this court"""
+        if not request.user.is_super_user:
+            return Response(
+                {'error': 'Only super users can moderate reviews'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        serializer = ReviewModerationSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        # Hidden reviews too, unlike get_queryset()
+        reviews = CourtReview.objects.filter(
+            court_id=court_pk, id__in=serializer.validated_data['review_ids'])
+        updated, court_ids = moderate_reviews(
+            reviews,
+            serializer.validated_data['action'],
+            serializer.validated_data.get('reason', '')
+        )
+
+        courts = Court.objects.filter(id__in=court_ids).values_list(
+            'id', 'name', 'average_rating', 'total_reviews')
+        return Response({
+            'message': f'{updated} review(s) updated',
+            'updated': updated,
+            'courts': [
+                {'id': court_id, 'name': name,
+                 'average_rating': str(rating), 'total_reviews': count}
+                for court_id, name, rating, count in courts
+            ]
+        })
+
     # Create queryset
     def perform_create(self, serializer):
         serializer.save(
@@ -0,0 +1,232 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime, time
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    """
+    DjangoJSONEncoder cuts times down to milliseconds; a cursor must keep
+    the exact key or rows tying on it are skipped or repeated
+    """
+
+    def default(self, o):
+        if isinstance(o, (datetime, time)):
+            return o.isoformat()
+        return super().default(o)
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset ("seek") pagination over a unique composite ordering such as
+    (booking_date, start_time, id). Each page filters on the last row's
+    key instead of using OFFSET, so deep pages cost the same as the first
+    one given an index that matches the ordering.
+
+    The ordering must end in a unique field. Only forward links are
+    returned; clients page backwards by keeping earlier cursors.
+    """
+    page_size = api_settings.PAGE_SIZE or 20
+    max_page_size = 100
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    ordering = ('-id',)
+    invalid_cursor_message = 'Invalid cursor'
+
+    def __init__(self, ordering=None):
+        if ordering is not None:
+            self.ordering = tuple(ordering)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.model = queryset.model
+        page_size = self.get_page_size(request)
+
+        cursor = self.decode_cursor(request)
+        if cursor is not None:
+            queryset = queryset.filter(self.seek_filter(cursor))
+
+        rows = list(queryset.order_by(*self.ordering)[:page_size + 1])
+        self.has_next = len(rows) > page_size
+        self.page = rows[:page_size]
+        return self.page
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    def seek_filter(self, values):
+        """Rows strictly after the given key in this ordering"""
+        condition = Q()
+        equal = {}
+        for field, value in zip(self.ordering, values):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        return condition
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            raw = json.loads(urlsafe_b64decode(encoded.encode()).decode())
+            if len(raw) != len(self.ordering):
+                raise ValueError
+            return [
+                self.model._meta.get_field(field.lstrip('-')).to_python(value)
+                for field, value in zip(self.ordering, raw)
+            ]
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, instance):
+        values = [getattr(instance, field.lstrip('-'))
+                  for field in self.ordering]
+        raw = json.dumps(values, cls=CursorEncoder)
+        return urlsafe_b64encode(raw.encode()).decode()
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(
+            url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
+
+    def get_first_link(self):
+        return remove_query_param(
+            self.request.build_absolute_uri(), self.cursor_query_param)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'first': self.get_first_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'first': {'type': 'string', 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Cursor from the previous page\'s next link',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.page_size_query_param,
+                'required': False,
+                'in': 'query',
+                'description': f'Number of results per page (max {self.max_page_size})',
+                'schema': {'type': 'integer'},
+            },
+        ]
+
+
+class RankedResults:
+    """
+    The rows of a queryset in a precomputed order of ids, such as
+    distance or search relevance computed outside the database. Page
+    number pagination slices it like a list; only the rows of the
+    requested slice are fetched, with one small id__in query, instead
+    of ordering the whole table by a CASE over every id.
+    """
+
+    def __init__(self, queryset, ids):
+        self.queryset = queryset
+        self.ids = list(ids)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        ids = self.ids[index]
+        rows = self.queryset.order_by().in_bulk(ids)
+        return [rows[row_id] for row_id in ids if row_id in rows]
+
+
+def keyset_ordering(queryset):
+    """
+    The queryset's ordering with id appended as a tiebreaker, for use
+    as a keyset. None if it orders by anything but plain model fields.
+    """
+    ordering = list(queryset.query.order_by or queryset.model._meta.ordering)
+    for field in ordering:
+        if not isinstance(field, str) or '__' in field or '?' in field:
+            return None
+    names = [field.lstrip('-') for field in ordering]
+    if 'id' not in names and 'pk' not in names:
+        descending = bool(ordering) and ordering[-1].startswith('-')
+        ordering.append('-id' if descending else 'id')
+    return tuple(ordering)
+
+
+class CursorOrPageNumberPagination(PageNumberPagination):
+    """
+    Page numbers by default, keyset pagination once the client sends a
+    cursor parameter (an empty ?cursor= asks for the first page). The
+    keyset follows whatever ordering the view applied, so ?ordering=
+    keeps working, and skips the COUNT(*) and OFFSET scan that make
+    deep page-number requests slow on large tables.
+    """
+    keyset_class = KeysetPagination
+    # Both styles take the same page size parameter
+    page_size_query_param = KeysetPagination.page_size_query_param
+    max_page_size = KeysetPagination.max_page_size
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        ordering = keyset_ordering(queryset)
+        if ordering is not None:
+            if self.keyset_class.cursor_query_param in request.query_params:
+                self.keyset = self.keyset_class(ordering=ordering)
+                return self.keyset.paginate_queryset(queryset, request, view)
+            # The same tiebreaker keeps rows from moving between pages
+            queryset = queryset.order_by(*ordering)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def get_paginated_response_schema(self, schema):
+        page_schema = super().get_paginated_response_schema(schema)
+        page_schema['properties']['first'] = {
+            'type': 'string', 'format': 'uri',
+            'description': 'Only present when paginating by cursor',
+        }
+        return page_schema
+
+    def get_schema_operation_parameters(self, view):
+        parameters = super().get_schema_operation_parameters(view)
+        names = {parameter['name'] for parameter in parameters}
+        return parameters + [
+            parameter
+            for parameter in self.keyset_class().get_schema_operation_parameters(view)
+            if parameter['name'] not in names
+        ]
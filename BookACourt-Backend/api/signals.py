@@ -0,0 +1,70 @@
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from court_management.models import (
+    Court, CourtCategory, CourtImage, CourtReview, DynamicPricing,
+    EquipmentItem
+)
+from .caching import bump_generations
+
+
+@receiver(post_save, sender=Court)
+@receiver(post_delete, sender=Court)
+def invalidate_court_responses(sender, instance, update_fields=None, **kwargs):
+    """
+    Drop cached court list/detail responses when a court changes
+    """
+    scopes = ['courts', f'court:{instance.id}']
+    if update_fields is None or {'is_active', 'category'} & set(update_fields):
+        scopes.append('categories')
+    bump_generations(*scopes)
+
+
+@receiver(m2m_changed, sender=Court.managers.through)
+def invalidate_court_responses_on_managers_change(sender, instance, action, **kwargs):
+    """
+    Court detail lists the managers
+    """
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_generations(f'court:{instance.id}')
+
+
+@receiver(post_save, sender=CourtImage)
+@receiver(post_delete, sender=CourtImage)
+def invalidate_court_responses_on_image_change(sender, instance, **kwargs):
+    """
+    Images appear in court detail, and the primary one in the list
+    """
+    bump_generations('courts', f'court:{instance.court_id}')
+
+
+@receiver(post_save, sender=DynamicPricing)
+@receiver(post_delete, sender=DynamicPricing)
+@receiver(post_save, sender=EquipmentItem)
+@receiver(post_delete, sender=EquipmentItem)
+def invalidate_court_detail_on_child_change(sender, instance, **kwargs):
+    """
+    Pricing rules and equipment only appear in court detail
+    """
+    bump_generations(f'court:{instance.court_id}')
+
+
+@receiver(post_save, sender=CourtCategory)
+@receiver(post_delete, sender=CourtCategory)
+def invalidate_category_responses(sender, instance, **kwargs):
+    """
+    Categories are listed on their own, nested in court detail and
+    named in the court list
+    """
+    bump_generations('categories', 'courts')
+
+
+@receiver(post_save, sender=CourtReview)
+@receiver(post_delete, sender=CourtReview)
+def invalidate_review_responses(sender, instance, **kwargs):
+    """
+    Drop the cached review list of the review's court, and the court
+    itself since its rating and review summary are updated without signals
+    """
+    bump_generations(
+        f'reviews:{instance.court_id}', 'courts', f'court:{instance.court_id}')
@@ -1,3 +1,814 @@
-from django.test import TestCase
+from datetime import time, timedelta
+import json
+import os
+import time as clock
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.test import APITestCase
+
+from api.caching import GENERATION_KEY_PREFIX
+from BookACourt.testing import (
+    future_date, make_booking, make_court, make_owner, make_player
+)
+from court_management.access import managed_court_ids
+from court_management.models import (
+    Court, CourtBlockedSlot, CourtCategory, CourtImage, CourtReview
+)
+from court_management.moderation import moderate_reviews
+from court_management.ratings import recalculate_ratings
+from user_management.models import User, UserRole
+
+
+class CourtListQueryCountTests(APITestCase):
+    """The court list must not issue a query per court"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = make_owner()
+
+    def setUp(self):
+        cache.clear()
+
+    def create_courts(self, count):
+        for index in range(count):
+            court = make_court(
+                self.owner, name=f'Court {Court.objects.count()}')
+            CourtImage.objects.create(
+                court=court, image='court_images/side.jpg')
+            CourtImage.objects.create(
+                court=court, image='court_images/primary.jpg', is_primary=True)
+
+    def list_courts(self):
+        # Measure the uncached path; on_commit invalidation never runs
+        # inside a TestCase transaction anyway
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/courts/courts/')
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def test_query_count_does_not_grow_with_courts(self):
+        self.create_courts(2)
+        _, few = self.list_courts()
+
+        self.create_courts(8)
+        response, many = self.list_courts()
+
+        self.assertEqual(response.json()['count'], 10)
+        self.assertEqual(few, many)
+        # Count, page and the primary image prefetch
+        self.assertEqual(many, 3)
+
+    def test_primary_image_is_returned(self):
+        self.create_courts(1)
+        response, _ = self.list_courts()
+
+        primary_image = response.json()['results'][0]['primary_image']
+        self.assertTrue(primary_image.endswith('court_images/primary.jpg'))
+
+
+class CourtAvailabilityFilterTests(APITestCase):
+    """?date= narrows the court list but not the detail actions"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.court = make_court(make_owner())
+        cls.date = future_date()
+        make_booking(cls.court, make_player(), cls.date)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_available_slots_accepts_date(self):
+        response = self.client.get(
+            f'/api/courts/courts/{self.court.pk}/available_slots/',
+            {'date': self.date.isoformat()}
+        )
+        self.assertEqual(response.status_code, 200)
+        starts = [slot['start_time'] for slot in response.json()['available_slots']]
+        self.assertIn('09:00:00', starts)
+        self.assertNotIn('10:00:00', starts)
+
+    def test_available_slots_of_busy_court(self):
+        # start_time/end_time meant for the list must not hide the court
+        response = self.client.get(
+            f'/api/courts/courts/{self.court.pk}/available_slots/',
+            {'date': self.date.isoformat(),
+             'start_time': '10:00', 'end_time': '11:00'}
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_list_filters_by_availability(self):
+        params = {'date': self.date.isoformat(), 'start_time': '10:00'}
+        busy = self.client.get(
+            '/api/courts/courts/', {**params, 'end_time': '11:00'})
+        self.assertEqual(busy.json()['count'], 0)
+
+        params['start_time'] = '12:00'
+        free = self.client.get(
+            '/api/courts/courts/', {**params, 'end_time': '13:00'})
+        self.assertEqual(free.json()['count'], 1)
+
+
+class ConditionalGetTests(APITestCase):
+    """Per-user lists revalidate on their ETag, never on a timestamp"""
+
+    @classmethod
+    def setUpTestData(cls):
+        from booking_management.models import BookingNotification
+
+        cls.player = make_player()
+        booking = make_booking(make_court(make_owner()), cls.player)
+        cls.notification = BookingNotification.objects.create(
+            booking=booking,
+            user=cls.player,
+            notification_type='CONFIRMATION',
+            message='Confirmed'
+        )
+
+    def setUp(self):
+        self.client.force_authenticate(self.player)
+
+    def test_unread_changes_after_mark_read(self):
+        url = '/api/bookings/notifications/unread/'
+        first = self.client.get(url)
+        self.assertEqual(len(first.json()), 1)
+        self.assertNotIn('Last-Modified', first)
+
+        cached = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(cached.status_code, 304)
+
+        self.client.post(
+            f'/api/bookings/notifications/{self.notification.pk}/mark_read/')
+        response = self.client.get(
+            url,
+            HTTP_IF_NONE_MATCH=first['ETag'],
+            HTTP_IF_MODIFIED_SINCE='Fri, 01 Jan 2100 00:00:00 GMT'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), [])
+
+    def test_if_modified_since_is_ignored(self):
+        response = self.client.get(
+            '/api/bookings/bookings/my_bookings/',
+            HTTP_IF_MODIFIED_SINCE='Fri, 01 Jan 2100 00:00:00 GMT'
+        )
+        self.assertEqual(response.status_code, 200)
+
+
+class CourtResponseCacheTests(APITestCase):
+    """Cached catalogue responses, their validators and invalidation"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = make_owner()
+        cls.category = CourtCategory.objects.create(name='Tennis')
+        cls.court = make_court(cls.owner, category=cls.category)
+
+    def setUp(self):
+        cache.clear()
+        # Scopes last bumped a minute ago, so responses carry Last-Modified
+        for scope in ['courts', 'categories', f'court:{self.court.pk}']:
+            cache.set(f'{GENERATION_KEY_PREFIX}:{scope}',
+                      clock.time_ns() - 60 * 10 ** 9, None)
+
+    def test_second_request_is_a_hit(self):
+        first = self.client.get('/api/courts/courts/')
+        second = self.client.get('/api/courts/courts/')
+        self.assertEqual(first['X-Cache'], 'MISS')
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(first['ETag'], second['ETag'])
+        self.assertEqual(first.content, second.content)
+
+    def test_matching_validators_get_304(self):
+        first = self.client.get('/api/courts/courts/')
+        self.assertEqual(self.client.get(
+            '/api/courts/courts/', HTTP_IF_NONE_MATCH=first['ETag']
+        ).status_code, 304)
+        self.assertEqual(self.client.get(
+            '/api/courts/courts/', HTTP_IF_MODIFIED_SINCE=first['Last-Modified']
+        ).status_code, 304)
+
+    def test_fresh_generation_has_no_last_modified(self):
+        cache.clear()
+        response = self.client.get('/api/courts/courts/')
+        self.assertNotIn('Last-Modified', response)
+
+    def test_bulk_deactivation_invalidates_category_counts(self):
+        from court_management.admin import CourtAdmin
+
+        url = '/api/courts/categories/'
+        first = self.client.get(url)
+        self.assertEqual(first.json()['results'][0]['court_count'], 1)
+
+        admin = CourtAdmin(Court, None)
+        with mock.patch.object(admin, 'message_user'), \
+                self.captureOnCommitCallbacks(execute=True):
+            admin.deactivate_courts(None, Court.objects.all())
+
+        response = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json()['results'][0]['court_count'], 0)
+
+    def test_related_row_invalidates_court_detail(self):
+        url = f'/api/courts/courts/{self.court.pk}/'
+        first = self.client.get(url)
+        self.assertEqual(first.json()['images'], [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            CourtImage.objects.create(
+                court=self.court, image='court_images/side.jpg')
+
+        response = self.client.get(
+            url,
+            HTTP_IF_NONE_MATCH=first['ETag'],
+            HTTP_IF_MODIFIED_SINCE=first['Last-Modified']
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['images']), 1)
+
+
+class AvailabilityMatrixTests(APITestCase):
+    """The matrix streams per court and stays within its size cap"""
+
+    @classmethod
+    def setUpTestData(cls):
+        owner = make_owner()
+        cls.courts = [
+            make_court(owner, name=f'Court {index}') for index in range(3)
+        ]
+        cls.date = future_date()
+        CourtBlockedSlot.objects.create(
+            court=cls.courts[0],
+            blocked_date=cls.date,
+            start_time=time(10),
+            end_time=time(11)
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def get_matrix(self, days, **params):
+        return self.client.get('/api/courts/courts/availability_matrix/', {
+            'date_from': self.date.isoformat(),
+            'date_to': (self.date + timedelta(days=days - 1)).isoformat(),
+            **params
+        })
+
+    def test_rows_match_occupancy(self):
+        response = self.get_matrix(2)
+        self.assertEqual(response.status_code, 200)
+        rows = {
+            row['court_id']: row['days']
+            for row in json.loads(b''.join(response.streaming_content))['courts']
+        }
+        self.assertEqual(set(rows), {court.id for court in self.courts})
+
+        blocked_day = rows[self.courts[0].id][0]
+        starts = [slot['start_time'] for slot in blocked_day['available_slots']]
+        self.assertNotIn('10:00:00', starts)
+        self.assertIn('10:00:00', [
+            slot['start_time']
+            for slot in rows[self.courts[1].id][0]['available_slots']])
+        self.assertEqual(len(rows[self.courts[0].id]), 2)
+
+    def test_per_day_cache_is_left_alone(self):
+        with mock.patch('court_management.occupancy.cache') as occupancy_cache:
+            b''.join(self.get_matrix(7).streaming_content)
+        occupancy_cache.set.assert_not_called()
+        occupancy_cache.set_many.assert_not_called()
+
+    def test_too_many_court_days_is_rejected(self):
+        with mock.patch('api.court_views.MAX_MATRIX_CELLS', 6):
+            self.assertEqual(self.get_matrix(2).status_code, 200)
+            response = self.get_matrix(3)
+        self.assertEqual(response.status_code, 400)
+
+
+class NearbyCourtTests(APITestCase):
+    """Nearby searches rank by distance without a CASE over every court"""
+
+    @classmethod
+    def setUpTestData(cls):
+        owner = make_owner()
+        # Ten courts heading north, about 1.1 km apart, created out of order
+        for index in [3, 7, 0, 9, 5, 1, 8, 2, 6, 4]:
+            make_court(
+                owner,
+                name=f'Court {index}',
+                base_hourly_rate=100 + index,
+                latitude=27.7 + index * 0.01,
+                longitude=85.3
+            )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_pages_are_ordered_by_distance(self):
+        params = {'lat': '27.7', 'lng': '85.3', 'radius': '5'}
+        with mock.patch.object(PageNumberPagination, 'page_size', 3):
+            with CaptureQueriesContext(connection) as queries:
+                first = self.client.get('/api/courts/courts/', params).json()
+            second = self.client.get(
+                '/api/courts/courts/', {**params, 'page': 2}).json()
+
+        # Beyond 5 km is cut off although it is inside the bounding box
+        self.assertEqual(first['count'], 5)
+        names = [court['name'] for court in first['results'] + second['results']]
+        self.assertEqual(names, [f'Court {index}' for index in range(5)])
+        self.assertFalse(any('CASE' in query['sql'] for query in queries))
+
+    def test_explicit_ordering_wins(self):
+        response = self.client.get('/api/courts/courts/', {
+            'lat': '27.7', 'lng': '85.3', 'radius': '5',
+            'ordering': '-base_hourly_rate'
+        })
+        names = [court['name'] for court in response.json()['results']]
+        self.assertEqual(names, [f'Court {index}' for index in range(4, -1, -1)])
+
+
+class CourtSearchTests(APITestCase):
+    """Text search keeps every match, in relevance order"""
+
+    @classmethod
+    def setUpTestData(cls):
+        owner = make_owner()
+        for name, description, rate in [
+            ('Lakeside Club', 'Clay tennis court', 300),
+            ('Tennis Centre', '', 100),
+            ('Futsal Arena', 'Indoor futsal', 200),
+            ('Riverside Tennis', '', 200),
+        ]:
+            make_court(
+                owner,
+                name=name,
+                description=description,
+                court_type='Sports',
+                base_hourly_rate=rate
+            )
+
+    def setUp(self):
+        cache.clear()
+
+    def search(self, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/courts/courts/', params)
+        self.assertFalse(any('CASE' in query['sql'] for query in queries))
+        return response.json()
+
+    def test_results_are_ranked_by_relevance(self):
+        body = self.search(search='tennis')
+        self.assertEqual(body['count'], 3)
+        names = [court['name'] for court in body['results']]
+        # Name matches outrank description matches
+        self.assertEqual(names[-1], 'Lakeside Club')
+
+    def test_ordering_and_filters_apply_to_matches(self):
+        body = self.search(search='tennis', ordering='-base_hourly_rate',
+                           max_price=250)
+        names = [court['name'] for court in body['results']]
+        self.assertEqual(names, ['Riverside Tennis', 'Tennis Centre'])
+
+    def test_mysql_leaves_out_unindexed_terms(self):
+        from court_management.search import MySQLFullTextBackend
+
+        backend = MySQLFullTextBackend()
+        self.assertEqual(backend.boolean_query('5 a side'), '+side*')
+        self.assertEqual(backend.boolean_query('5 a'), '')
+
+    def test_mysql_without_matches_falls_back_to_typos(self):
+        from court_management.search import MySQLFullTextBackend
+
+        backend = MySQLFullTextBackend()
+        with mock.patch('court_management.search._backend', backend), \
+                mock.patch.object(backend, 'has_matches', return_value=False):
+            body = self.search(search='tenis')
+        self.assertEqual(body['count'], 3)
+        self.assertEqual(body['results'][-1]['name'], 'Lakeside Club')
+
+
+class SlotHoldTests(APITestCase):
+    """Holds reserve a slot for one player until they book or expire"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.court = make_court(make_owner())
+        cls.player = make_player()
+        cls.other = make_player(1)
+        cls.date = future_date()
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(self.player)
+
+    def slot(self, start=10, end=11):
+        return {
+            'court': self.court.pk,
+            'hold_date': self.date.isoformat(),
+            'start_time': f'{start:02d}:00',
+            'end_time': f'{end:02d}:00',
+        }
+
+    def hold(self, start=10, end=11):
+        return self.client.post('/api/bookings/holds/', self.slot(start, end))
+
+    def book(self, hold_token=None, start=10, end=11):
+        data = self.slot(start, end)
+        data['booking_date'] = data.pop('hold_date')
+        if hold_token:
+            data['hold_token'] = hold_token
+        return self.client.post('/api/bookings/bookings/', data)
+
+    def expire_holds(self):
+        from booking_management.models import SlotHold
+
+        SlotHold.objects.update(
+            expires_at=timezone.now() - timedelta(seconds=1))
+
+    def test_hold_converts_to_booking(self):
+        from booking_management.models import Booking, SlotHold
+
+        token = self.hold().json()['hold_token']
+        response = self.book(token)
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(SlotHold.objects.exists())
+        self.assertTrue(Booking.objects.filter(
+            player=self.player, start_time=time(10)).exists())
+
+    def test_other_players_hold_is_refused(self):
+        token = self.hold().json()['hold_token']
+
+        self.client.force_authenticate(self.other)
+        self.assertEqual(self.book(token).status_code, 400)
+        self.assertEqual(self.book().status_code, 400)
+        self.assertEqual(self.hold().status_code, 400)
+
+    def test_expired_hold(self):
+        token = self.hold().json()['hold_token']
+        self.expire_holds()
+
+        self.assertEqual(self.book(token).status_code, 400)
+        # The slot is free again for everyone else
+        self.client.force_authenticate(self.other)
+        self.assertEqual(self.book().status_code, 201)
+
+    @override_settings(SLOT_HOLD_MAX_ACTIVE=2)
+    def test_active_holds_are_capped(self):
+        self.assertEqual(self.hold(10, 11).status_code, 201)
+        self.assertEqual(self.hold(12, 13).status_code, 201)
+        response = self.hold(14, 15)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('at most 2', response.json()['non_field_errors'][0])
+
+        self.expire_holds()
+        self.assertEqual(self.hold(14, 15).status_code, 201)
+
+    def test_sweep_removes_only_expired_holds(self):
+        from booking_management.models import SlotHold
+
+        self.hold(10, 11)
+        self.expire_holds()
+        live = self.hold(12, 13).json()['hold_token']
+
+        call_command('sweep_slot_holds', stdout=open(os.devnull, 'w'))
+        self.assertEqual(
+            list(SlotHold.objects.values_list('hold_token', flat=True)),
+            [live])
+
+
+class PartialSlotConflictTests(APITestCase):
+    """Bookings sharing a 15-minute slot only clash if they overlap"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.court = make_court(make_owner())
+        cls.player = make_player()
+        cls.date = future_date()
+        make_booking(cls.court, make_player(1), cls.date,
+                     time(10), time(10, 5))
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(self.player)
+
+    def slot(self, start, end, date_field='booking_date'):
+        return {
+            'court': self.court.pk,
+            date_field: self.date.isoformat(),
+            'start_time': start,
+            'end_time': end,
+        }
+
+    def test_adjacent_booking_and_hold_are_accepted(self):
+        hold = self.client.post(
+            '/api/bookings/holds/', self.slot('10:05', '10:30', 'hold_date'))
+        self.assertEqual(hold.status_code, 201)
+        self.client.delete(f"/api/bookings/holds/{hold.json()['id']}/")
+
+        response = self.client.post(
+            '/api/bookings/bookings/', self.slot('10:05', '11:00'))
+        self.assertEqual(response.status_code, 201)
+
+    def test_overlap_in_a_shared_slot_is_rejected(self):
+        for start, end in [('09:30', '10:30'), ('10:03', '10:10')]:
+            response = self.client.post(
+                '/api/bookings/bookings/', self.slot(start, end))
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('already booked',
+                          response.json()['non_field_errors'][0])
+
+    def test_check_availability(self):
+        url = f'/api/courts/courts/{self.court.pk}/check_availability/'
+        data = {'date': self.date.isoformat()}
+        free = self.client.post(
+            url, {**data, 'start_time': '10:05', 'end_time': '11:00'})
+        self.assertTrue(free.json()['available'])
+        busy = self.client.post(
+            url, {**data, 'start_time': '10:04', 'end_time': '11:00'})
+        self.assertEqual(busy.json()['booked_slots'], [
+            {'start_time': '10:00:00', 'end_time': '10:05:00'}])
+
+
+class MyBookingsPaginationTests(APITestCase):
+    """my_bookings pages by keyset without skipping rows that tie"""
+
+    @classmethod
+    def setUpTestData(cls):
+        owner = make_owner()
+        courts = [make_court(owner, name=f'Court {index}')
+                  for index in range(3)]
+        cls.player = make_player()
+        today = timezone.localdate()
+        # Three courts at the same date and time, twice, plus a later start
+        cls.upcoming = []
+        cls.past = []
+        for days in (-2, 2):
+            date = today + timedelta(days=days)
+            rows = [make_booking(court, cls.player, date) for court in courts]
+            rows.append(make_booking(courts[0], cls.player, date,
+                                     time(12), time(13)))
+            (cls.upcoming if days > 0 else cls.past).extend(rows)
+        make_booking(courts[0], make_player(1), today + timedelta(days=2),
+                     time(14), time(15))
+
+    def setUp(self):
+        self.client.force_authenticate(self.player)
+
+    def collect(self, **params):
+        response = self.client.get('/api/bookings/bookings/my_bookings/', {
+            'cursor': '', 'page_size': 2, **params})
+        ids = []
+        while True:
+            body = response.json()
+            self.assertLessEqual(len(body['results']), 2)
+            ids.extend(booking['id'] for booking in body['results'])
+            if not body['next']:
+                return ids
+            response = self.client.get(body['next'])
+
+    def test_upcoming_soonest_first(self):
+        expected = sorted(
+            self.upcoming,
+            key=lambda row: (row.booking_date, row.start_time, row.id))
+        self.assertEqual(self.collect(when='upcoming'),
+                         [booking.id for booking in expected])
+
+    def test_past_most_recent_first(self):
+        expected = sorted(
+            self.past,
+            key=lambda row: (row.booking_date, row.start_time, row.id),
+            reverse=True)
+        self.assertEqual(self.collect(when='past'),
+                         [booking.id for booking in expected])
+
+    def test_all_bookings(self):
+        ids = self.collect()
+        self.assertEqual(len(ids), 8)
+        self.assertEqual(set(ids), {
+            booking.id for booking in self.upcoming + self.past})
+
+
+class CursorOrPageTests(APITestCase):
+    """?cursor= walks the same rows in the same order as ?page="""
+
+    @classmethod
+    def setUpTestData(cls):
+        from court_management.models import CourtReview
+
+        owner = make_owner()
+        cls.court = make_court(owner)
+        second_court = make_court(owner, name='Second')
+        cls.player = make_player()
+        created_at = timezone.now() - timedelta(days=1)
+        for index, rating in enumerate([5, 3, 5, 4, 3, 5, 4]):
+            review = CourtReview.objects.create(
+                court=cls.court, player=make_player(index + 1), rating=rating)
+            # Pairs of reviews share a timestamp
+            CourtReview.objects.filter(pk=review.pk).update(
+                created_at=created_at + timedelta(hours=index // 2))
+        for index, amount in enumerate([300, 100, 300, 200, 100, 300, 200]):
+            make_booking(
+                cls.court if index % 2 else second_court, cls.player,
+                future_date(1 + index // 2), time(8 + index), time(9 + index),
+                total_amount=amount)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(self.player)
+
+    def walk(self, url, **params):
+        response = self.client.get(url, {'page_size': 2, **params})
+        ids = []
+        while True:
+            self.assertEqual(response.status_code, 200)
+            body = response.json()
+            ids.extend(row['id'] for row in body['results'])
+            if not body['next']:
+                return ids
+            response = self.client.get(body['next'])
+
+    def assertSameWalk(self, url, ordering, key):
+        by_page = self.walk(url, ordering=ordering)
+        by_cursor = self.walk(url, ordering=ordering, cursor='')
+        self.assertEqual(by_cursor, by_page)
+        self.assertEqual(by_page, key())
+
+    def test_reviews(self):
+        from court_management.models import CourtReview
+
+        url = f'/api/courts/courts/{self.court.pk}/reviews/'
+        reviews = list(CourtReview.objects.all())
+        for ordering, key in [
+            ('-created_at', lambda row: (-row.created_at.timestamp(), -row.id)),
+            ('rating,-created_at',
+             lambda row: (row.rating, -row.created_at.timestamp(), -row.id)),
+            ('-rating,created_at',
+             lambda row: (-row.rating, row.created_at.timestamp(), row.id)),
+        ]:
+            with self.subTest(ordering=ordering):
+                self.assertSameWalk(url, ordering, lambda: [
+                    row.id for row in sorted(reviews, key=key)])
+
+    def test_bookings(self):
+        from booking_management.models import Booking
+
+        bookings = list(Booking.objects.all())
+        for ordering, key in [
+            ('total_amount,-booking_date',
+             lambda row: (row.total_amount, -row.booking_date.toordinal(),
+                          -row.id)),
+            ('-total_amount,booking_date',
+             lambda row: (-row.total_amount, row.booking_date.toordinal(),
+                          row.id)),
+        ]:
+            with self.subTest(ordering=ordering):
+                self.assertSameWalk(
+                    '/api/bookings/bookings/', ordering, lambda: [
+                        row.id for row in sorted(bookings, key=key)])
+
+
+class ManagedCourtInvalidationTests(APITestCase):
+    """Cached managed court ids follow manager and owner changes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = make_owner()
+        cls.court = make_court(cls.owner)
+        cls.manager = make_player(
+            1, full_name='Manager', role=UserRole.COURT_MANAGER)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(self.owner)
+
+    def managed(self, user):
+        # A fresh instance, as each request gets, so only the cache is shared
+        return managed_court_ids(User.objects.get(pk=user.pk))
+
+    def post(self, action, user):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                f'/api/courts/courts/{self.court.pk}/{action}/',
+                {'manager_id': user.pk})
+        self.assertEqual(response.status_code, 200)
+
+    def test_add_and_remove_manager(self):
+        self.assertEqual(self.managed(self.manager), frozenset())
+
+        self.post('add_manager', self.manager)
+        self.assertEqual(self.managed(self.manager), {self.court.pk})
+
+        self.post('remove_manager', self.manager)
+        self.assertEqual(self.managed(self.manager), frozenset())
+
+    def test_owner_change(self):
+        new_owner = make_owner(phone_number='+9779800000009')
+        self.assertEqual(self.managed(self.owner), {self.court.pk})
+        self.assertEqual(self.managed(new_owner), frozenset())
+
+        self.court.owner = new_owner
+        with self.captureOnCommitCallbacks(execute=True):
+            self.court.save(update_fields=['owner'])
+        self.assertEqual(self.managed(self.owner), frozenset())
+        self.assertEqual(self.managed(new_owner), {self.court.pk})
+
+
+class ReviewModerationTests(APITestCase):
+    """Bulk moderation is for super users and recounts each court once"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = make_owner()
+        cls.court = make_court(cls.owner)
+        cls.other_court = make_court(cls.owner, name='Other court')
+        cls.admin = make_player(
+            9, full_name='Admin', role=UserRole.SUPER_USER)
+        cls.players = [make_player(index) for index in range(3)]
+
+    def setUp(self):
+        cache.clear()
+        self.reviews = [
+            CourtReview.objects.create(
+                court=self.court, player=player, rating=rating)
+            for player, rating in zip(self.players, [5, 2, 4])
+        ]
+        self.other_review = CourtReview.objects.create(
+            court=self.other_court, player=self.players[0], rating=1)
+
+    def moderate(self, user, review_ids, action, **extra):
+        self.client.force_authenticate(user)
+        with mock.patch(
+            'court_management.moderation.recalculate_ratings',
+            wraps=recalculate_ratings
+        ) as recalculate:
+            response = self.client.post(
+                f'/api/courts/courts/{self.court.pk}/reviews/moderate/',
+                {'review_ids': review_ids, 'action': action, **extra},
+                format='json')
+        return response, recalculate
+
+    def test_only_super_users(self):
+        ids = [review.pk for review in self.reviews]
+        for user in [self.owner, self.players[0]]:
+            response, recalculate = self.moderate(user, ids, 'hide')
+            self.assertEqual(response.status_code, 403)
+            recalculate.assert_not_called()
+        self.assertFalse(CourtReview.objects.filter(is_visible=False).exists())
+
+    def test_hide_recalculates_once(self):
+        # The other court's review is out of scope for this court's endpoint
+        ids = [self.reviews[1].pk, self.reviews[2].pk, self.other_review.pk]
+        response, recalculate = self.moderate(self.admin, ids, 'hide')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['updated'], 2)
+        recalculate.assert_called_once_with({self.court.pk})
+        self.assertEqual(response.data['courts'], [{
+            'id': self.court.pk, 'name': 'Court',
+            'average_rating': '5.00', 'total_reviews': 1}])
+        self.other_review.refresh_from_db()
+        self.assertTrue(self.other_review.is_visible)
+
+        # Already hidden reviews are skipped
+        response, _ = self.moderate(self.admin, ids, 'hide')
+        self.assertEqual(response.data['updated'], 0)
+
+    def test_flag_keeps_ratings(self):
+        response, recalculate = self.moderate(
+            self.admin, [self.reviews[0].pk], 'flag', reason='Spam')
+
+        self.assertEqual(response.data['updated'], 1)
+        recalculate.assert_not_called()
+        self.reviews[0].refresh_from_db()
+        self.assertEqual(
+            (self.reviews[0].is_flagged, self.reviews[0].flag_reason),
+            (True, 'Spam'))
+
+    def test_one_recalculation_for_several_courts(self):
+        reviews = CourtReview.objects.filter(
+            pk__in=[self.reviews[0].pk, self.reviews[1].pk,
+                    self.other_review.pk])
+        with mock.patch(
+            'court_management.moderation.recalculate_ratings',
+            wraps=recalculate_ratings
+        ) as recalculate:
+            updated, court_ids = moderate_reviews(reviews, 'hide')
+
+        self.assertEqual(updated, 3)
+        self.assertEqual(
+            court_ids, sorted([self.court.pk, self.other_court.pk]))
+        recalculate.assert_called_once_with(
+            {self.court.pk, self.other_court.pk})
+        self.assertEqual(
+            list(Court.objects.order_by('pk').values_list(
+                'rating_sum', 'total_reviews')),
+            [(4, 1), (0, 0)])
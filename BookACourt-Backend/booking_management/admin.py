@@ -2,6 +2,7 @@ from django.contrib import admin
 from django.utils.html import format_html
 from django.db.models import Count, Sum
 from django.utils import timezone
+from court_management.occupancy import invalidate_days
 from .models import (
     Booking, CancellationPolicy, BookingNotification, EquipmentRental,
     MatchEvent, MatchParticipant, PlayerRating, BookingShare, RecurringBooking
@@ -116,7 +117,8 @@ class BookingAdmin(admin.ModelAdmin):
 
     def confirm_bookings(self, request, queryset):
         """Confirm pending bookings"""
-        updated = queryset.filter(status='PENDING').update(status='CONFIRMED')
+        updated = queryset.filter(status='PENDING').update(
+            status='CONFIRMED', updated_at=timezone.now())
         self.message_user(request, f'{updated} booking(s) confirmed.')
     confirm_bookings.short_description = 'Confirm selected bookings'
 
@@ -133,14 +135,17 @@ class BookingAdmin(admin.ModelAdmin):
 
     def mark_completed(self, request, queryset):
         """Mark bookings as completed"""
-        updated = queryset.update(status='COMPLETED')
+        # Bulk update() skips signals, so free the slots explicitly
+        invalidate_days(queryset.values_list('court_id', 'booking_date'))
+        updated = queryset.update(status='COMPLETED', updated_at=timezone.now())
         self.message_user(
             request, f'{updated} booking(s) marked as completed.')
     mark_completed.short_description = 'Mark as completed'
 
     def mark_no_show(self, request, queryset):
         """User Story 24: Mark no-shows"""
-        updated = queryset.update(status='NO_SHOW')
+        invalidate_days(queryset.values_list('court_id', 'booking_date'))
+        updated = queryset.update(status='NO_SHOW', updated_at=timezone.now())
 
         # Update player stats
         for booking in queryset:
@@ -371,7 +376,7 @@ class MatchParticipantInline(admin.TabularInline):
     """Inline for match participants"""
     model = MatchParticipant
     extra = 0
-    fields = ('player', 'is_confirmed', 'attended', 'joined_at')
+    fields = ('player', 'is_confirmed', 'is_waitlisted', 'attended', 'joined_at')
     readonly_fields = ('joined_at',)
 
 
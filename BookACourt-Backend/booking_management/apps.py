@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class BookingManagementConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'booking_management'
+
+    def ready(self):
+        """Import signals when app is ready"""
+        import booking_management.signals
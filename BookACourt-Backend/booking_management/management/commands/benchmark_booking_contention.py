@@ -0,0 +1,147 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+from rest_framework import serializers
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+import random
+import statistics
+import time
+
+from api.booking_serializers import BookingCreateSerializer
+from booking_management.models import Booking, CourtDayLock
+from court_management.models import Court
+from user_management.models import User, UserRole
+
+
+class Command(BaseCommand):
+    help = 'Fire concurrent overlapping booking requests at one court/day and report contention'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--court',
+            type=int,
+            help='Court ID to book (defaults to the first active court)'
+        )
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=200,
+            help='Number of booking attempts'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=20,
+            help='Number of concurrent workers'
+        )
+        parser.add_argument(
+            '--days-ahead',
+            type=int,
+            default=180,
+            help='Book this many days in the future to avoid real data'
+        )
+        parser.add_argument(
+            '--keep',
+            action='store_true',
+            help='Keep the created bookings instead of deleting them'
+        )
+
+    def handle(self, *args, **kwargs):
+        courts = Court.objects.filter(is_active=True)
+        if kwargs['court']:
+            courts = courts.filter(id=kwargs['court'])
+        court = courts.first()
+        if not court:
+            raise CommandError('No active court found.')
+
+        players = list(User.objects.filter(role=UserRole.PLAYER)[:50])
+        if not players:
+            raise CommandError('No players found. Please run seed_users first.')
+
+        booking_date = timezone.now().date() + timedelta(days=kwargs['days_ahead'])
+        opening = datetime.combine(booking_date, court.opening_time)
+        closing = datetime.combine(booking_date, court.closing_time)
+        # Half-hour offsets with one-hour bookings guarantee overlaps
+        starts = []
+        current = opening
+        while current + timedelta(hours=1) <= closing:
+            starts.append(current)
+            current += timedelta(minutes=30)
+        if not starts:
+            raise CommandError('Court is open for less than an hour.')
+
+        def attempt(_):
+            start = random.choice(starts)
+            player = random.choice(players)
+            serializer = BookingCreateSerializer(
+                data={
+                    'court': court.id,
+                    'booking_date': booking_date,
+                    'start_time': start.time(),
+                    'end_time': (start + timedelta(hours=1)).time(),
+                    'payment_method': 'CASH',
+                },
+                context={'request': SimpleNamespace(user=player)}
+            )
+            began = time.perf_counter()
+            booking_id = None
+            try:
+                if serializer.is_valid():
+                    booking_id = serializer.save().id
+                    outcome = 'created'
+                else:
+                    outcome = 'rejected'
+            except serializers.ValidationError:
+                outcome = 'rejected'
+            except Exception:
+                outcome = 'error'
+            finally:
+                connection.close()
+            return outcome, time.perf_counter() - began, booking_id
+
+        self.stdout.write(
+            f'Booking {court.name} on {booking_date}: '
+            f'{kwargs["requests"]} requests, {kwargs["workers"]} workers'
+        )
+
+        began = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=kwargs['workers']) as pool:
+            results = list(pool.map(attempt, range(kwargs['requests'])))
+        elapsed = time.perf_counter() - began
+
+        latencies = sorted(duration * 1000 for _, duration, _ in results)
+        outcomes = [outcome for outcome, _, _ in results]
+        created_ids = [booking_id for _, _, booking_id in results if booking_id]
+
+        bookings = list(Booking.overlapping(
+            court, booking_date, court.opening_time, court.closing_time
+        ).order_by('start_time').values_list('start_time', 'end_time'))
+        overlaps = sum(
+            1 for previous, following in zip(bookings, bookings[1:])
+            if following[0] < previous[1]
+        )
+
+        self.stdout.write(f'  Created:   {outcomes.count("created")}')
+        self.stdout.write(f'  Rejected:  {outcomes.count("rejected")}')
+        self.stdout.write(f'  Errors:    {outcomes.count("error")}')
+        self.stdout.write(f'  Wall time: {elapsed:.2f}s '
+                          f'({len(results) / elapsed:.1f} req/s)')
+        self.stdout.write(
+            f'  Latency:   p50 {statistics.median(latencies):.1f}ms, '
+            f'p95 {latencies[int(len(latencies) * 0.95) - 1]:.1f}ms, '
+            f'max {latencies[-1]:.1f}ms'
+        )
+
+        if overlaps:
+            self.stdout.write(self.style.ERROR(
+                f'  Overlapping bookings: {overlaps}'))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                '  Overlapping bookings: 0'))
+
+        if not kwargs['keep']:
+            Booking.objects.filter(id__in=created_ids).delete()
+            CourtDayLock.objects.filter(
+                court=court, lock_date=booking_date).delete()
@@ -0,0 +1,161 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+from datetime import datetime, timedelta
+import statistics
+import time
+
+from api.booking_views import BookingViewSet
+from api.pagination import KeysetPagination, keyset_ordering
+from booking_management.models import Booking
+from court_management.models import Court
+from user_management.models import User, UserRole
+
+
+class Command(BaseCommand):
+    help = 'Compare deep-page latency of page-number and cursor pagination on the booking list'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--page',
+            type=int,
+            default=1000,
+            help='Page number to fetch'
+        )
+        parser.add_argument(
+            '--page-size',
+            type=int,
+            default=20,
+            help='Bookings per page (the API default)'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Timed requests per pagination style'
+        )
+        parser.add_argument(
+            '--days-ahead',
+            type=int,
+            default=730,
+            help='Seed bookings from this many days in the future to avoid real data'
+        )
+        parser.add_argument(
+            '--keep',
+            action='store_true',
+            help='Keep the seeded bookings instead of deleting them'
+        )
+
+    def handle(self, *args, **kwargs):
+        court = Court.objects.filter(is_active=True).first()
+        if not court:
+            raise CommandError('No active court found.')
+        player = User.objects.filter(role=UserRole.PLAYER).first()
+        if not player:
+            raise CommandError('No players found. Please run seed_users first.')
+
+        page, page_size = kwargs['page'], kwargs['page_size']
+        if page < 1 or not 1 <= page_size <= KeysetPagination.max_page_size:
+            raise CommandError(
+                f'Page must be positive and page size 1-{KeysetPagination.max_page_size}.')
+
+        needed = page * page_size - Booking.objects.filter(player=player).count()
+        seeded_ids = self.seed(court, player, max(needed, 0), kwargs['days_ahead'])
+        self.stdout.write(
+            f'Listing bookings of {player.full_name}: page {page} of '
+            f'{page_size}, {kwargs["repeat"]} requests each'
+        )
+
+        try:
+            view = BookingViewSet.as_view({'get': 'list'})
+            factory = APIRequestFactory()
+
+            def fetch(params):
+                request = factory.get('/api/bookings/bookings/', params)
+                force_authenticate(request, user=player)
+                began = time.perf_counter()
+                with CaptureQueriesContext(connection) as queries:
+                    response = view(request)
+                elapsed = (time.perf_counter() - began) * 1000
+                if response.status_code != 200:
+                    raise CommandError(
+                        f'Request failed with {response.status_code}: {response.data}')
+                ids = [booking['id'] for booking in response.data['results']]
+                return elapsed, len(queries), ids
+
+            # The cursor for page N is the key of the last row on page N - 1
+            bookings = Booking.objects.filter(player=player).order_by(
+                *BookingViewSet.ordering)
+            ordering = keyset_ordering(bookings)
+            cursor = ''
+            if page > 1:
+                paginator = KeysetPagination(ordering=ordering)
+                cursor = paginator.encode_cursor(
+                    bookings.order_by(*ordering)[(page - 1) * page_size - 1])
+
+            results = {}
+            for label, params in [
+                ('Page number', {'page': page, 'page_size': page_size}),
+                ('Cursor', {'cursor': cursor, 'page_size': page_size}),
+            ]:
+                fetch(params)  # Warm up
+                runs = [fetch(params) for _ in range(kwargs['repeat'])]
+                latencies = sorted(elapsed for elapsed, _, _ in runs)
+                results[label] = runs[0][2]
+                self.stdout.write(
+                    f'  {label + ":":<13}p50 {statistics.median(latencies):.1f}ms, '
+                    f'max {latencies[-1]:.1f}ms, {runs[0][1]} queries'
+                )
+
+            if results['Page number'] == results['Cursor']:
+                self.stdout.write(self.style.SUCCESS('  Both return the same page'))
+            else:
+                self.stdout.write(self.style.ERROR('  Pages differ'))
+        finally:
+            if seeded_ids and not kwargs['keep']:
+                Booking.objects.filter(id__in=seeded_ids).delete()
+
+    def seed(self, court, player, count, days_ahead):
+        """Bulk create count half-hour bookings on unused future dates"""
+        if not count:
+            return []
+
+        first_date = timezone.now().date() + timedelta(days=days_ahead)
+        slots_per_day = 48
+        days = -(-count // slots_per_day)
+        if Booking.objects.filter(
+                court=court,
+                booking_date__gte=first_date,
+                booking_date__lt=first_date + timedelta(days=days)).exists():
+            raise CommandError(
+                f'{court.name} already has bookings after {first_date}; '
+                'pass a larger --days-ahead.')
+
+        midnight = datetime.combine(first_date, datetime.min.time())
+        bookings = []
+        for index in range(count):
+            day, slot = divmod(index, slots_per_day)
+            start = midnight + timedelta(minutes=30 * slot)
+            bookings.append(Booking(
+                court=court,
+                player=player,
+                booking_date=first_date + timedelta(days=day),
+                start_time=start.time(),
+                end_time=(start + timedelta(minutes=30)).time(),
+                status='COMPLETED',
+                base_amount=court.base_hourly_rate / 2,
+                total_amount=court.base_hourly_rate / 2,
+                booking_reference=Booking.generate_reference(),
+            ))
+        created = Booking.objects.bulk_create(bookings, batch_size=1000)
+        self.stdout.write(f'Seeded {count} bookings on {court.name}')
+        if created and created[0].pk is None:
+            # Backends that cannot return ids from bulk inserts
+            return list(Booking.objects.filter(
+                court=court,
+                booking_date__gte=first_date,
+                booking_date__lt=first_date + timedelta(days=days)
+            ).values_list('id', flat=True))
+        return [booking.pk for booking in created]
@@ -0,0 +1,153 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import timedelta
+import json
+import os
+import time
+
+from booking_management.models import RecurringBooking
+
+
+class Command(BaseCommand):
+    help = 'Roll every active recurring booking forward to a horizon (run nightly)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--horizon-days',
+            type=int,
+            default=90,
+            help='Generate bookings up to this many days ahead'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=20,
+            help='Number of courts per batch'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help='Number of batches processed in parallel'
+        )
+        parser.add_argument(
+            '--checkpoint',
+            default=str(settings.BASE_DIR / 'logs' / 'recurring_rollout.json'),
+            help='File used to record finished courts so a crashed run can resume'
+        )
+        parser.add_argument(
+            '--restart',
+            action='store_true',
+            help='Ignore any existing checkpoint and process every court again'
+        )
+
+    def handle(self, *args, **kwargs):
+        today = timezone.now().date()
+        horizon = today + timedelta(days=kwargs['horizon_days'])
+        run_key = f'{today.isoformat()}:{horizon.isoformat()}'
+        checkpoint_path = kwargs['checkpoint']
+
+        # Courts finished by an earlier attempt of the same run are skipped
+        done_courts = set()
+        if not kwargs['restart'] and os.path.exists(checkpoint_path):
+            with open(checkpoint_path) as checkpoint_file:
+                checkpoint = json.load(checkpoint_file)
+            if checkpoint.get('run') == run_key:
+                done_courts = set(checkpoint.get('done_courts', []))
+
+        series_by_court = {}
+        active_series = RecurringBooking.objects.filter(
+            status='ACTIVE',
+            start_date__lte=horizon
+        ).filter(
+            Q(end_date__isnull=True) | Q(end_date__gte=today)
+        ).exclude(
+            court_id__in=done_courts
+        ).order_by('court_id', 'id')
+        for series in active_series:
+            series_by_court.setdefault(series.court_id, []).append(series)
+
+        court_ids = list(series_by_court)
+        batch_size = max(1, kwargs['batch_size'])
+        batches = [court_ids[i:i + batch_size]
+                   for i in range(0, len(court_ids), batch_size)]
+
+        self.stdout.write(
+            f'Rolling out to {horizon}: {len(court_ids)} court(s) in '
+            f'{len(batches)} batch(es), {len(done_courts)} already done'
+        )
+
+        def run_batch(batch_courts):
+            # Each worker thread gets its own connection; series on the
+            # same court stay in one batch so they never contend
+            began = time.perf_counter()
+            created = skipped = series_count = 0
+            try:
+                for court_id in batch_courts:
+                    for series in series_by_court[court_id]:
+                        bookings, skipped_dates = series.generate_bookings_for_period(
+                            today, horizon)
+                        created += len(bookings)
+                        skipped += len(skipped_dates)
+                        series_count += 1
+            finally:
+                connection.close()
+            return {
+                'courts': batch_courts,
+                'series': series_count,
+                'created': created,
+                'skipped': skipped,
+                'seconds': time.perf_counter() - began,
+            }
+
+        total_created = total_skipped = failed = 0
+        began = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max(1, kwargs['workers'])) as pool:
+            futures = {pool.submit(run_batch, batch): index
+                       for index, batch in enumerate(batches, start=1)}
+            for future in as_completed(futures):
+                index = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    failed += 1
+                    self.stdout.write(self.style.ERROR(
+                        f'  Batch {index}/{len(batches)} failed: {e}'))
+                    continue
+
+                done_courts.update(result['courts'])
+                self._write_checkpoint(checkpoint_path, run_key, done_courts)
+                total_created += result['created']
+                total_skipped += result['skipped']
+
+                self.stdout.write(
+                    f'  Batch {index}/{len(batches)}: '
+                    f'{len(result["courts"])} court(s), {result["series"]} series, '
+                    f'{result["created"]} created, {result["skipped"]} skipped '
+                    f'in {result["seconds"]:.2f}s'
+                )
+
+        summary = (
+            f'\nCreated {total_created} booking(s), skipped {total_skipped} '
+            f'date(s) in {time.perf_counter() - began:.2f}s'
+        )
+        if failed:
+            self.stdout.write(self.style.ERROR(
+                f'{summary}; {failed} batch(es) failed, rerun to resume'))
+        else:
+            self.stdout.write(self.style.SUCCESS(summary))
+
+    def _write_checkpoint(self, path, run_key, done_courts):
+        """Atomically replace the checkpoint file"""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        temp_path = f'{path}.tmp'
+        with open(temp_path, 'w') as checkpoint_file:
+            json.dump({
+                'run': run_key,
+                'done_courts': sorted(done_courts),
+            }, checkpoint_file)
+        os.replace(temp_path, path)
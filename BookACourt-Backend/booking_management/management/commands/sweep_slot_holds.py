@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from booking_management.models import SlotHold
+
+
+class Command(BaseCommand):
+    help = 'Delete expired slot holds in bulk'
+
+    def handle(self, *args, **kwargs):
+        # Expired holds are already ignored on read, so no cache
+        # invalidation is needed; this only reclaims the rows
+        deleted, _ = SlotHold.objects.filter(
+            expires_at__lte=timezone.now()
+        ).delete()
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Deleted {deleted} expired slot hold(s)')
+        )
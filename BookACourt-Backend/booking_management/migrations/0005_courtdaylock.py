@@ -0,0 +1,27 @@
+# Generated by Django 5.2.9 on 2026-10-18 16:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking_management', '0004_recurringbooking'),
+        ('court_management', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourtDayLock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('lock_date', models.DateField()),
+                ('court', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='day_locks', to='court_management.court')),
+            ],
+            options={
+                'db_table': 'court_day_locks',
+                'unique_together': {('court', 'lock_date')},
+            },
+        ),
+    ]
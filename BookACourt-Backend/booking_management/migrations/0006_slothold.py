@@ -0,0 +1,36 @@
+# Generated by Django 5.2.9 on 2026-10-18 16:56
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking_management', '0005_courtdaylock'),
+        ('court_management', '0002_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlotHold',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hold_date', models.DateField()),
+                ('start_time', models.TimeField()),
+                ('end_time', models.TimeField()),
+                ('hold_token', models.CharField(editable=False, max_length=100, unique=True)),
+                ('expires_at', models.DateTimeField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('court', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='slot_holds', to='court_management.court')),
+                ('player', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='slot_holds', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'slot_holds',
+                'ordering': ['expires_at'],
+                'indexes': [models.Index(fields=['court', 'hold_date', 'expires_at'], name='slot_holds_court_i_8405b9_idx'), models.Index(fields=['expires_at'], name='slot_holds_expires_7c396f_idx')],
+            },
+        ),
+    ]
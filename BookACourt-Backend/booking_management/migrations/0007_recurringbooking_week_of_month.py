@@ -0,0 +1,18 @@
+# Generated by Django 5.2.9 on 2026-10-18 16:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking_management', '0006_slothold'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recurringbooking',
+            name='week_of_month',
+            field=models.IntegerField(blank=True, help_text='Monthly only: 1-4, or -1 for the last week. Defaults to the week of the first date', null=True),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.9 on 2026-10-18 17:02
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking_management', '0007_recurringbooking_week_of_month'),
+        ('court_management', '0003_court_location_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['court', 'booking_date', 'start_time', 'end_time'], name='bookings_court_i_bb27d8_idx'),
+        ),
+    ]
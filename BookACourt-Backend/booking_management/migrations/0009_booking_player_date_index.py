@@ -0,0 +1,20 @@
+# Generated by Django 5.2.9 on 2026-10-18 17:10
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking_management', '0008_booking_time_range_index'),
+        ('court_management', '0004_courtsearchdocument'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['player', 'booking_date', 'start_time'], name='bookings_player__f3c531_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.9 on 2026-10-18 17:11
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking_management', '0009_booking_player_date_index'),
+        ('court_management', '0005_review_keyset_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['booking_date', 'start_time'], name='bookings_booking_90270f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bookingnotification',
+            index=models.Index(fields=['user', 'sent_at'], name='booking_not_user_id_ee918d_idx'),
+        ),
+    ]
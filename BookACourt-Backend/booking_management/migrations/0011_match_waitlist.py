@@ -0,0 +1,24 @@
+# Generated by Django 5.2.9 on 2026-10-18 17:23
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking_management', '0010_booking_keyset_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='matchparticipant',
+            name='is_waitlisted',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddIndex(
+            model_name='matchparticipant',
+            index=models.Index(fields=['match_event', 'is_waitlisted', 'joined_at'], name='match_parti_match_e_c9ea31_idx'),
+        ),
+    ]
@@ -1,7 +1,10 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import Case, F, Value, When
 from django.utils import timezone
 from user_management.models import User, UserRole
-from court_management.models import Court, EquipmentItem
+from court_management.models import Court, EquipmentItem, CourtBlockedSlot
+from court_management.occupancy import invalidate_day_occupancy, invalidate_days
+from .recurrence import Recurrence
 
 
 class Booking(models.Model):
@@ -94,7 +97,11 @@ class Booking(models.Model):
         unique_together = ['court', 'booking_date', 'start_time']
         indexes = [
             models.Index(fields=['court', 'booking_date', 'status']),
+            models.Index(
+                fields=['court', 'booking_date', 'start_time', 'end_time']),
             models.Index(fields=['player', 'status']),
+            models.Index(fields=['player', 'booking_date', 'start_time']),
+            models.Index(fields=['booking_date', 'start_time']),
             models.Index(fields=['booking_reference']),
         ]
 
@@ -104,10 +111,26 @@ class Booking(models.Model):
     def save(self, *args, **kwargs):
         # Generate booking reference if not exists
         if not self.booking_reference:
-            import uuid
-            self.booking_reference = f"BK{uuid.uuid4().hex[:8].upper()}"
+            self.booking_reference = self.generate_reference()
         super().save(*args, **kwargs)
 
+    @staticmethod
+    def generate_reference():
+        """New booking reference (also used where save() is bypassed)"""
+        import uuid
+        return f"BK{uuid.uuid4().hex[:8].upper()}"
+
+    @classmethod
+    def overlapping(cls, court, booking_date, start_time, end_time):
+        """Active bookings on a court that overlap the given time range"""
+        return cls.objects.filter(
+            court=court,
+            booking_date=booking_date,
+            status__in=['PENDING', 'CONFIRMED'],
+            start_time__lt=end_time,
+            end_time__gt=start_time
+        )
+
     def can_cancel(self):
         """Check if booking can be cancelled based on cancellation policy"""
         # This will reference the court's cancellation policy
@@ -122,6 +145,111 @@ class Booking(models.Model):
         return time_until_booking > timedelta(hours=24)
 
 
+class CourtDayLock(models.Model):
+    """
+    Lock row used to serialize booking writes per court and day.
+    Taking it with select_for_update() makes the overlap check and the
+    insert atomic, which unique_together on start_time alone cannot do.
+    """
+    court = models.ForeignKey(
+        Court, on_delete=models.CASCADE, related_name='day_locks')
+    lock_date = models.DateField()
+
+    class Meta:
+        db_table = 'court_day_locks'
+        unique_together = ['court', 'lock_date']
+
+    def __str__(self):
+        return f"Lock for {self.court_id} on {self.lock_date}"
+
+    @classmethod
+    def acquire(cls, court, lock_date):
+        """
+        Block until this transaction holds the court/day lock.
+        Must be called inside transaction.atomic().
+
+        The row is inserted with ON CONFLICT DO NOTHING rather than
+        get_or_create(), whose SELECT-then-INSERT fails with an
+        IntegrityError when two transactions create the same lock.
+        """
+        return cls.acquire_many(court, [lock_date])[0]
+
+    @classmethod
+    def acquire_many(cls, court, lock_dates):
+        """
+        Take the locks for several days of one court with two queries.
+        Locks are taken in date order so concurrent callers cannot deadlock.
+        """
+        court_id = getattr(court, 'pk', court)
+        cls.objects.bulk_create(
+            [cls(court_id=court_id, lock_date=lock_date)
+             for lock_date in lock_dates],
+            ignore_conflicts=True
+        )
+        return list(cls.objects.select_for_update().filter(
+            court_id=court_id, lock_date__in=lock_dates
+        ).order_by('lock_date'))
+
+
+class SlotHold(models.Model):
+    """
+    Short-lived hold on a court slot while the player checks out.
+    Holds expire lazily: anything past expires_at is ignored on read
+    and removed in bulk by the sweep_slot_holds command.
+    """
+    court = models.ForeignKey(
+        Court, on_delete=models.CASCADE, related_name='slot_holds')
+    player = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name='slot_holds')
+
+    hold_date = models.DateField()
+    start_time = models.TimeField()
+    end_time = models.TimeField()
+
+    hold_token = models.CharField(max_length=100, unique=True, editable=False)
+    expires_at = models.DateTimeField()
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'slot_holds'
+        ordering = ['expires_at']
+        indexes = [
+            models.Index(fields=['court', 'hold_date', 'expires_at']),
+            models.Index(fields=['expires_at']),
+        ]
+
+    def __str__(self):
+        return f"Hold on {self.court.name} - {self.hold_date} {self.start_time}"
+
+    def save(self, *args, **kwargs):
+        # Generate hold token if not exists
+        if not self.hold_token:
+            import uuid
+            self.hold_token = uuid.uuid4().hex
+        super().save(*args, **kwargs)
+
+    def is_active(self):
+        """Check if the hold has not expired yet"""
+        return timezone.now() < self.expires_at
+
+    def release(self):
+        """Delete the hold and free its slot in the occupancy cache"""
+        invalidate_day_occupancy(self.court_id, self.hold_date)
+        self.delete()
+
+    @classmethod
+    def overlapping(cls, court, hold_date, start_time, end_time):
+        """Unexpired holds on a court that overlap the given time range"""
+        return cls.objects.filter(
+            court=court,
+            hold_date=hold_date,
+            expires_at__gt=timezone.now(),
+            start_time__lt=end_time,
+            end_time__gt=start_time
+        )
+
+
 class CancellationPolicy(models.Model):
     """Model for court cancellation policies (User Story 15)"""
     court = models.OneToOneField(
@@ -186,6 +314,9 @@ class BookingNotification(models.Model):
     class Meta:
         db_table = 'booking_notifications'
         ordering = ['-sent_at']
+        indexes = [
+            models.Index(fields=['user', 'sent_at']),
+        ]
 
     def __str__(self):
         return f"{self.notification_type} for {self.booking.booking_reference}"
@@ -311,6 +442,99 @@ class MatchEvent(models.Model):
     def is_full(self):
         return self.current_players >= self.max_players
 
+    @classmethod
+    def _claim_seat(cls, match_id):
+        """Take a seat if the match is open and has room; True on success"""
+        return cls.objects.filter(
+            pk=match_id,
+            status__in=['OPEN', 'FULL'],
+            current_players__lt=F('max_players')
+        ).update(
+            # status goes first: MySQL evaluates SET clauses left to right
+            status=Case(
+                When(current_players__gte=F('max_players') - 1,
+                     then=Value('FULL')),
+                default=Value('OPEN')
+            ),
+            current_players=F('current_players') + 1,
+            updated_at=timezone.now()
+        ) == 1
+
+    @classmethod
+    def join(cls, match_id, player):
+        """
+        Add a player to a match, or to its waitlist once it is full.
+        Returns 'joined', 'waitlisted', 'already_joined' or 'closed'.
+
+        Seats are claimed with a conditional UPDATE, so concurrent joins
+        can never take a match past max_players.
+        """
+        if MatchParticipant.objects.filter(
+                match_event_id=match_id, player=player).exists():
+            return 'already_joined'
+
+        try:
+            with transaction.atomic():
+                if cls._claim_seat(match_id):
+                    MatchParticipant.objects.create(
+                        match_event_id=match_id, player=player)
+                    return 'joined'
+
+                # Lock the match so a concurrent leave cannot free a seat
+                # between the failed claim and joining the waitlist
+                match = cls.objects.select_for_update().get(pk=match_id)
+                if match.status not in ('OPEN', 'FULL'):
+                    return 'closed'
+                if cls._claim_seat(match_id):
+                    MatchParticipant.objects.create(
+                        match_event_id=match_id, player=player)
+                    return 'joined'
+                MatchParticipant.objects.create(
+                    match_event_id=match_id, player=player, is_waitlisted=True)
+                return 'waitlisted'
+        except IntegrityError:
+            # A concurrent request from the same player got there first
+            return 'already_joined'
+
+    @classmethod
+    def leave(cls, match_id, player):
+        """
+        Remove a player from a match or its waitlist. A freed seat goes to
+        the longest-waiting player on the waitlist. Returns 'left',
+        'left_waitlist' or 'not_participant'.
+        """
+        with transaction.atomic():
+            match = cls.objects.select_for_update().get(pk=match_id)
+            participant = MatchParticipant.objects.filter(
+                match_event=match, player=player).first()
+            if participant is None:
+                return 'not_participant'
+            participant.delete()
+            if participant.is_waitlisted:
+                return 'left_waitlist'
+
+            promoted = None
+            if match.status in ('OPEN', 'FULL'):
+                promoted = MatchParticipant.objects.filter(
+                    match_event=match, is_waitlisted=True
+                ).order_by('joined_at', 'id').first()
+
+            if promoted:
+                # The seat changes hands, the count stays the same
+                promoted.is_waitlisted = False
+                promoted.save(update_fields=['is_waitlisted'])
+                cls.objects.filter(pk=match_id).update(updated_at=timezone.now())
+            else:
+                cls.objects.filter(pk=match_id).update(
+                    status=Case(
+                        When(status='FULL', then=Value('OPEN')),
+                        default=F('status')
+                    ),
+                    current_players=F('current_players') - 1,
+                    updated_at=timezone.now()
+                )
+        return 'left'
+
 
 class MatchParticipant(models.Model):
     """Model for match event participants (User Story 37)"""
@@ -325,6 +549,8 @@ class MatchParticipant(models.Model):
 
     joined_at = models.DateTimeField(auto_now_add=True)
     is_confirmed = models.BooleanField(default=True)
+    # Waiting for a seat in a full match, promoted in joined_at order
+    is_waitlisted = models.BooleanField(default=False)
 
     # Result tracking
     attended = models.BooleanField(default=False)
@@ -333,6 +559,9 @@ class MatchParticipant(models.Model):
         db_table = 'match_participants'
         unique_together = ['match_event', 'player']
         ordering = ['joined_at']
+        indexes = [
+            models.Index(fields=['match_event', 'is_waitlisted', 'joined_at']),
+        ]
 
     def __str__(self):
         return f"{self.player.full_name} in {self.match_event.title}"
@@ -396,6 +625,13 @@ class BookingShare(models.Model):
         return timezone.now() < self.expires_at and self.joined_users.count() < self.max_joins
 
 
+# Why a recurring series skips a date the player already has a row for
+OWN_BOOKING_SKIP_REASONS = {
+    'CANCELLED': 'cancelled',
+    'NO_SHOW': 'no_show',
+}
+
+
 class RecurringBooking(models.Model):
     """Model for recurring bookings (weekly/monthly patterns)"""
     FREQUENCY_CHOICES = [
@@ -429,6 +665,12 @@ class RecurringBooking(models.Model):
     day_of_week = models.IntegerField(
         help_text="0=Monday, 6=Sunday"
     )  # 0-6 for Monday-Sunday
+    week_of_month = models.IntegerField(
+        null=True,
+        blank=True,
+        help_text="Monthly only: 1-4, or -1 for the last week. "
+                  "Defaults to the week of the first date"
+    )
     start_time = models.TimeField()
     end_time = models.TimeField()
 
@@ -481,61 +723,88 @@ class RecurringBooking(models.Model):
                 'Thursday', 'Friday', 'Saturday', 'Sunday']
         return f"{self.court.name} - Every {days[self.day_of_week]} at {self.start_time}"
 
+    def recurrence(self):
+        """Recurrence rule describing this series"""
+        return Recurrence(
+            self.frequency,
+            self.day_of_week,
+            self.start_date,
+            until=self.end_date,
+            setpos=self.week_of_month
+        )
+
+    def occurrences(self, start_date, end_date=None):
+        """Lazily yield the dates this series falls on within a date range"""
+        return self.recurrence().between(start_date, end_date)
+
     def generate_bookings_for_period(self, start_date, end_date):
-        """Generate individual bookings for a date range"""
-        from datetime import timedelta
-
-        bookings_created = []
-        current_date = max(start_date, self.start_date)
-
-        # Adjust to the first occurrence of the day of week
-        days_ahead = self.day_of_week - current_date.weekday()
-        if days_ahead < 0:
-            days_ahead += 7
-        current_date += timedelta(days=days_ahead)
-
-        # Determine increment based on frequency
-        if self.frequency == 'WEEKLY':
-            increment = timedelta(weeks=1)
-        elif self.frequency == 'BIWEEKLY':
-            increment = timedelta(weeks=2)
-        elif self.frequency == 'MONTHLY':
-            increment = timedelta(weeks=4)  # Approximate
-        else:
-            increment = timedelta(weeks=1)
-
-        # Check end date
-        booking_end_date = end_date
-        if self.end_date:
-            booking_end_date = min(end_date, self.end_date)
-
-        while current_date <= booking_end_date:
-            # Check if booking already exists
+        """
+        Generate individual bookings for a date range.
+
+        Existing bookings, blocked slots and live holds for the whole range
+        are fetched once, conflicts are resolved in memory and the new
+        bookings are inserted with a single bulk_create, so the number of
+        queries does not grow with the number of occurrences.
+
+        Returns (bookings_created, skipped) where skipped is a list of
+        {'date': date, 'reason': str} entries; reason is 'already_booked',
+        'cancelled', 'no_show', 'conflict', 'blocked' or 'held'.
+        """
+        dates = list(self.occurrences(start_date, end_date))
+        if not dates:
+            return [], []
+
+        skipped = []
+        with transaction.atomic():
+            CourtDayLock.acquire_many(self.court_id, dates)
+
+            # Rows that share this series' start time would also violate
+            # unique_together, whatever their status. The player's own
+            # row is reported by its status, e.g. a cancelled date.
+            taken = {}
             existing = Booking.objects.filter(
-                court=self.court,
-                player=self.player,
-                booking_date=current_date,
-                start_time=self.start_time,
-                end_time=self.end_time
-            ).first()
-
-            if not existing:
-                # Check availability
-                conflicts = Booking.objects.filter(
-                    court=self.court,
-                    booking_date=current_date,
-                    status__in=['PENDING', 'CONFIRMED']
-                ).filter(
-                    start_time__lt=self.end_time,
-                    end_time__gt=self.start_time
-                )
-
-                if not conflicts.exists():
-                    # Create booking
-                    booking = Booking.objects.create(
-                        court=self.court,
-                        player=self.player,
-                        booking_date=current_date,
+                court_id=self.court_id,
+                booking_date__range=(dates[0], dates[-1]),
+                start_time__lt=self.end_time,
+                end_time__gt=self.start_time
+            ).values_list('booking_date', 'player_id', 'start_time',
+                          'end_time', 'status')
+            for booking_date, player_id, start, end, status in existing:
+                if player_id == self.player_id and (start, end) == (
+                        self.start_time, self.end_time):
+                    taken[booking_date] = OWN_BOOKING_SKIP_REASONS.get(
+                        status, 'already_booked')
+                elif status in ('PENDING', 'CONFIRMED') or start == self.start_time:
+                    taken.setdefault(booking_date, 'conflict')
+
+            blocked_dates = set(CourtBlockedSlot.objects.filter(
+                court_id=self.court_id,
+                blocked_date__range=(dates[0], dates[-1]),
+                start_time__lt=self.end_time,
+                end_time__gt=self.start_time
+            ).values_list('blocked_date', flat=True))
+
+            held_dates = set(SlotHold.objects.filter(
+                court_id=self.court_id,
+                hold_date__range=(dates[0], dates[-1]),
+                expires_at__gt=timezone.now(),
+                start_time__lt=self.end_time,
+                end_time__gt=self.start_time
+            ).values_list('hold_date', flat=True))
+
+            new_bookings = []
+            for booking_date in dates:
+                if booking_date in taken:
+                    reason = taken[booking_date]
+                elif booking_date in blocked_dates:
+                    reason = 'blocked'
+                elif booking_date in held_dates:
+                    reason = 'held'
+                else:
+                    new_bookings.append(Booking(
+                        court_id=self.court_id,
+                        player_id=self.player_id,
+                        booking_date=booking_date,
                         start_time=self.start_time,
                         end_time=self.end_time,
                         status='CONFIRMED',
@@ -543,10 +812,16 @@ class RecurringBooking(models.Model):
                         base_amount=self.base_amount,
                         total_amount=self.base_amount,
                         notes=f"Recurring booking: {self.notes}",
-                        created_by=self.created_by
-                    )
-                    bookings_created.append(booking)
+                        created_by_id=self.created_by_id,
+                        booking_reference=Booking.generate_reference()
+                    ))
+                    continue
+                skipped.append({'date': booking_date, 'reason': reason})
+
+            bookings_created = Booking.objects.bulk_create(new_bookings)
 
-            current_date += increment
+        # bulk_create skips post_save, so refresh the occupancy cache here
+        invalidate_days(
+            (self.court_id, booking.booking_date) for booking in bookings_created)
 
-        return bookings_created
+        return bookings_created, skipped
@@ -0,0 +1,127 @@
+"""
+Lazy recurrence engine for recurring bookings.
+
+Modelled on dateutil's rrule: a Recurrence describes a series and
+yields its dates one at a time, so callers can stream years of
+occurrences without building a list.
+
+    Recurrence('MONTHLY', weekday=1, dtstart=date(2025, 1, 14))
+    # -> second Tuesday of every month from January 2025
+"""
+from calendar import monthrange
+from datetime import date, timedelta
+
+
+WEEKLY = 'WEEKLY'
+BIWEEKLY = 'BIWEEKLY'
+MONTHLY = 'MONTHLY'
+
+# Weeks between occurrences for the week-based frequencies
+WEEK_INTERVALS = {WEEKLY: 1, BIWEEKLY: 2}
+
+LAST_WEEK = -1
+
+
+def nth_weekday(year, month, weekday, n):
+    """
+    Date of the nth given weekday in a month (n=-1 for the last one),
+    or None if the month has no such day
+    """
+    first_weekday, days_in_month = monthrange(year, month)
+    if n == LAST_WEEK:
+        last_weekday = (first_weekday + days_in_month - 1) % 7
+        day = days_in_month - (last_weekday - weekday) % 7
+    else:
+        day = 1 + (weekday - first_weekday) % 7 + 7 * (n - 1)
+        if day > days_in_month:
+            return None
+    return date(year, month, day)
+
+
+def week_of_month(value):
+    """Which occurrence of its weekday a date is within its month (1-5)"""
+    return (value.day - 1) // 7 + 1
+
+
+def _next_month(year, month):
+    return (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+class Recurrence:
+    """
+    A recurring series of dates.
+
+    frequency: WEEKLY, BIWEEKLY or MONTHLY
+    weekday:   0=Monday ... 6=Sunday
+    dtstart:   first date the series may fall on
+    until:     last date the series may fall on (None for open-ended)
+    setpos:    MONTHLY only, which weekday of the month (1-4, or -1 for
+               the last); defaults to the week dtstart's first occurrence
+               falls in
+    """
+
+    def __init__(self, frequency, weekday, dtstart, until=None, setpos=None):
+        if frequency not in WEEK_INTERVALS and frequency != MONTHLY:
+            raise ValueError(f'Unsupported frequency: {frequency}')
+        if not 0 <= weekday <= 6:
+            raise ValueError('weekday must be between 0 (Monday) and 6 (Sunday)')
+
+        self.frequency = frequency
+        self.weekday = weekday
+        self.until = until
+
+        # Anchor on the first matching weekday on or after dtstart so the
+        # series phase never depends on when it is queried
+        self.first = dtstart + timedelta(days=(weekday - dtstart.weekday()) % 7)
+
+        if frequency == MONTHLY:
+            if setpos is None:
+                setpos = week_of_month(self.first)
+                if setpos > 4:
+                    setpos = LAST_WEEK
+            if setpos not in (1, 2, 3, 4, LAST_WEEK):
+                raise ValueError('setpos must be 1-4 or -1')
+            self.setpos = setpos
+            if nth_weekday(self.first.year, self.first.month,
+                           weekday, setpos) < self.first:
+                # dtstart is past this month's occurrence
+                year, month = _next_month(self.first.year, self.first.month)
+                self.first = nth_weekday(year, month, weekday, setpos)
+        else:
+            self.setpos = None
+
+    def __iter__(self):
+        return self.between(self.first, self.until)
+
+    def between(self, after, before=None):
+        """Lazily yield occurrences within [after, before] (inclusive)"""
+        if self.until and (before is None or before > self.until):
+            before = self.until
+        start = max(after, self.first)
+
+        if self.frequency == MONTHLY:
+            dates = self._monthly_from(start)
+        else:
+            dates = self._weekly_from(start)
+
+        for value in dates:
+            if before is not None and value > before:
+                return
+            yield value
+
+    def _weekly_from(self, start):
+        step = timedelta(weeks=WEEK_INTERVALS[self.frequency])
+        # Jump straight to the first occurrence on or after start
+        periods = -(-(start - self.first).days // step.days)
+        current = self.first + step * max(periods, 0)
+        while True:
+            yield current
+            current += step
+
+    def _monthly_from(self, start):
+        year, month = start.year, start.month
+        while True:
+            value = nth_weekday(year, month, self.weekday, self.setpos)
+            if value is not None and value >= start:
+                yield value
+            year, month = _next_month(year, month)
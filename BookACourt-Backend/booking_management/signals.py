@@ -0,0 +1,55 @@
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+from court_management.occupancy import (
+    ACTIVE_BOOKING_STATUSES, invalidate_day_occupancy
+)
+from .models import Booking, SlotHold
+
+
+@receiver(post_init, sender=Booking)
+def remember_booking_slot(sender, instance, **kwargs):
+    """
+    Remember which court/day a loaded booking occupied so a later
+    save that moves it can free the old day as well
+    """
+    instance._occupancy_day = (instance.court_id, instance.booking_date)
+
+
+@receiver(post_save, sender=Booking)
+def update_occupancy_on_booking_save(sender, instance, created, **kwargs):
+    """
+    Keep the court's occupancy bitmap in sync with bookings
+    """
+    if created:
+        if instance.status in ACTIVE_BOOKING_STATUSES:
+            invalidate_day_occupancy(instance.court_id, instance.booking_date)
+    else:
+        # Status, date or time may have changed, rebuild on next read
+        invalidate_day_occupancy(instance.court_id, instance.booking_date)
+        previous_court_id, previous_date = instance._occupancy_day
+        if previous_date and (previous_court_id, previous_date) != (
+                instance.court_id, instance.booking_date):
+            invalidate_day_occupancy(previous_court_id, previous_date)
+
+    instance._occupancy_day = (instance.court_id, instance.booking_date)
+
+
+@receiver(post_delete, sender=Booking)
+def update_occupancy_on_booking_delete(sender, instance, **kwargs):
+    """
+    Free the booking's bits by rebuilding the day on next read
+    """
+    invalidate_day_occupancy(instance.court_id, instance.booking_date)
+
+
+@receiver(post_save, sender=SlotHold)
+def update_occupancy_on_hold_save(sender, instance, created, **kwargs):
+    """
+    Rebuild the court's occupancy entry with the new or changed hold
+    """
+    invalidate_day_occupancy(instance.court_id, instance.hold_date)
+
+# SlotHold deliberately has no post_delete receiver: it would stop the
+# bulk sweep from being a single DELETE. Expired holds are ignored on
+# read anyway, and live holds are released via SlotHold.release().
+
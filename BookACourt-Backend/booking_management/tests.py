@@ -1,3 +1,268 @@
-from django.test import TestCase
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, time, timedelta
+from itertools import islice
+from threading import Barrier
+import time as clock
 
-# Create your tests here.
+from django.db import connection, transaction
+from django.utils import timezone
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+
+from BookACourt.testing import (
+    future_date, make_booking, make_court, make_owner, make_player,
+    make_players
+)
+from booking_management.models import (
+    CourtDayLock, MatchEvent, MatchParticipant, RecurringBooking, SlotHold
+)
+from court_management.models import CourtBlockedSlot
+from booking_management.recurrence import Recurrence
+
+
+def create_match(max_players):
+    creator = make_player(999, full_name='Creator')
+    match = MatchEvent.objects.create(
+        court=make_court(make_owner()),
+        title='Doubles',
+        sport_type='Tennis',
+        created_by=creator,
+        max_players=max_players,
+        match_date=future_date(),
+        match_time=time(18)
+    )
+    MatchParticipant.objects.create(match_event=match, player=creator)
+    return match
+
+
+def skip_without_concurrent_writers(test):
+    if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+        # Shared-cache memory databases fail concurrent writers at once
+        # instead of waiting; MySQL and file SQLite databases work
+        test.skipTest('needs a database that allows concurrent writers')
+
+
+class CourtDayLockTests(TransactionTestCase):
+    """Transactions creating the same day lock take turns"""
+
+    def setUp(self):
+        skip_without_concurrent_writers(self)
+
+    def test_concurrent_first_acquire_is_serialized(self):
+        court = make_court(make_owner())
+        lock_date = future_date()
+        start = Barrier(4)
+
+        def hold_lock(_):
+            try:
+                start.wait()
+                with transaction.atomic():
+                    CourtDayLock.acquire(court, lock_date)
+                    entered = clock.monotonic()
+                    clock.sleep(0.1)
+                    return entered, clock.monotonic()
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            spans = sorted(pool.map(hold_lock, range(4)))
+
+        self.assertEqual(CourtDayLock.objects.count(), 1)
+        for (_, left), (entered, _) in zip(spans, spans[1:]):
+            self.assertGreaterEqual(entered, left)
+
+
+class MatchJoinConcurrencyTests(TransactionTestCase):
+    """Simultaneous joins must never take a match past max_players"""
+
+    def setUp(self):
+        skip_without_concurrent_writers(self)
+
+    def test_simultaneous_joins_do_not_overbook(self):
+        match = create_match(max_players=10)
+        players = make_players(200)
+        start = Barrier(len(players))
+
+        def join(player):
+            try:
+                start.wait()
+                return MatchEvent.join(match.pk, player)
+            finally:
+                # Each thread opens its own connection
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=len(players)) as pool:
+            outcomes = list(pool.map(join, players))
+
+        match.refresh_from_db()
+        seated = MatchParticipant.objects.filter(
+            match_event=match, is_waitlisted=False).count()
+        waitlisted = MatchParticipant.objects.filter(
+            match_event=match, is_waitlisted=True).count()
+
+        self.assertEqual(match.current_players, 10)
+        self.assertEqual(match.status, 'FULL')
+        self.assertEqual(seated, match.current_players)
+        self.assertEqual(outcomes.count('joined'), 9)
+        self.assertEqual(outcomes.count('waitlisted'), 191)
+        self.assertEqual(waitlisted, 191)
+
+
+class MatchWaitlistTests(TestCase):
+    """Leaving a full match hands the seat to the waitlist in order"""
+
+    def setUp(self):
+        self.match = create_match(max_players=2)
+        self.first, self.second, self.third = make_players(3)
+
+    def test_join_full_match_waitlists(self):
+        self.assertEqual(MatchEvent.join(self.match.pk, self.first), 'joined')
+        self.assertEqual(
+            MatchEvent.join(self.match.pk, self.second), 'waitlisted')
+        self.assertEqual(
+            MatchEvent.join(self.match.pk, self.second), 'already_joined')
+        self.match.refresh_from_db()
+        self.assertEqual(self.match.current_players, 2)
+        self.assertEqual(self.match.status, 'FULL')
+
+    def test_leave_promotes_longest_waiting(self):
+        MatchEvent.join(self.match.pk, self.first)
+        MatchEvent.join(self.match.pk, self.second)
+        MatchEvent.join(self.match.pk, self.third)
+
+        self.assertEqual(MatchEvent.leave(self.match.pk, self.first), 'left')
+        self.match.refresh_from_db()
+        self.assertEqual(self.match.current_players, 2)
+        self.assertEqual(self.match.status, 'FULL')
+        self.assertFalse(MatchParticipant.objects.get(
+            match_event=self.match, player=self.second).is_waitlisted)
+        self.assertTrue(MatchParticipant.objects.get(
+            match_event=self.match, player=self.third).is_waitlisted)
+
+    def test_leave_without_waitlist_reopens(self):
+        MatchEvent.join(self.match.pk, self.first)
+        self.assertEqual(MatchEvent.leave(self.match.pk, self.first), 'left')
+        self.match.refresh_from_db()
+        self.assertEqual(self.match.current_players, 1)
+        self.assertEqual(self.match.status, 'OPEN')
+
+    def test_leave_waitlist_keeps_seats(self):
+        MatchEvent.join(self.match.pk, self.first)
+        MatchEvent.join(self.match.pk, self.second)
+        self.assertEqual(
+            MatchEvent.leave(self.match.pk, self.second), 'left_waitlist')
+        self.assertEqual(
+            MatchEvent.leave(self.match.pk, self.second), 'not_participant')
+        self.match.refresh_from_db()
+        self.assertEqual(self.match.current_players, 2)
+
+
+class RecurrenceTests(SimpleTestCase):
+    """Recurrence dates for the week- and month-based frequencies"""
+
+    def first(self, recurrence, count):
+        return list(islice(recurrence, count))
+
+    def test_start_after_first_matching_weekday(self):
+        # 1 January 2025 is a Wednesday; the series starts on Monday the 6th
+        weekly = Recurrence('WEEKLY', 0, date(2025, 1, 1))
+        self.assertEqual(self.first(weekly, 3), [
+            date(2025, 1, 6), date(2025, 1, 13), date(2025, 1, 20)])
+        self.assertEqual(
+            list(weekly.between(date(2025, 1, 7), date(2025, 1, 20))),
+            [date(2025, 1, 13), date(2025, 1, 20)])
+
+    def test_second_tuesday(self):
+        explicit = Recurrence('MONTHLY', 1, date(2025, 1, 1), setpos=2)
+        inferred = Recurrence('MONTHLY', 1, date(2025, 1, 14))
+        expected = [date(2025, 1, 14), date(2025, 2, 11), date(2025, 3, 11)]
+        self.assertEqual(self.first(explicit, 3), expected)
+        self.assertEqual(self.first(inferred, 3), expected)
+
+        # Starting after January's second Tuesday moves to February's
+        late = Recurrence('MONTHLY', 1, date(2025, 1, 15), setpos=2)
+        self.assertEqual(self.first(late, 1), [date(2025, 2, 11)])
+
+    def test_last_friday(self):
+        # January 2025 has five Fridays, February and March four
+        expected = [date(2025, 1, 31), date(2025, 2, 28), date(2025, 3, 28)]
+        explicit = Recurrence('MONTHLY', 4, date(2025, 1, 1), setpos=-1)
+        self.assertEqual(self.first(explicit, 3), expected)
+
+        # A fifth Friday as the start means the last one of every month
+        inferred = Recurrence('MONTHLY', 4, date(2025, 1, 31))
+        self.assertEqual(inferred.setpos, -1)
+        self.assertEqual(self.first(inferred, 3), expected)
+
+    def test_until_is_inclusive(self):
+        on_until = Recurrence(
+            'WEEKLY', 0, date(2025, 1, 6), until=date(2025, 1, 20))
+        self.assertEqual(list(on_until), [
+            date(2025, 1, 6), date(2025, 1, 13), date(2025, 1, 20)])
+
+        before_until = Recurrence(
+            'WEEKLY', 0, date(2025, 1, 6), until=date(2025, 1, 19))
+        self.assertEqual(list(before_until), [
+            date(2025, 1, 6), date(2025, 1, 13)])
+        self.assertEqual(list(before_until.between(
+            date(2025, 1, 10), date(2025, 12, 31))), [date(2025, 1, 13)])
+
+    def test_biweekly_phase_across_year_end(self):
+        # Anchored on Monday 23 December 2024: 6 and 20 January, not 13
+        biweekly = Recurrence('BIWEEKLY', 0, date(2024, 12, 23))
+        self.assertEqual(
+            list(biweekly.between(date(2025, 1, 1), date(2025, 1, 31))),
+            [date(2025, 1, 6), date(2025, 1, 20)])
+        self.assertEqual(self.first(biweekly, 2), [
+            date(2024, 12, 23), date(2025, 1, 6)])
+
+
+class RecurringBookingGenerationTests(TestCase):
+    """Each skipped date says why it was skipped"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.court = make_court(make_owner())
+        cls.player = make_player()
+        cls.start = future_date(7)
+        cls.series = RecurringBooking.objects.create(
+            court=cls.court,
+            player=cls.player,
+            frequency='WEEKLY',
+            day_of_week=cls.start.weekday(),
+            start_time=time(10),
+            end_time=time(11),
+            start_date=cls.start,
+            base_amount=100
+        )
+
+    def week(self, index):
+        return self.start + timedelta(weeks=index)
+
+    def test_skip_reasons(self):
+        for index, status in enumerate(['CONFIRMED', 'CANCELLED', 'NO_SHOW']):
+            make_booking(self.court, self.player, self.week(index),
+                         status=status)
+        make_booking(self.court, make_player(1), self.week(3),
+                     time(10, 30), time(11, 30))
+        CourtBlockedSlot.objects.create(
+            court=self.court, blocked_date=self.week(4),
+            start_time=time(9), end_time=time(12))
+        SlotHold.objects.create(
+            court=self.court, player=make_player(2), hold_date=self.week(5),
+            start_time=time(10), end_time=time(11),
+            expires_at=timezone.now() + timedelta(minutes=10))
+
+        created, skipped = self.series.generate_bookings_for_period(
+            self.start, self.week(6))
+
+        self.assertEqual(
+            [(entry['date'], entry['reason']) for entry in skipped], [
+                (self.week(0), 'already_booked'),
+                (self.week(1), 'cancelled'),
+                (self.week(2), 'no_show'),
+                (self.week(3), 'conflict'),
+                (self.week(4), 'blocked'),
+                (self.week(5), 'held'),
+            ])
+        self.assertEqual(
+            [booking.booking_date for booking in created], [self.week(6)])
@@ -0,0 +1,69 @@
+"""
+Which courts a user can manage.
+
+Staff-scoped querysets filter on court_id__in=<ids> rather than joining
+courts to their owners and the managers M2M, which duplicates rows and
+plans poorly, and User.can_manage_court checks membership in the same
+set. Each user's ids are cached across requests; the signals in
+court_management.signals drop them when ownership or manager
+assignments change. They are also memoized on the user instance, so
+every check within a request shares one lookup.
+
+Invalidation only reaches other processes through a shared cache. With
+a per-process cache (LocMem) a removed manager would keep access in
+every other worker until the entry expired, so there the ids are only
+kept for a few seconds.
+"""
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+
+MANAGED_COURTS_TIMEOUT = 60 * 60
+
+# Upper bound on stale permissions when the cache is per process
+LOCAL_MANAGED_COURTS_TIMEOUT = 5
+
+
+def _cache_key(user_id):
+    return f'managed_courts:{user_id}'
+
+
+def _cache_timeout():
+    if isinstance(caches['default'], LocMemCache):
+        return LOCAL_MANAGED_COURTS_TIMEOUT
+    return MANAGED_COURTS_TIMEOUT
+
+
+def managed_court_ids(user):
+    """
+    frozenset of ids of the courts a user owns or manages. Super users
+    can manage every court; callers check for them first.
+    """
+    if not (user.is_court_owner or user.is_court_manager):
+        return frozenset()
+
+    # request.user is a fresh instance per request
+    court_ids = getattr(user, '_managed_court_ids', None)
+    if court_ids is not None:
+        return court_ids
+
+    key = _cache_key(user.pk)
+    court_ids = cache.get(key)
+    if court_ids is None:
+        from .models import Court
+
+        owned = Court.objects.filter(
+            owner=user).values_list('id', flat=True)
+        managed = Court.managers.through.objects.filter(
+            user=user).values_list('court_id', flat=True)
+        court_ids = frozenset(owned) | frozenset(managed)
+        cache.set(key, court_ids, _cache_timeout())
+    user._managed_court_ids = court_ids
+    return court_ids
+
+
+def invalidate_managed_courts(*user_ids):
+    """Forget these users' managed courts after the transaction commits"""
+    keys = [_cache_key(user_id) for user_id in user_ids if user_id]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
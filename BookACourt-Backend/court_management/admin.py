@@ -7,6 +7,15 @@ from .models import (
     CourtCategory, CourtRegistration, Court, CourtImage,
     DynamicPricing, CourtBlockedSlot, CourtReview, EquipmentItem
 )
+from .geo import invalidate_index
+from .moderation import moderate_reviews
+
+
+def invalidate_court_responses(court_ids):
+    """Bulk update() skips signals, so drop cached API responses by hand"""
+    from api.caching import bump_generations
+    bump_generations(
+        'courts', 'categories', *[f'court:{court_id}' for court_id in court_ids])
 
 
 @admin.register(CourtCategory)
@@ -32,7 +41,7 @@ class CourtCategoryAdmin(admin.ModelAdmin):
 
     def court_count(self, obj):
         """Display number of courts in this category"""
-        count = obj.courts.filter(is_active=True).count()
+        count = CourtCategory.active_court_counts().get(obj.id, 0)
         return format_html(
             '<span style="font-weight: bold; color: blue;">{}</span>',
             count
@@ -204,7 +213,7 @@ class CourtAdmin(admin.ModelAdmin):
         'address', 'court_type'
     )
     readonly_fields = (
-        'average_rating', 'total_reviews',
+        'average_rating', 'total_reviews', 'rating_sum',
         'created_at', 'updated_at'
     )
 
@@ -234,7 +243,7 @@ class CourtAdmin(admin.ModelAdmin):
             'fields': ('phone_number', 'email')
         }),
         ('Ratings', {
-            'fields': ('average_rating', 'total_reviews'),
+            'fields': ('average_rating', 'total_reviews', 'rating_sum'),
             'classes': ('collapse',)
         }),
         ('Staff Management', {
@@ -280,19 +289,29 @@ class CourtAdmin(admin.ModelAdmin):
 
     def activate_courts(self, request, queryset):
         """Activate selected courts"""
+        court_ids = list(queryset.values_list('id', flat=True))
         updated = queryset.update(is_active=True)
+        invalidate_index()
+        CourtCategory.invalidate_court_counts()
+        invalidate_court_responses(court_ids)
         self.message_user(request, f'{updated} court(s) activated.')
     activate_courts.short_description = 'Activate selected courts'
 
     def deactivate_courts(self, request, queryset):
         """Deactivate selected courts"""
+        court_ids = list(queryset.values_list('id', flat=True))
         updated = queryset.update(is_active=False)
+        invalidate_index()
+        CourtCategory.invalidate_court_counts()
+        invalidate_court_responses(court_ids)
         self.message_user(request, f'{updated} court(s) deactivated.')
     deactivate_courts.short_description = 'Deactivate selected courts'
 
     def verify_courts(self, request, queryset):
         """Verify selected courts"""
+        court_ids = list(queryset.values_list('id', flat=True))
         updated = queryset.update(is_verified=True)
+        invalidate_court_responses(court_ids)
         self.message_user(request, f'{updated} court(s) verified.')
     verify_courts.short_description = 'Verify selected courts'
 
@@ -464,30 +483,26 @@ class CourtReviewAdmin(admin.ModelAdmin):
 
     actions = ['approve_reviews', 'flag_reviews', 'hide_reviews']
 
-    def approve_reviews(self, request, queryset):
-        """Approve and make reviews visible - signals will update court stats"""
-        updated = queryset.update(is_visible=True, is_flagged=False)
-
-    # Trigger signal by re-saving (this forces the post_save signal)
-        for review in queryset:
-            review.save()
+    def moderate(self, request, queryset, action, verb):
+        updated, court_ids = moderate_reviews(queryset, action)
+        courts = ', '.join(Court.objects.filter(
+            id__in=court_ids).values_list('name', flat=True))
+        message = f'{updated} review(s) {verb}'
+        if court_ids:
+            message += f' across {len(court_ids)} court(s): {courts}'
+        self.message_user(request, message + '.')
 
-        self.message_user(request, f'{updated} review(s) approved.')
+    def approve_reviews(self, request, queryset):
+        """Approve and make reviews visible, recalculating each court once"""
+        self.moderate(request, queryset, 'approve', 'approved')
 
     def hide_reviews(self, request, queryset):
-        """Hide abusive reviews - signals will update court stats"""
-        updated = queryset.update(is_visible=False)
-
-        # Trigger signal by re-saving
-        for review in queryset:
-            review.save()
-
-        self.message_user(request, f'{updated} review(s) hidden.')
+        """Hide abusive reviews, recalculating each court once"""
+        self.moderate(request, queryset, 'hide', 'hidden')
 
     def flag_reviews(self, request, queryset):
         """Flag reviews for moderation"""
-        updated = queryset.update(is_flagged=True)
-        self.message_user(request, f'{updated} review(s) flagged.')
+        self.moderate(request, queryset, 'flag', 'flagged')
     flag_reviews.short_description = 'Flag selected reviews'
 
 
@@ -0,0 +1,144 @@
+"""
+Nearest-court search without a spatial database.
+
+Active courts with coordinates are bucketed into an in-process grid of
+CELL_DEGREES square cells. A radius query only visits the cells that
+overlap the query's bounding box and ranks the candidates by exact
+haversine distance.
+
+Each process keeps its own grid. The Court signals bump a version token
+in the Django cache and a process rebuilds its grid when the token no
+longer matches the one it was built against. A per-process cache
+(LocMem) never shows one worker another's bump, so there the token
+expires after a few seconds and each process rebuilds that often.
+"""
+from math import asin, cos, floor, radians, sin, sqrt
+import threading
+import uuid
+
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE_LAT = 111.32
+
+CELL_DEGREES = 0.1  # Roughly 11 km at the equator
+MAX_RADIUS_KM = 100
+
+VERSION_CACHE_KEY = 'court_geo_index_version'
+
+# Upper bound on a stale grid when the cache is per process
+LOCAL_VERSION_TIMEOUT = 5
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """Great-circle distance between two points in kilometres"""
+    lat1, lng1, lat2, lng2 = map(radians, (lat1, lng1, lat2, lng2))
+    a = (sin((lat2 - lat1) / 2) ** 2 +
+         cos(lat1) * cos(lat2) * sin((lng2 - lng1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * asin(sqrt(a))
+
+
+def bounding_box(lat, lng, radius_km):
+    """(min_lat, max_lat, min_lng, max_lng) enclosing a circle"""
+    lat_delta = radius_km / KM_PER_DEGREE_LAT
+    # Longitude degrees shrink towards the poles
+    lng_delta = radius_km / (KM_PER_DEGREE_LAT * max(cos(radians(lat)), 0.01))
+    return (
+        max(lat - lat_delta, -90.0), min(lat + lat_delta, 90.0),
+        max(lng - lng_delta, -180.0), min(lng + lng_delta, 180.0)
+    )
+
+
+def _cell(lat, lng):
+    return floor(lat / CELL_DEGREES), floor(lng / CELL_DEGREES)
+
+
+class GridIndex:
+    """Courts bucketed by grid cell: {(row, col): [(court_id, lat, lng)]}"""
+
+    def __init__(self, points, version=None):
+        self.version = version
+        self.cells = {}
+        for court_id, lat, lng in points:
+            lat, lng = float(lat), float(lng)
+            self.cells.setdefault(_cell(lat, lng), []).append(
+                (court_id, lat, lng))
+
+    def __len__(self):
+        return sum(len(points) for points in self.cells.values())
+
+    def nearby(self, lat, lng, radius_km):
+        """[(court_id, distance_km)] within radius_km, nearest first"""
+        min_lat, max_lat, min_lng, max_lng = bounding_box(lat, lng, radius_km)
+        min_row, min_col = _cell(min_lat, min_lng)
+        max_row, max_col = _cell(max_lat, max_lng)
+
+        results = []
+        for row in range(min_row, max_row + 1):
+            for col in range(min_col, max_col + 1):
+                for court_id, court_lat, court_lng in self.cells.get((row, col), ()):
+                    if not (min_lat <= court_lat <= max_lat and
+                            min_lng <= court_lng <= max_lng):
+                        continue
+                    distance = haversine_km(lat, lng, court_lat, court_lng)
+                    if distance <= radius_km:
+                        results.append((court_id, distance))
+
+        results.sort(key=lambda result: result[1])
+        return results
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def _version_timeout():
+    if isinstance(caches['default'], LocMemCache):
+        return LOCAL_VERSION_TIMEOUT
+    return None
+
+
+def build_index(version=None):
+    """Build a grid over every active court that has coordinates"""
+    from .models import Court
+
+    points = Court.objects.filter(
+        is_active=True,
+        latitude__isnull=False,
+        longitude__isnull=False
+    ).values_list('id', 'latitude', 'longitude')
+    return GridIndex(points.iterator(), version)
+
+
+def get_index():
+    """Return this process's grid, rebuilding it if courts have changed"""
+    global _index
+
+    version = cache.get(VERSION_CACHE_KEY)
+    if version is None:
+        version = uuid.uuid4().hex
+        if not cache.add(VERSION_CACHE_KEY, version, _version_timeout()):
+            version = cache.get(VERSION_CACHE_KEY)
+
+    index = _index
+    if index is not None and index.version == version:
+        return index
+
+    with _index_lock:
+        if _index is None or _index.version != version:
+            _index = build_index(version)
+        return _index
+
+
+def nearby_courts(lat, lng, radius_km):
+    """[(court_id, distance_km)] of active courts within radius_km"""
+    return get_index().nearby(lat, lng, min(radius_km, MAX_RADIUS_KM))
+
+
+def invalidate_index():
+    """Make every process rebuild its grid after the transaction commits"""
+    transaction.on_commit(lambda: cache.set(
+        VERSION_CACHE_KEY, uuid.uuid4().hex, _version_timeout()))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from court_management.ratings import average, rating_drift, recalculate_ratings
+
+
+class Command(BaseCommand):
+    help = 'Compare stored court ratings with their visible reviews (run periodically)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fix',
+            action='store_true',
+            help='Recalculate the courts that have drifted'
+        )
+
+    def handle(self, *args, **kwargs):
+        drift = rating_drift()
+
+        for court, rating_sum, count in drift:
+            self.stdout.write(
+                f'{court.name} (#{court.id}): stored '
+                f'{court.average_rating} from {court.rating_sum}/{court.total_reviews}, '
+                f'actual {average(rating_sum, count)} from {rating_sum}/{count}'
+            )
+
+        if not drift:
+            self.stdout.write(self.style.SUCCESS('All court ratings match their reviews'))
+        elif kwargs['fix']:
+            recalculate_ratings(court.id for court, _, _ in drift)
+            self.stdout.write(self.style.SUCCESS(f'Fixed {len(drift)} court(s)'))
+        else:
+            raise CommandError(f'{len(drift)} court(s) have drifted; rerun with --fix')
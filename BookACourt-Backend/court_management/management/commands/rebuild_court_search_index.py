@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from court_management.models import Court, CourtSearchDocument
+from court_management.search import build_document, bump_version
+
+
+class Command(BaseCommand):
+    help = 'Rebuild every court search document (e.g. after bulk imports)'
+
+    def handle(self, *args, **kwargs):
+        documents = [
+            CourtSearchDocument(court=court, **build_document(court))
+            for court in Court.objects.select_related('category').iterator()
+        ]
+
+        with transaction.atomic():
+            CourtSearchDocument.objects.all().delete()
+            CourtSearchDocument.objects.bulk_create(documents, batch_size=500)
+            bump_version()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Indexed {len(documents)} court(s)'))
@@ -1,39 +1,134 @@
-from django.core.management.base import BaseCommand
-from django.db.models import Avg, Count
-from court_management.models import Court, CourtReview
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Max, Min
+from concurrent.futures import ThreadPoolExecutor
+import time
+
+from court_management.models import Court
+from court_management.ratings import (
+    average, rebuild_review_summaries, save_ratings, true_ratings
+)
 
 
 class Command(BaseCommand):
-    help = 'Recalculate all court ratings and review counts'
+    help = 'Recalculate all court ratings, review counts and review summaries'
 
-    def handle(self, *args, **kwargs):
-        courts = Court.objects.all()
-        updated_count = 0
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--shards',
+            type=int,
+            default=1,
+            help='Split courts into this many contiguous id ranges'
+        )
+        parser.add_argument(
+            '--shard',
+            type=int,
+            help='Only process this shard (0-based), e.g. one per process; '
+                 'all shards run in parallel threads when omitted'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Courts per bulk UPDATE'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Print what would change without writing'
+        )
 
-        for court in courts:
-            reviews = CourtReview.objects.filter(
-                court=court,
-                is_visible=True
-            )
+    def handle(self, *args, **kwargs):
+        shards, shard = kwargs['shards'], kwargs['shard']
+        if shards < 1:
+            raise CommandError('--shards must be at least 1.')
+        if shard is not None and not 0 <= shard < shards:
+            raise CommandError(f'--shard must be between 0 and {shards - 1}.')
 
-            # Calculate average rating
-            avg_rating = reviews.aggregate(Avg('rating'))['rating__avg']
-            court.average_rating = round(avg_rating, 2) if avg_rating else 0.00
+        bounds = Court.objects.aggregate(low=Min('id'), high=Max('id'))
+        if bounds['low'] is None:
+            self.stdout.write(self.style.SUCCESS('No courts to update'))
+            return
 
-            # Update total reviews count
-            court.total_reviews = reviews.count()
+        # Contiguous id ranges keep each shard's scans on the indexes
+        span = -(-(bounds['high'] - bounds['low'] + 1) // shards)
+        ranges = [
+            (bounds['low'] + index * span, bounds['low'] + (index + 1) * span)
+            for index in range(shards)
+        ]
+        if shard is not None:
+            ranges = [ranges[shard]]
 
-            court.save(update_fields=['average_rating', 'total_reviews'])
-            updated_count += 1
+        began = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=len(ranges)) as pool:
+            results = list(pool.map(
+                lambda bounds: self.recalculate_range(
+                    *bounds, kwargs['batch_size'], kwargs['dry_run']),
+                ranges
+            ))
+        elapsed = time.perf_counter() - began
 
-            self.stdout.write(
-                self.style.SUCCESS(
-                    f'Updated {court.name}: {court.average_rating} stars ({court.total_reviews} reviews)'
-                )
-            )
+        for diff in sorted(line for result in results for line in result['diff']):
+            self.stdout.write(diff[1])
 
+        scanned = sum(result['scanned'] for result in results)
+        changed = sum(result['changed'] for result in results)
+        verb = 'Would update' if kwargs['dry_run'] else 'Updated'
+        self.stdout.write(
+            f'Aggregate {max(result["aggregate"] for result in results):.2f}s, '
+            f'compare {max(result["compare"] for result in results):.2f}s, '
+            f'write {max(result["write"] for result in results):.2f}s '
+            f'across {len(ranges)} shard(s)'
+        )
         self.stdout.write(
             self.style.SUCCESS(
-                f'\nSuccessfully updated {updated_count} court(s)'
+                f'\n{verb} {changed} of {scanned} court(s) in {elapsed:.2f}s'
             )
         )
+
+    def recalculate_range(self, low, high, batch_size, dry_run):
+        """Recalculate courts with low <= id < high"""
+        try:
+            began = time.perf_counter()
+            actual = true_ratings(court_id__gte=low, court_id__lt=high)
+            aggregated = time.perf_counter()
+
+            courts = Court.objects.filter(
+                id__gte=low, id__lt=high
+            ).values_list(
+                'id', 'name', 'rating_sum', 'total_reviews', 'average_rating'
+            ).order_by('id')
+
+            scanned = 0
+            changed = {}
+            diff = []
+            for court_id, name, rating_sum, count, rating in courts.iterator():
+                scanned += 1
+                new_sum, new_count = actual.get(court_id, (0, 0))
+                new_rating = average(new_sum, new_count)
+                if (rating_sum, count, rating) == (new_sum, new_count, new_rating):
+                    continue
+                changed[court_id] = (new_sum, new_count)
+                if dry_run:
+                    diff.append((court_id, (
+                        f'{name} (#{court_id}): {rating} ({count} reviews) -> '
+                        f'{new_rating} ({new_count} reviews)'
+                    )))
+            compared = time.perf_counter()
+
+            if not dry_run:
+                save_ratings(changed, batch_size=batch_size)
+                rebuild_review_summaries(id__gte=low, id__lt=high)
+            written = time.perf_counter()
+
+            return {
+                'scanned': scanned,
+                'changed': len(changed),
+                'diff': diff,
+                'aggregate': aggregated - began,
+                'compare': compared - aggregated,
+                'write': written - compared,
+            }
+        finally:
+            # Worker threads each open their own connection
+            connection.close()
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.9 on 2026-10-18 17:02
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('court_management', '0002_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='court',
+            index=models.Index(fields=['latitude', 'longitude'], name='courts_latitud_97d337_idx'),
+        ),
+    ]
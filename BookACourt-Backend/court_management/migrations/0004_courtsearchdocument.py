@@ -0,0 +1,69 @@
+# Generated by Django 5.2.9 on 2026-10-18 17:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def add_fulltext_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    schema_editor.execute(
+        'ALTER TABLE court_search_documents '
+        'ADD FULLTEXT INDEX court_search_ft_all (title, tags, body)')
+    schema_editor.execute(
+        'ALTER TABLE court_search_documents '
+        'ADD FULLTEXT INDEX court_search_ft_title (title)')
+
+
+def drop_fulltext_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    schema_editor.execute(
+        'ALTER TABLE court_search_documents '
+        'DROP INDEX court_search_ft_all, DROP INDEX court_search_ft_title')
+
+
+def build_search_documents(apps, schema_editor):
+    Court = apps.get_model('court_management', 'Court')
+    CourtSearchDocument = apps.get_model(
+        'court_management', 'CourtSearchDocument')
+
+    documents = []
+    for court in Court.objects.select_related('category').iterator():
+        category = court.category.name if court.category_id else ''
+        documents.append(CourtSearchDocument(
+            court=court,
+            title=court.name,
+            tags=' '.join(filter(None, [court.city, court.court_type, category])),
+            body=' '.join(filter(None, [
+                court.description,
+                court.amenities.replace(',', ' '),
+                court.address
+            ]))
+        ))
+    CourtSearchDocument.objects.bulk_create(documents, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('court_management', '0003_court_location_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourtSearchDocument',
+            fields=[
+                ('court', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='court_management.court')),
+                ('title', models.CharField(max_length=200)),
+                ('tags', models.TextField(blank=True)),
+                ('body', models.TextField(blank=True)),
+                ('updated_at', models.DateTimeField(auto_now=True, db_index=True)),
+            ],
+            options={
+                'db_table': 'court_search_documents',
+            },
+        ),
+        migrations.RunPython(add_fulltext_indexes, drop_fulltext_indexes),
+        migrations.RunPython(build_search_documents, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.9 on 2026-10-18 17:11
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('court_management', '0004_courtsearchdocument'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='courtreview',
+            index=models.Index(fields=['court', 'is_visible', 'created_at'], name='court_revie_court_i_fc5e76_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='courtreview',
+            index=models.Index(fields=['is_visible', 'created_at'], name='court_revie_is_visi_bdd86f_idx'),
+        ),
+        migrations.RemoveIndex(
+            model_name='courtreview',
+            name='court_revie_court_i_ae89a4_idx',
+        ),
+    ]
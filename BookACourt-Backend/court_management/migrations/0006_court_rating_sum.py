@@ -0,0 +1,47 @@
+# Generated by Django 5.2.9 on 2026-10-18 17:16
+
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_ratings(apps, schema_editor):
+    Court = apps.get_model('court_management', 'Court')
+    CourtReview = apps.get_model('court_management', 'CourtReview')
+
+    totals = {
+        court_id: (rating_sum, count)
+        for court_id, rating_sum, count in CourtReview.objects.filter(
+            is_visible=True
+        ).values_list('court_id').annotate(Sum('rating'), Count('id')).order_by()
+    }
+    courts = []
+    for court in Court.objects.only('id').iterator():
+        rating_sum, count = totals.get(court.id, (0, 0))
+        court.rating_sum = rating_sum
+        court.total_reviews = count
+        court.average_rating = (
+            (Decimal(rating_sum) / count).quantize(
+                Decimal('0.01'), rounding=ROUND_HALF_UP)
+            if count else Decimal('0.00'))
+        courts.append(court)
+    Court.objects.bulk_update(
+        courts, ['rating_sum', 'total_reviews', 'average_rating'],
+        batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('court_management', '0005_review_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='court',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_ratings, migrations.RunPython.noop),
+    ]
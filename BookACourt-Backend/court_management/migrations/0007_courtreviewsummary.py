@@ -0,0 +1,62 @@
+# Generated by Django 5.2.9 on 2026-10-18 17:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def build_review_summaries(apps, schema_editor):
+    Court = apps.get_model('court_management', 'Court')
+    CourtReview = apps.get_model('court_management', 'CourtReview')
+    CourtReviewSummary = apps.get_model(
+        'court_management', 'CourtReviewSummary')
+
+    # This month and the previous two, as in court_management.ratings
+    today = timezone.localdate()
+    year, month = today.year, today.month
+    recent = set()
+    for _ in range(3):
+        recent.add(f'{year:04d}-{month:02d}')
+        year, month = (year, month - 1) if month > 1 else (year - 1, 12)
+
+    summaries = {
+        court_id: CourtReviewSummary(court_id=court_id)
+        for court_id in Court.objects.values_list('id', flat=True)
+    }
+    for court_id, rating, owner_response, created_at in CourtReview.objects.filter(
+            is_visible=True
+    ).values_list('court_id', 'rating', 'owner_response', 'created_at').iterator():
+        summary = summaries[court_id]
+        summary.histogram[str(rating)] = summary.histogram.get(str(rating), 0) + 1
+        if owner_response:
+            summary.responded_reviews += 1
+        key = timezone.localtime(created_at).strftime('%Y-%m')
+        if key in recent:
+            bucket = summary.monthly.setdefault(key, [0, 0])
+            bucket[0] += rating
+            bucket[1] += 1
+    CourtReviewSummary.objects.bulk_create(summaries.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('court_management', '0006_court_rating_sum'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourtReviewSummary',
+            fields=[
+                ('court', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='review_summary', serialize=False, to='court_management.court')),
+                ('histogram', models.JSONField(default=dict)),
+                ('responded_reviews', models.PositiveIntegerField(default=0)),
+                ('monthly', models.JSONField(default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'court_review_summaries',
+            },
+        ),
+        migrations.RunPython(build_review_summaries, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,7 @@
-from django.db import models
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import models, transaction
+from django.db.models import Count
 from user_management.models import User, UserRole
 
 
@@ -13,6 +16,11 @@ class CourtCategory(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    COURT_COUNTS_CACHE_KEY = 'category_active_court_counts'
+    COURT_COUNTS_TIMEOUT = 60 * 60
+    # Invalidation only reaches other processes through a shared cache
+    LOCAL_COURT_COUNTS_TIMEOUT = 5
+
     class Meta:
         db_table = 'court_categories'
         verbose_name = 'Court Category'
@@ -22,6 +30,30 @@ class CourtCategory(models.Model):
     def __str__(self):
         return self.name
 
+    @classmethod
+    def active_court_counts(cls):
+        """{category_id: number of active courts}, cached"""
+        counts = cache.get(cls.COURT_COUNTS_CACHE_KEY)
+        if counts is None:
+            counts = dict(Court.objects.filter(
+                is_active=True,
+                category__isnull=False
+            ).values_list('category').annotate(count=Count('id')).order_by())
+            cache.set(cls.COURT_COUNTS_CACHE_KEY, counts,
+                      cls._court_counts_timeout())
+        return counts
+
+    @classmethod
+    def _court_counts_timeout(cls):
+        if isinstance(caches['default'], LocMemCache):
+            return cls.LOCAL_COURT_COUNTS_TIMEOUT
+        return cls.COURT_COUNTS_TIMEOUT
+
+    @classmethod
+    def invalidate_court_counts(cls):
+        """Drop the cached counts after the transaction commits"""
+        transaction.on_commit(lambda: cache.delete(cls.COURT_COUNTS_CACHE_KEY))
+
 
 class CourtRegistration(models.Model):
     """Model for court registration requests (User Story 1, 10)"""
@@ -133,10 +165,11 @@ class Court(models.Model):
     is_active = models.BooleanField(default=True)
     is_verified = models.BooleanField(default=False)
 
-    # Rating
+    # Rating, maintained incrementally from visible reviews
     average_rating = models.DecimalField(
         max_digits=3, decimal_places=2, default=0.00)
     total_reviews = models.IntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
 
     # Contact
     phone_number = models.CharField(max_length=20)
@@ -152,6 +185,7 @@ class Court(models.Model):
             models.Index(fields=['city', 'is_active']),
             models.Index(fields=['category', 'is_active']),
             models.Index(fields=['court_type']),
+            models.Index(fields=['latitude', 'longitude']),
         ]
 
     def __str__(self):
@@ -175,6 +209,88 @@ class CourtImage(models.Model):
         return f"Image for {self.court.name}"
 
 
+class CourtSearchDocument(models.Model):
+    """Denormalized text searched by the court search backends"""
+    court = models.OneToOneField(
+        Court,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='search_document'
+    )
+
+    # Weighted from most to least significant
+    title = models.CharField(max_length=200)  # Court name
+    tags = models.TextField(blank=True)  # City, type, category
+    body = models.TextField(blank=True)  # Description, amenities, address
+
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        db_table = 'court_search_documents'
+
+    def __str__(self):
+        return f"Search document for {self.title}"
+
+
+class CourtReviewSummary(models.Model):
+    """Review statistics for court detail, maintained by the review signals"""
+    court = models.OneToOneField(
+        Court,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='review_summary'
+    )
+
+    # Visible reviews only, like the court's rating
+    histogram = models.JSONField(default=dict)  # {"5": count}
+    responded_reviews = models.PositiveIntegerField(default=0)
+    # {"2026-10": [rating_sum, count]} for the recent months only
+    monthly = models.JSONField(default=dict)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'court_review_summaries'
+
+    def __str__(self):
+        return f"Review summary for court {self.court_id}"
+
+    def apply(self, state, sign):
+        """Add (sign=1) or remove (sign=-1) a review_state()"""
+        from .ratings import recent_months
+
+        rating, responded, month = state
+        key = str(rating)
+        self.histogram[key] = self.histogram.get(key, 0) + sign
+        if responded:
+            self.responded_reviews += sign
+        if month in recent_months():
+            bucket = self.monthly.setdefault(month, [0, 0])
+            bucket[0] += sign * rating
+            bucket[1] += sign
+
+    def prune(self):
+        """Drop month buckets that have left the recent window"""
+        from .ratings import recent_months
+
+        window = recent_months()
+        self.monthly = {month: bucket for month, bucket in self.monthly.items()
+                        if month in window}
+
+    @property
+    def total_reviews(self):
+        return sum(self.histogram.values())
+
+    def recent_totals(self):
+        """(rating_sum, count) over the recent months"""
+        from .ratings import recent_months
+
+        buckets = [self.monthly[month] for month in recent_months()
+                   if month in self.monthly]
+        return (sum(bucket[0] for bucket in buckets),
+                sum(bucket[1] for bucket in buckets))
+
+
 class DynamicPricing(models.Model):
     """Model for dynamic pricing rules (User Story 14)"""
     court = models.ForeignKey(
@@ -267,7 +383,8 @@ class CourtReview(models.Model):
         unique_together = ['court', 'player']
         ordering = ['-created_at']
         indexes = [
-            models.Index(fields=['court', 'is_visible']),
+            models.Index(fields=['court', 'is_visible', 'created_at']),
+            models.Index(fields=['is_visible', 'created_at']),
         ]
 
     def __str__(self):
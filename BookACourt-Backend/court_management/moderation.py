@@ -0,0 +1,41 @@
+"""
+Bulk review moderation for the admin and the API.
+
+An action is applied to every selected review with one UPDATE, skipping
+reviews it would not change. The signals that keep ratings and review
+summaries in step do not fire for update(), so every affected court is
+then recalculated once, however many of its reviews were moderated.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from .ratings import recalculate_ratings
+
+MODERATION_ACTIONS = {
+    'approve': {'is_visible': True, 'is_flagged': False},
+    'hide': {'is_visible': False},
+    'flag': {'is_flagged': True},
+}
+
+
+def moderate_reviews(reviews, action, reason=''):
+    """
+    Apply a moderation action to a CourtReview queryset. Returns the
+    number of reviews changed and the ids of the courts they belong to.
+    """
+    changes = MODERATION_ACTIONS[action]
+    if action == 'flag' and reason:
+        changes = {**changes, 'flag_reason': reason}
+
+    with transaction.atomic():
+        # Only rows the action would change
+        reviews = reviews.exclude(**MODERATION_ACTIONS[action])
+        court_ids = set(reviews.values_list('court_id', flat=True))
+        updated = reviews.update(**changes, updated_at=timezone.now())
+
+        if 'is_visible' in changes:
+            recalculate_ratings(court_ids)
+
+    from api.caching import bump_generations
+    bump_generations(*[f'reviews:{court_id}' for court_id in court_ids])
+    return updated, sorted(court_ids)
@@ -0,0 +1,331 @@
+"""
+Per-court daily slot occupancy bitmaps.
+
+Each (court, date) pair is summarised as two fixed-width bitmaps at
+15-minute granularity (96 bits per day): one for active bookings and
+one for blocked slots, plus the bits of any slot holds together with
+their expiry. The entry lives in the Django cache so that availability
+reads are a bit scan instead of a database round trip. Expired holds
+are simply ignored on read.
+
+Entries are never patched in place. Each (court, date) has a version
+key in the cache that the Booking / CourtBlockedSlot / SlotHold signals
+bump after commit, and entries are stored under the version they were
+read at. A rebuild that read the database before a change therefore
+lands under a version nobody reads any more, instead of overwriting
+the fresh entry with stale bits.
+
+Rows that start or end inside a slot mark the whole slot, so a clash
+in a slot an interval only partly covers may be no clash at all
+(10:05-11:00 next to 10:00-10:05). slot_conflict() trusts the bitmaps
+for slots the interval covers entirely and asks the database otherwise.
+"""
+from collections import defaultdict, namedtuple
+from datetime import time, timedelta
+import time as clock
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+
+SLOT_MINUTES = 15
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+FULL_DAY_MASK = (1 << SLOTS_PER_DAY) - 1
+
+# Booking statuses that hold a court slot
+ACTIVE_BOOKING_STATUSES = ['PENDING', 'CONFIRMED']
+
+CACHE_KEY_PREFIX = 'court_occupancy'
+VERSION_KEY_PREFIX = 'court_occupancy_version'
+CACHE_TIMEOUT = 60 * 10  # Safety net for writes that bypass signals
+
+
+def time_to_slot(value, round_up=False):
+    """Convert a time of day to a slot index (floor by default)"""
+    minutes = value.hour * 60 + value.minute
+    if round_up:
+        return -(-(minutes + (value.second > 0)) // SLOT_MINUTES)
+    return minutes // SLOT_MINUTES
+
+
+def slot_to_time(index):
+    """Convert a slot index back to the time it starts at"""
+    if index >= SLOTS_PER_DAY:
+        return time(0, 0)
+    minutes = index * SLOT_MINUTES
+    return time(minutes // 60, minutes % 60)
+
+
+def interval_mask(start_time, end_time, whole_slots=False):
+    """
+    Bitmask covering every slot touched by [start_time, end_time), or
+    with whole_slots only the slots it covers entirely
+    """
+    start = time_to_slot(start_time, round_up=whole_slots)
+    end = time_to_slot(end_time, round_up=not whole_slots)
+    if end_time == time(0, 0) and start_time != end_time:
+        # An interval ending at midnight runs to the end of the day
+        end = SLOTS_PER_DAY
+    if end <= start:
+        return 0
+    return ((1 << (end - start)) - 1) << start
+
+
+class DayOccupancy(namedtuple('DayOccupancy', ['booked', 'blocked', 'holds'],
+                              defaults=((),))):
+    """
+    Booked and blocked bitmaps for a single court on a single day.
+    holds is a tuple of (bits, expires_at timestamp) pairs.
+    """
+    __slots__ = ()
+
+    @property
+    def held(self):
+        now = clock.time()
+        bits = 0
+        for hold_bits, expires_at in self.holds:
+            if expires_at > now:
+                bits |= hold_bits
+        return bits
+
+    @property
+    def mask(self):
+        return self.booked | self.blocked | self.held
+
+    def is_free(self, start_time, end_time):
+        return not self.mask & interval_mask(start_time, end_time)
+
+    def conflict(self, start_time=None, end_time=None, whole_slots=False):
+        """
+        Return 'blocked', 'booked', 'held' or None for the given interval.
+        Without times the whole day is checked. With whole_slots only the
+        slots the interval covers entirely count, so a conflict found is
+        certain rather than possible.
+        """
+        if start_time and end_time:
+            wanted = interval_mask(start_time, end_time, whole_slots)
+        else:
+            wanted = FULL_DAY_MASK
+        if self.blocked & wanted:
+            return 'blocked'
+        if self.booked & wanted:
+            return 'booked'
+        if self.held & wanted:
+            return 'held'
+        return None
+
+
+def _version_key(court_id, date):
+    return f'{VERSION_KEY_PREFIX}:{court_id}:{date.isoformat()}'
+
+
+def _cache_key(court_id, date):
+    """Key of the current entry for a court/day"""
+    version_key = _version_key(court_id, date)
+    version = cache.get(version_key)
+    if version is None:
+        # Unique start, so an evicted version never revives old entries
+        cache.add(version_key, clock.time_ns(), None)
+        version = cache.get(version_key)
+    return f'{CACHE_KEY_PREFIX}:{court_id}:{date.isoformat()}:{version}'
+
+
+def _build_masks(bookings, blocked_slots, holds=()):
+    booked = 0
+    for start, end in bookings:
+        booked |= interval_mask(start, end)
+    blocked = 0
+    for start, end in blocked_slots:
+        blocked |= interval_mask(start, end)
+    held = tuple(
+        (interval_mask(start, end), expires_at.timestamp())
+        for start, end, expires_at in holds
+    )
+    return DayOccupancy(booked, blocked, held)
+
+
+def rebuild_day_occupancy(court_id, date, key=None):
+    """Recompute the bitmaps for one court/day from the database"""
+    from booking_management.models import Booking, SlotHold
+    from .models import CourtBlockedSlot
+
+    # Read the version before the rows it describes
+    key = key or _cache_key(court_id, date)
+
+    bookings = Booking.objects.filter(
+        court_id=court_id,
+        booking_date=date,
+        status__in=ACTIVE_BOOKING_STATUSES
+    ).values_list('start_time', 'end_time')
+
+    blocked_slots = CourtBlockedSlot.objects.filter(
+        court_id=court_id,
+        blocked_date=date
+    ).values_list('start_time', 'end_time')
+
+    holds = SlotHold.objects.filter(
+        court_id=court_id,
+        hold_date=date,
+        expires_at__gt=timezone.now()
+    ).values_list('start_time', 'end_time', 'expires_at')
+
+    occupancy = _build_masks(bookings, blocked_slots, holds)
+    cache.set(key, tuple(occupancy), CACHE_TIMEOUT)
+    return occupancy
+
+
+# Courts fetched per round of grouped queries when iterating a matrix
+MATRIX_CHUNK_COURTS = 50
+
+
+def iter_occupancy_matrix(court_ids, date_from, date_to,
+                          chunk_size=MATRIX_CHUNK_COURTS):
+    """
+    Yield (court_id, [DayOccupancy per day from date_from to date_to])
+    for each court in order. Courts are fetched chunk_size at a time with
+    one grouped query each for bookings, blocked slots and holds, so
+    memory stays bounded by one chunk whatever the number of courts.
+    Nothing is written to the per-day cache: a wide range would evict
+    the entries that single-day reads rely on.
+    """
+    from booking_management.models import Booking, SlotHold
+    from .models import CourtBlockedSlot
+
+    days = [date_from + timedelta(days=offset)
+            for offset in range((date_to - date_from).days + 1)]
+    court_ids = list(court_ids)
+
+    for index in range(0, len(court_ids), chunk_size):
+        chunk = court_ids[index:index + chunk_size]
+        booked = defaultdict(int)
+        blocked = defaultdict(int)
+        held = defaultdict(tuple)
+
+        bookings = Booking.objects.filter(
+            court_id__in=chunk,
+            booking_date__range=(date_from, date_to),
+            status__in=ACTIVE_BOOKING_STATUSES
+        ).values_list('court_id', 'booking_date', 'start_time', 'end_time')
+        for court_id, date, start, end in bookings.iterator():
+            booked[court_id, date] |= interval_mask(start, end)
+
+        blocked_slots = CourtBlockedSlot.objects.filter(
+            court_id__in=chunk,
+            blocked_date__range=(date_from, date_to)
+        ).values_list('court_id', 'blocked_date', 'start_time', 'end_time')
+        for court_id, date, start, end in blocked_slots.iterator():
+            blocked[court_id, date] |= interval_mask(start, end)
+
+        holds = SlotHold.objects.filter(
+            court_id__in=chunk,
+            hold_date__range=(date_from, date_to),
+            expires_at__gt=timezone.now()
+        ).values_list('court_id', 'hold_date', 'start_time', 'end_time',
+                      'expires_at')
+        for court_id, date, start, end, expires_at in holds.iterator():
+            held[court_id, date] += (
+                (interval_mask(start, end), expires_at.timestamp()),)
+
+        for court_id in chunk:
+            yield court_id, [
+                DayOccupancy(
+                    booked.get((court_id, date), 0),
+                    blocked.get((court_id, date), 0),
+                    held.get((court_id, date), ())
+                )
+                for date in days
+            ]
+
+
+def build_occupancy_matrix(court_ids, date_from, date_to):
+    """
+    Compute bitmaps for every court/day in a range with grouped fetches.
+    Returns {(court_id, date): DayOccupancy}.
+    """
+    matrix = {}
+    for court_id, occupancies in iter_occupancy_matrix(
+            court_ids, date_from, date_to):
+        for offset, occupancy in enumerate(occupancies):
+            matrix[court_id, date_from + timedelta(days=offset)] = occupancy
+    return matrix
+
+
+def get_day_occupancy(court_id, date):
+    """Return the cached bitmaps for a court/day, rebuilding on a miss"""
+    key = _cache_key(court_id, date)
+    cached = cache.get(key)
+    if cached is not None:
+        return DayOccupancy(*cached)
+    return rebuild_day_occupancy(court_id, date, key)
+
+
+def exact_conflict(court_id, date, start_time, end_time):
+    """'blocked', 'booked', 'held' or None from the rows themselves"""
+    from booking_management.models import Booking, SlotHold
+    from .models import CourtBlockedSlot
+
+    overlap = {'start_time__lt': end_time, 'end_time__gt': start_time}
+    if CourtBlockedSlot.objects.filter(
+            court_id=court_id, blocked_date=date, **overlap).exists():
+        return 'blocked'
+    if Booking.objects.filter(
+            court_id=court_id, booking_date=date,
+            status__in=ACTIVE_BOOKING_STATUSES, **overlap).exists():
+        return 'booked'
+    if SlotHold.objects.filter(
+            court_id=court_id, hold_date=date,
+            expires_at__gt=timezone.now(), **overlap).exists():
+        return 'held'
+    return None
+
+
+def slot_conflict(court_id, date, start_time, end_time):
+    """
+    'blocked', 'booked', 'held' or None for an interval. The bitmaps
+    answer unless the only clashes are in slots the interval partly
+    covers; those are checked against the database.
+    """
+    occupancy = get_day_occupancy(court_id, date)
+    if not occupancy.conflict(start_time, end_time):
+        return None
+    return (occupancy.conflict(start_time, end_time, whole_slots=True) or
+            exact_conflict(court_id, date, start_time, end_time))
+
+
+def invalidate_day_occupancy(court_id, date):
+    """Retire the cached bitmaps for a court/day after the transaction commits"""
+    def bump():
+        key = _version_key(court_id, date)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, clock.time_ns(), None)
+
+    transaction.on_commit(bump)
+
+
+def invalidate_days(days):
+    """Invalidate several (court_id, date) pairs, e.g. before a bulk update()"""
+    for court_id, date in set(days):
+        invalidate_day_occupancy(court_id, date)
+
+
+def free_intervals(occupancy, opening_time, closing_time, step_minutes=60):
+    """
+    Yield (start_time, end_time) pairs of free fixed-length intervals
+    between opening and closing time.
+    """
+    step = max(1, step_minutes // SLOT_MINUTES)
+    opening = time_to_slot(opening_time)
+    closing = time_to_slot(closing_time, round_up=True)
+    if closing_time == time(0, 0):
+        closing = SLOTS_PER_DAY
+    window = (1 << step) - 1
+    mask = occupancy.mask
+
+    current = opening
+    while current + step <= closing:
+        if not (mask >> current) & window:
+            yield slot_to_time(current), slot_to_time(current + step)
+        current += step
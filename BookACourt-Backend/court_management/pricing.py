@@ -0,0 +1,164 @@
+"""
+Compiled per-court price tables.
+
+A court's active DynamicPricing rules are compiled once into a flat
+array holding, for every weekday, the running total of the hourly rate
+(in paisa) minute by minute. Pricing any interval is then two lookups
+and a subtraction instead of a walk over the rules. Minutes no rule
+covers are charged at the court's base_hourly_rate; where rules overlap
+the highest rate wins.
+
+The compiled table lives in the Django cache and is dropped by the
+DynamicPricing and Court signals.
+"""
+from array import array
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.core.cache import cache
+from django.db import transaction
+
+
+MINUTES_PER_DAY = 24 * 60
+DAYS_PER_WEEK = 7
+
+# Each weekday row holds MINUTES_PER_DAY + 1 prefix sums
+ROW_LENGTH = MINUTES_PER_DAY + 1
+
+CACHE_KEY_PREFIX = 'court_pricing'
+CACHE_TIMEOUT = 60 * 60 * 24  # Safety net for writes that bypass signals
+
+CENT = Decimal('0.01')
+
+
+def _to_paisa(amount):
+    return int((Decimal(amount) * 100).to_integral_value(ROUND_HALF_UP))
+
+
+def time_to_minute(value, end=False):
+    """Minute of the day for a time; a 00:00 end time means midnight"""
+    minute = value.hour * 60 + value.minute
+    if end and minute == 0:
+        return MINUTES_PER_DAY
+    return minute
+
+
+def parse_days_of_week(value):
+    """Turn '0,1, 2' into {0, 1, 2}, ignoring anything that isn't a weekday"""
+    days = set()
+    for part in (value or '').split(','):
+        part = part.strip()
+        if part.isdigit() and int(part) < DAYS_PER_WEEK:
+            days.add(int(part))
+    return days
+
+
+class PriceTable:
+    """Prefix sums of the hourly rate (in paisa) for each minute of the week"""
+
+    __slots__ = ('prefix',)
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+
+    @classmethod
+    def compile(cls, base_hourly_rate, rules):
+        """
+        Build a table from a base rate and an iterable of
+        (start_time, end_time, days_of_week, hourly_rate) rules
+        """
+        base = _to_paisa(base_hourly_rate)
+        # -1 marks minutes no rule covers yet
+        rates = [array('q', [-1]) * MINUTES_PER_DAY
+                 for _ in range(DAYS_PER_WEEK)]
+
+        for start_time, end_time, days_of_week, hourly_rate in rules:
+            start = time_to_minute(start_time)
+            end = time_to_minute(end_time, end=True)
+            if end <= start:
+                continue
+            rate = _to_paisa(hourly_rate)
+            for day in parse_days_of_week(days_of_week):
+                row = rates[day]
+                for minute in range(start, end):
+                    if rate > row[minute]:
+                        row[minute] = rate
+
+        prefix = array('q', bytes(8 * ROW_LENGTH * DAYS_PER_WEEK))
+        for day, row in enumerate(rates):
+            offset = day * ROW_LENGTH
+            total = 0
+            for minute, rate in enumerate(row, start=1):
+                total += base if rate < 0 else rate
+                prefix[offset + minute] = total
+        return cls(prefix)
+
+    def price(self, weekday, start_time, end_time):
+        """Price of [start_time, end_time) on a weekday (0=Monday)"""
+        start = time_to_minute(start_time)
+        end = time_to_minute(end_time, end=True)
+        if end <= start:
+            return Decimal('0.00')
+        offset = weekday * ROW_LENGTH
+        # Each minute contributes rate / 60 paisa
+        paisa = Decimal(self.prefix[offset + end] - self.prefix[offset + start])
+        return (paisa / 6000).quantize(CENT, ROUND_HALF_UP)
+
+    def price_for_date(self, date, start_time, end_time):
+        return self.price(date.weekday(), start_time, end_time)
+
+    def price_intervals(self, weekday, intervals):
+        """
+        Yield (start_time, end_time, price) for each interval, reading the
+        prefix sums directly rather than pricing each interval separately
+        """
+        prefix = self.prefix
+        offset = weekday * ROW_LENGTH
+        for start_time, end_time in intervals:
+            start = offset + time_to_minute(start_time)
+            end = offset + time_to_minute(end_time, end=True)
+            paisa = Decimal(prefix[end] - prefix[start]) if end > start else 0
+            yield start_time, end_time, (paisa / 6000).quantize(
+                CENT, ROUND_HALF_UP)
+
+    def hourly_rate_at(self, weekday, value):
+        """Hourly rate in force at a given minute"""
+        minute = time_to_minute(value)
+        offset = weekday * ROW_LENGTH + minute
+        paisa = self.prefix[offset + 1] - self.prefix[offset]
+        return (Decimal(paisa) / 100).quantize(CENT)
+
+
+def _cache_key(court_id):
+    return f'{CACHE_KEY_PREFIX}:{court_id}'
+
+
+def compile_price_table(court):
+    """Compile a court's active pricing rules and cache the result"""
+    from .models import DynamicPricing
+
+    rules = DynamicPricing.objects.filter(
+        court_id=court.id,
+        is_active=True
+    ).values_list('start_time', 'end_time', 'days_of_week', 'hourly_rate')
+
+    table = PriceTable.compile(court.base_hourly_rate, rules)
+    cache.set(_cache_key(court.id), table.prefix, CACHE_TIMEOUT)
+    return table
+
+
+def get_price_table(court):
+    """Return the cached price table for a court, compiling on a miss"""
+    prefix = cache.get(_cache_key(court.id))
+    if prefix is not None:
+        return PriceTable(prefix)
+    return compile_price_table(court)
+
+
+def quote_price(court, date, start_time, end_time):
+    """Price of booking a court for an interval on a date"""
+    return get_price_table(court).price_for_date(date, start_time, end_time)
+
+
+def invalidate_price_table(court_id):
+    """Drop the compiled table for a court after the transaction commits"""
+    transaction.on_commit(lambda: cache.delete(_cache_key(court_id)))
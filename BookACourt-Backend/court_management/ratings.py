@@ -0,0 +1,243 @@
+"""
+Incremental court ratings.
+
+Each court stores the sum and count of its visible review ratings
+(rating_sum, total_reviews) next to the derived average_rating. Review
+signals apply the difference a change makes with an F() UPDATE, so
+saving a review costs O(1) whatever the number of reviews, and
+concurrent reviews on the same court do not overwrite each other. The
+average is then derived from the updated row by average() while the
+UPDATE still holds the row lock, so it is rounded the same way
+everywhere: SQL ROUND() of a DOUBLE rounds halves to even on MySQL.
+
+The same signals keep each court's CourtReviewSummary (star histogram,
+responses and monthly buckets for the recent average) current, under
+a row lock on the summary.
+
+Updates that bypass signals (queryset.update(), raw SQL) and any drift
+are fixed by recalculate_ratings(); check_court_ratings runs
+rating_drift() periodically to report and repair mismatches.
+"""
+from datetime import datetime
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+
+RATING_PLACES = Decimal('0.01')
+
+# The recent average covers this month and the previous two
+RECENT_MONTHS = 3
+
+
+def contribution(rating, is_visible):
+    """(sum, count) a review with this state adds to its court"""
+    return (rating, 1) if is_visible else (0, 0)
+
+
+def average(rating_sum, count):
+    """Average rating as stored on Court"""
+    if not count:
+        return Decimal('0.00')
+    return (Decimal(rating_sum) / count).quantize(
+        RATING_PLACES, rounding=ROUND_HALF_UP)
+
+
+def apply_rating_delta(court_id, sum_delta, count_delta):
+    """Add a change in visible ratings to a court atomically"""
+    from .models import Court
+
+    if not sum_delta and not count_delta:
+        return
+
+    court = Court.objects.filter(pk=court_id)
+    with transaction.atomic():
+        if not court.update(
+                rating_sum=F('rating_sum') + sum_delta,
+                total_reviews=F('total_reviews') + count_delta,
+                updated_at=timezone.now()):
+            return
+        # The UPDATE holds the row lock until commit, so no other delta
+        # lands between it and this read
+        rating_sum, count = court.values_list(
+            'rating_sum', 'total_reviews').get()
+        court.update(average_rating=average(rating_sum, count))
+
+
+def true_ratings(court_ids=None, **filters):
+    """
+    {court_id: (rating_sum, count)} aggregated from visible reviews, in
+    one grouped query. filters narrow the reviews, e.g. court_id__gte.
+    """
+    from .models import CourtReview
+
+    reviews = CourtReview.objects.filter(is_visible=True, **filters)
+    if court_ids is not None:
+        reviews = reviews.filter(court_id__in=court_ids)
+    return {
+        court_id: (rating_sum, count)
+        for court_id, rating_sum, count in reviews.values_list(
+            'court_id'
+        ).annotate(Sum('rating'), Count('id')).order_by()
+    }
+
+
+def rating_drift(court_ids=None):
+    """
+    [(court, true_sum, true_count)] for courts whose stored rating
+    fields disagree with their visible reviews
+    """
+    from .models import Court
+
+    courts = Court.objects.only(
+        'id', 'name', 'rating_sum', 'total_reviews', 'average_rating')
+    if court_ids is not None:
+        courts = courts.filter(id__in=court_ids)
+
+    actual = true_ratings(court_ids)
+    drift = []
+    for court in courts.iterator():
+        rating_sum, count = actual.get(court.id, (0, 0))
+        if (court.rating_sum != rating_sum or
+                court.total_reviews != count or
+                court.average_rating != average(rating_sum, count)):
+            drift.append((court, rating_sum, count))
+    return drift
+
+
+def save_ratings(ratings, batch_size=None):
+    """Write {court_id: (rating_sum, count)} to the courts in bulk"""
+    from .models import Court
+
+    if not ratings:
+        return
+    now = timezone.now()
+    courts = [
+        Court(
+            id=court_id,
+            rating_sum=rating_sum,
+            total_reviews=count,
+            average_rating=average(rating_sum, count),
+            updated_at=now
+        )
+        for court_id, (rating_sum, count) in ratings.items()
+    ]
+    Court.objects.bulk_update(
+        courts,
+        ['rating_sum', 'total_reviews', 'average_rating', 'updated_at'],
+        batch_size=batch_size
+    )
+
+    # bulk_update() skips the signals that drop cached API responses
+    from api.caching import bump_generations
+    bump_generations('courts', *[f'court:{court_id}' for court_id in ratings])
+
+
+def recalculate_ratings(court_ids):
+    """Rewrite the rating fields of these courts from their reviews"""
+    court_ids = set(court_ids)
+    if not court_ids:
+        return
+    actual = true_ratings(court_ids)
+    save_ratings({
+        court_id: actual.get(court_id, (0, 0)) for court_id in court_ids
+    })
+    rebuild_review_summaries(court_ids)
+
+
+def recent_months(today=None):
+    """Month keys ("2026-10") in the recent window, newest first"""
+    today = today or timezone.localdate()
+    year, month = today.year, today.month
+    months = []
+    for _ in range(RECENT_MONTHS):
+        months.append(f'{year:04d}-{month:02d}')
+        year, month = (year, month - 1) if month > 1 else (year - 1, 12)
+    return tuple(months)
+
+
+def _month_start(month):
+    """Aware start of a month key ("2026-10") in the current time zone"""
+    return timezone.make_aware(datetime.strptime(month, '%Y-%m'))
+
+
+def review_state(rating, is_visible, owner_response, created_at):
+    """What a review counts for in its court's summary; None if hidden"""
+    if not is_visible:
+        return None
+    month = timezone.localtime(created_at).strftime('%Y-%m')
+    return (rating, bool(owner_response), month)
+
+
+def update_review_summary(court_id, previous, current):
+    """Move one review in its court's summary from one state to another"""
+    from .models import CourtReviewSummary
+
+    if previous == current:
+        return
+    summaries = CourtReviewSummary.objects.select_for_update()
+    with transaction.atomic():
+        summary = summaries.filter(court_id=court_id).first()
+        if summary is None:
+            if not current:
+                # Nothing to take off, e.g. the court is being deleted
+                return
+            CourtReviewSummary.objects.get_or_create(court_id=court_id)
+            summary = summaries.get(court_id=court_id)
+        if previous:
+            summary.apply(previous, -1)
+        if current:
+            summary.apply(current, 1)
+        summary.prune()
+        summary.save()
+
+
+def rebuild_review_summaries(court_ids=None, **filters):
+    """
+    Recompute the summaries of these courts (or of the courts matching
+    filters, e.g. id__gte) from their visible reviews
+    """
+    from .models import Court, CourtReview, CourtReviewSummary
+
+    courts = Court.objects.filter(**filters)
+    if court_ids is not None:
+        courts = courts.filter(id__in=court_ids)
+    reviews = CourtReview.objects.filter(is_visible=True, court__in=courts)
+
+    summaries = {
+        court_id: CourtReviewSummary(court_id=court_id)
+        for court_id in courts.values_list('id', flat=True)
+    }
+    for court_id, rating, count in reviews.values_list(
+            'court_id', 'rating').annotate(Count('id')).order_by():
+        summaries[court_id].histogram[str(rating)] = count
+    for court_id, responded in reviews.values_list('court_id').annotate(
+            responded=Count('id', filter=~Q(owner_response=''))).order_by():
+        summaries[court_id].responded_reviews = responded
+
+    # One range query per month: truncating created_at in SQL needs the
+    # MySQL time zone tables under USE_TZ and silently yields NULL without
+    window = recent_months()
+    for month, next_month in zip(window, (None,) + window[:-1]):
+        month_reviews = reviews.filter(created_at__gte=_month_start(month))
+        if next_month:
+            month_reviews = month_reviews.filter(
+                created_at__lt=_month_start(next_month))
+        for court_id, rating_sum, count in month_reviews.values_list(
+                'court_id').annotate(Sum('rating'), Count('id')).order_by():
+            summaries[court_id].monthly[month] = [rating_sum, count]
+
+    existing = set(CourtReviewSummary.objects.filter(
+        court_id__in=summaries).values_list('court_id', flat=True))
+    CourtReviewSummary.objects.bulk_create(
+        [summary for court_id, summary in summaries.items()
+         if court_id not in existing],
+        batch_size=1000
+    )
+    CourtReviewSummary.objects.bulk_update(
+        [summary for court_id, summary in summaries.items()
+         if court_id in existing],
+        ['histogram', 'responded_reviews', 'monthly'],
+        batch_size=1000
+    )
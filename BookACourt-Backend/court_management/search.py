@@ -0,0 +1,399 @@
+"""
+Full-text court search.
+
+Every court has a CourtSearchDocument holding its searchable text in
+three weighted fields. The document is rewritten whenever the court is
+saved, and queries go through a pluggable backend:
+
+- MySQLFullTextBackend uses InnoDB FULLTEXT indexes in boolean mode
+  with prefix matching. Terms shorter than innodb_ft_min_token_size are
+  not indexed, so they are left out of the query rather than required.
+  FULLTEXT has no typo tolerance: a query without any full-text match
+  is answered by an InvertedIndexBackend built on first use.
+- InvertedIndexBackend keeps an in-process inverted index and supports
+  prefix matches and single-typo matches on terms of four or more
+  characters. Each process pulls changed documents when the version
+  token in the cache moves. A per-process cache (LocMem) never shows
+  one worker another's bump, so there the token expires after a few
+  seconds and each process pulls changes that often.
+
+settings.COURT_SEARCH_BACKEND picks the backend: 'auto' (the default)
+uses the database's full-text search when it has one, or a dotted path
+to a backend class.
+
+Backends that rank in the database (ranks_in_database) annotate a Court
+queryset with its relevance, so listing, counting and paginating stay
+one query. The others return every match's id, best first, for the
+caller to page through.
+"""
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import timedelta
+import re
+import threading
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import connection, transaction
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+
+TOKEN_RE = re.compile(r'\w+')
+
+# Relative weight of a match in each document field
+FIELD_WEIGHTS = {'title': 3.0, 'tags': 2.0, 'body': 1.0}
+
+# Score multipliers for inexact term matches
+PREFIX_FACTOR = 0.6
+TYPO_FACTOR = 0.4
+MIN_TYPO_LENGTH = 4
+
+# innodb_ft_min_token_size; shorter words are not in a FULLTEXT index
+MIN_FULLTEXT_LENGTH = 3
+
+VERSION_CACHE_KEY = 'court_search_version'
+
+# Upper bound on a stale index when the cache is per process
+LOCAL_VERSION_TIMEOUT = 5
+
+# Court fields that feed the search document
+INDEXED_FIELDS = {
+    'name', 'city', 'court_type', 'category', 'description',
+    'amenities', 'address'
+}
+
+
+def tokenize(text):
+    return TOKEN_RE.findall((text or '').lower())
+
+
+def build_document(court):
+    """Searchable text for a court, split by field weight"""
+    category = court.category.name if court.category_id else ''
+    return {
+        'title': court.name,
+        'tags': ' '.join(filter(None, [court.city, court.court_type, category])),
+        'body': ' '.join(filter(None, [
+            court.description,
+            court.amenities.replace(',', ' '),
+            court.address
+        ])),
+    }
+
+
+def index_court(court):
+    """Rewrite a court's search document and notify the backends"""
+    from .models import CourtSearchDocument
+
+    CourtSearchDocument.objects.update_or_create(
+        court=court, defaults=build_document(court))
+    bump_version()
+
+
+def remove_court(court_id):
+    """Drop a deleted court from this process's index"""
+    get_backend().remove(court_id)
+    bump_version()
+
+
+def search_courts(query, limit=None):
+    """[(court_id, score)] matching every term of the query, best first"""
+    if not tokenize(query):
+        return []
+    return get_backend().search(query, limit)
+
+
+def _version_timeout():
+    if isinstance(caches['default'], LocMemCache):
+        return LOCAL_VERSION_TIMEOUT
+    return None
+
+
+def get_version():
+    """The current version token, starting a new one if there is none"""
+    version = cache.get(VERSION_CACHE_KEY)
+    if version is None:
+        version = uuid.uuid4().hex
+        if not cache.add(VERSION_CACHE_KEY, version, _version_timeout()):
+            version = cache.get(VERSION_CACHE_KEY)
+    return version
+
+
+def bump_version():
+    """Tell every process to resync its index after the transaction commits"""
+    transaction.on_commit(lambda: cache.set(
+        VERSION_CACHE_KEY, uuid.uuid4().hex, _version_timeout()))
+
+
+class BaseSearchBackend:
+    """Interface for court search backends"""
+
+    # Whether annotate_scores() can rank a Court queryset in SQL
+    ranks_in_database = False
+
+    def search(self, query, limit):
+        """[(court_id, score)], best first; limit None returns every match"""
+        raise NotImplementedError
+
+    def annotate_scores(self, queryset, query):
+        """
+        Courts of queryset matching every term of the query, annotated
+        with their search_score, or None to have the caller rank the
+        ids from search() instead
+        """
+        raise NotImplementedError
+
+    def remove(self, court_id):
+        """Forget a court; backends reading the database need do nothing"""
+
+
+class MySQLFullTextBackend(BaseSearchBackend):
+    """
+    InnoDB FULLTEXT search over the search document table, falling back
+    to an in-process InvertedIndexBackend for typos and short terms
+    """
+    ranks_in_database = True
+
+    # The search document table is joined under its own name
+    MATCH_ALL = ('MATCH (court_search_documents.title, '
+                 'court_search_documents.tags, court_search_documents.body) '
+                 'AGAINST (%s IN BOOLEAN MODE)')
+    MATCH_TITLE = ('MATCH (court_search_documents.title) '
+                   'AGAINST (%s IN BOOLEAN MODE)')
+
+    def __init__(self):
+        self.fallback = None
+        self.lock = threading.Lock()
+
+    def terms(self, query):
+        """Query terms long enough to be in the FULLTEXT index"""
+        return [term for term in tokenize(query)
+                if len(term) >= MIN_FULLTEXT_LENGTH]
+
+    def boolean_query(self, query):
+        # Every term is required and may be a prefix: "+ten* +kath*"
+        return ' '.join(f'+{term}*' for term in self.terms(query))
+
+    def get_fallback(self):
+        if self.fallback is None:
+            with self.lock:
+                if self.fallback is None:
+                    self.fallback = InvertedIndexBackend()
+        return self.fallback
+
+    def fallback_search(self, query, limit):
+        """Typo and short-term matches for a query FULLTEXT cannot answer"""
+        terms = self.terms(query)
+        return self.get_fallback().search(
+            ' '.join(terms) if terms else query, limit)
+
+    def has_matches(self, query):
+        from .models import CourtSearchDocument
+
+        boolean_query = self.boolean_query(query)
+        return bool(boolean_query) and CourtSearchDocument.objects.alias(
+            search_match=RawSQL(self.MATCH_ALL, [boolean_query])
+        ).filter(search_match__gt=0).exists()
+
+    def search(self, query, limit):
+        from .models import CourtSearchDocument
+
+        if not self.has_matches(query):
+            return self.fallback_search(query, limit)
+        boolean_query = self.boolean_query(query)
+        score = RawSQL(
+            'MATCH (title, tags, body) AGAINST (%s IN BOOLEAN MODE) + '
+            '2 * MATCH (title) AGAINST (%s IN BOOLEAN MODE)',
+            [boolean_query, boolean_query]
+        )
+        matches = CourtSearchDocument.objects.annotate(
+            score=score
+        ).filter(score__gt=0).order_by('-score', 'court_id')
+        return list(matches.values_list('court_id', 'score')[:limit])
+
+    def annotate_scores(self, queryset, query):
+        if not self.has_matches(query):
+            return None
+        boolean_query = self.boolean_query(query)
+        # A bare MATCH in WHERE lets MySQL drive the query from the
+        # FULLTEXT index; the weighted score only orders the matches
+        return queryset.filter(search_document__isnull=False).annotate(
+            search_match=RawSQL(self.MATCH_ALL, [boolean_query]),
+            search_score=RawSQL(
+                f'{self.MATCH_ALL} + 2 * {self.MATCH_TITLE}',
+                [boolean_query, boolean_query]
+            )
+        ).filter(search_match__gt=0)
+
+    def remove(self, court_id):
+        if self.fallback is not None:
+            self.fallback.remove(court_id)
+
+
+def _deletes(term):
+    """Every variant of a term with one character removed"""
+    return {term[:i] + term[i + 1:] for i in range(len(term))}
+
+
+def _within_one_edit(a, b):
+    """True if a and b differ by one insert, delete, substitution or swap"""
+    if a == b:
+        return True
+    if abs(len(a) - len(b)) > 1:
+        return False
+    if len(a) > len(b):
+        a, b = b, a
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    if len(a) < len(b):
+        return a[i:] == b[i + 1:]
+    if a[i + 1:] == b[i + 1:]:
+        return True
+    return (a[i:i + 2] == b[i:i + 2][::-1] and a[i + 2:] == b[i + 2:])
+
+
+class InvertedIndexBackend(BaseSearchBackend):
+    """
+    In-process inverted index: {term: {court_id: weight}} where weight is
+    the heaviest field the term appears in. A sorted term list serves
+    prefix lookups and a one-delete map serves typo lookups.
+    """
+
+    def __init__(self):
+        self.postings = defaultdict(dict)
+        self.doc_terms = {}
+        self.variants = defaultdict(set)
+        self.sorted_terms = []
+        self.sorted_dirty = False
+        self.version = None
+        self.synced_at = None
+        self.lock = threading.Lock()
+
+    def add(self, court_id, document):
+        self._remove(court_id)
+        weights = {}
+        for field, weight in FIELD_WEIGHTS.items():
+            for term in tokenize(document[field]):
+                if weight > weights.get(term, 0):
+                    weights[term] = weight
+        for term, weight in weights.items():
+            if term not in self.postings:
+                self.sorted_dirty = True
+                if len(term) >= MIN_TYPO_LENGTH:
+                    for variant in _deletes(term) | {term}:
+                        self.variants[variant].add(term)
+            self.postings[term][court_id] = weight
+        self.doc_terms[court_id] = set(weights)
+
+    def remove(self, court_id):
+        with self.lock:
+            self._remove(court_id)
+
+    def _remove(self, court_id):
+        for term in self.doc_terms.pop(court_id, ()):
+            postings = self.postings.get(term)
+            if postings is None:
+                continue
+            postings.pop(court_id, None)
+            if not postings:
+                del self.postings[term]
+                self.sorted_dirty = True
+                for variant in _deletes(term) | {term}:
+                    self.variants[variant].discard(term)
+
+    def refresh(self):
+        """Pick up documents changed since the last sync, if any"""
+        from .models import CourtSearchDocument
+
+        version = get_version()
+        if self.synced_at is not None and version == self.version:
+            return
+
+        with self.lock:
+            if self.synced_at is not None and version == self.version:
+                return
+            documents = CourtSearchDocument.objects.all()
+            if self.synced_at is not None:
+                # Overlap the window a little to absorb clock skew
+                documents = documents.filter(
+                    updated_at__gte=self.synced_at - timedelta(seconds=5))
+            synced_at = timezone.now()
+            for court_id, title, tags, body in documents.values_list(
+                    'court_id', 'title', 'tags', 'body').iterator():
+                self.add(court_id, {'title': title, 'tags': tags, 'body': body})
+            self.synced_at = synced_at
+            self.version = version
+
+    def _expand(self, term):
+        """[(indexed_term, factor)] that a query term matches"""
+        if self.sorted_dirty:
+            self.sorted_terms = sorted(self.postings)
+            self.sorted_dirty = False
+
+        matches = {}
+        index = bisect_left(self.sorted_terms, term)
+        while (index < len(self.sorted_terms) and
+               self.sorted_terms[index].startswith(term)):
+            candidate = self.sorted_terms[index]
+            matches[candidate] = 1.0 if candidate == term else PREFIX_FACTOR
+            index += 1
+
+        if not matches and len(term) >= MIN_TYPO_LENGTH:
+            for variant in _deletes(term) | {term}:
+                for candidate in self.variants.get(variant, ()):
+                    if _within_one_edit(term, candidate):
+                        matches[candidate] = TYPO_FACTOR
+        return matches.items()
+
+    def search(self, query, limit):
+        self.refresh()
+        with self.lock:
+            return self._search(query, limit)
+
+    def _search(self, query, limit):
+        scores = None
+        for term in set(tokenize(query)):
+            term_scores = {}
+            for candidate, factor in self._expand(term):
+                for court_id, weight in self.postings[candidate].items():
+                    score = weight * factor
+                    if score > term_scores.get(court_id, 0):
+                        term_scores[court_id] = score
+            if scores is None:
+                scores = term_scores
+            else:
+                # Every query term has to match
+                scores = {court_id: score + term_scores[court_id]
+                          for court_id, score in scores.items()
+                          if court_id in term_scores}
+            if not scores:
+                return []
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return ranked[:limit]
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """The configured search backend, created once per process"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                path = getattr(settings, 'COURT_SEARCH_BACKEND', 'auto')
+                if path == 'auto':
+                    backend_class = (MySQLFullTextBackend
+                                     if connection.vendor == 'mysql'
+                                     else InvertedIndexBackend)
+                else:
+                    backend_class = import_string(path)
+                _backend = backend_class()
+    return _backend
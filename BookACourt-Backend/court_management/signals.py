@@ -1,50 +1,216 @@
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import (
+    post_save, post_delete, pre_save, pre_delete, m2m_changed
+)
 from django.dispatch import receiver
-from django.db.models import Avg, Count
-from .models import CourtReview
+from .models import (
+    Court, CourtCategory, CourtReview, CourtBlockedSlot, DynamicPricing
+)
+from .access import invalidate_managed_courts
+from .occupancy import invalidate_day_occupancy
+from .pricing import invalidate_price_table
+from .ratings import (
+    apply_rating_delta, contribution, review_state, update_review_summary
+)
+from .geo import invalidate_index
+from .search import INDEXED_FIELDS, index_court, remove_court
+
+# Court fields the nearest-courts grid is built from
+GEO_INDEX_FIELDS = {'latitude', 'longitude', 'is_active'}
+
+
+# Review fields that feed the court's rating and review summary
+REVIEW_STAT_FIELDS = {'rating', 'is_visible', 'owner_response'}
+
+
+@receiver(pre_save, sender=CourtReview)
+def remember_review_state(sender, instance, update_fields=None, **kwargs):
+    """
+    Note what the review counted for before this save
+    """
+    instance._previous_state = None
+    if instance.pk is None:
+        return
+    if update_fields is not None and not REVIEW_STAT_FIELDS & set(update_fields):
+        instance._previous_state = False
+        return
+    previous = CourtReview.objects.filter(pk=instance.pk).values_list(
+        'rating', 'is_visible', 'owner_response', 'created_at').first()
+    if previous:
+        instance._previous_state = review_state(*previous)
 
 
 @receiver(post_save, sender=CourtReview)
 def update_court_rating_on_save(sender, instance, created, **kwargs):
     """
-    Automatically update court rating when a review is created or updated
+    Apply the change in the review's visible rating and summary to its court
     """
-    court = instance.court
+    previous = getattr(instance, '_previous_state', None)
+    if previous is False:
+        # None of the counted fields were saved
+        return
+    current = review_state(
+        instance.rating, instance.is_visible,
+        instance.owner_response, instance.created_at)
 
-    # Only recalculate if the review is visible
-    if instance.is_visible:
-        reviews = CourtReview.objects.filter(
-            court=court,
-            is_visible=True
-        )
+    old_sum, old_count = (previous[0], 1) if previous else (0, 0)
+    new_sum, new_count = (current[0], 1) if current else (0, 0)
+    apply_rating_delta(
+        instance.court_id, new_sum - old_sum, new_count - old_count)
+    update_review_summary(instance.court_id, previous, current)
 
-        # Calculate average rating
-        avg_rating = reviews.aggregate(Avg('rating'))['rating__avg']
-        court.average_rating = round(avg_rating, 2) if avg_rating else 0.00
 
-        # Update total reviews count
-        court.total_reviews = reviews.count()
+@receiver(post_delete, sender=CourtReview)
+def update_court_rating_on_delete(sender, instance, **kwargs):
+    """
+    Take a deleted review off its court's rating and summary
+    """
+    rating_sum, count = contribution(instance.rating, instance.is_visible)
+    apply_rating_delta(instance.court_id, -rating_sum, -count)
+    update_review_summary(instance.court_id, review_state(
+        instance.rating, instance.is_visible,
+        instance.owner_response, instance.created_at), None)
 
-        court.save(update_fields=['average_rating', 'total_reviews'])
+
+@receiver(post_save, sender=CourtBlockedSlot)
+def update_occupancy_on_blocked_slot_save(sender, instance, created, **kwargs):
+    """
+    Keep the court's occupancy bitmap in sync with blocked slots
+    """
+    invalidate_day_occupancy(instance.court_id, instance.blocked_date)
 
 
-@receiver(post_delete, sender=CourtReview)
-def update_court_rating_on_delete(sender, instance, **kwargs):
+@receiver(post_delete, sender=CourtBlockedSlot)
+def update_occupancy_on_blocked_slot_delete(sender, instance, **kwargs):
     """
-    Automatically update court rating when a review is deleted
+    Free the blocked bits by rebuilding the day on next read
     """
-    court = instance.court
+    invalidate_day_occupancy(instance.court_id, instance.blocked_date)
+
+
+@receiver(post_save, sender=DynamicPricing)
+@receiver(post_delete, sender=DynamicPricing)
+def invalidate_price_table_on_rule_change(sender, instance, **kwargs):
+    """
+    Recompile the court's price table when one of its rules changes
+    """
+    invalidate_price_table(instance.court_id)
+
+
+@receiver(post_save, sender=Court)
+def invalidate_price_table_on_court_save(sender, instance, update_fields=None, **kwargs):
+    """
+    The base hourly rate is baked into the compiled price table
+    """
+    if update_fields is None or 'base_hourly_rate' in update_fields:
+        invalidate_price_table(instance.id)
+
+
+@receiver(post_save, sender=Court)
+def invalidate_geo_index_on_court_save(sender, instance, update_fields=None, **kwargs):
+    """
+    Rebuild the nearest-courts grid when a court moves or is (de)activated
+    """
+    if update_fields is None or GEO_INDEX_FIELDS & set(update_fields):
+        invalidate_index()
+
+
+@receiver(post_delete, sender=Court)
+def invalidate_geo_index_on_court_delete(sender, instance, **kwargs):
+    """
+    Drop deleted courts from the nearest-courts grid
+    """
+    invalidate_index()
 
-    reviews = CourtReview.objects.filter(
-        court=court,
-        is_visible=True
-    )
 
-    # Calculate average rating
-    avg_rating = reviews.aggregate(Avg('rating'))['rating__avg']
-    court.average_rating = round(avg_rating, 2) if avg_rating else 0.00
+@receiver(post_save, sender=Court)
+def reindex_court_on_save(sender, instance, update_fields=None, **kwargs):
+    """
+    Rewrite the court's search document when searchable fields change
+    """
+    if update_fields is None or INDEXED_FIELDS & set(update_fields):
+        index_court(instance)
+
 
-    # Update total reviews count
-    court.total_reviews = reviews.count()
+@receiver(post_delete, sender=Court)
+def remove_court_from_search(sender, instance, **kwargs):
+    """
+    Forget a deleted court in this process's search index
+    """
+    remove_court(instance.id)
+
+
+@receiver(post_save, sender=CourtCategory)
+def reindex_courts_on_category_save(sender, instance, created, **kwargs):
+    """
+    Category names are part of each court's search document
+    """
+    if not created:
+        for court in instance.courts.select_related('category'):
+            index_court(court)
+
+
+@receiver(post_save, sender=Court)
+def invalidate_category_counts_on_court_save(sender, instance, update_fields=None, **kwargs):
+    """
+    Category court counts only change with a court's status or category
+    """
+    if update_fields is None or {'is_active', 'category'} & set(update_fields):
+        CourtCategory.invalidate_court_counts()
+
+
+@receiver(post_delete, sender=Court)
+def invalidate_category_counts_on_court_delete(sender, instance, **kwargs):
+    """
+    Deleted courts no longer count towards their category
+    """
+    CourtCategory.invalidate_court_counts()
 
-    court.save(update_fields=['average_rating', 'total_reviews'])
+
+@receiver(pre_save, sender=Court)
+def invalidate_managed_courts_on_owner_change(sender, instance, update_fields=None, **kwargs):
+    """
+    A court changing hands leaves the old owner's cached courts stale
+    """
+    if instance.pk is None:
+        return
+    if update_fields is None or 'owner' in update_fields:
+        previous = Court.objects.filter(
+            pk=instance.pk).values_list('owner_id', flat=True).first()
+        if previous is not None and previous != instance.owner_id:
+            invalidate_managed_courts(previous, instance.owner_id)
+
+
+@receiver(post_save, sender=Court)
+def invalidate_managed_courts_on_court_create(sender, instance, created, **kwargs):
+    """
+    New courts belong to their owner straight away
+    """
+    if created:
+        invalidate_managed_courts(instance.owner_id)
+
+
+@receiver(pre_delete, sender=Court)
+def invalidate_managed_courts_on_court_delete(sender, instance, **kwargs):
+    """
+    Manager rows go with the court without an m2m_changed signal
+    """
+    invalidate_managed_courts(
+        instance.owner_id,
+        *instance.managers.values_list('id', flat=True)
+    )
+
+
+@receiver(m2m_changed, sender=Court.managers.through)
+def invalidate_managed_courts_on_managers_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Managers added or removed from a court, by either side of the relation
+    """
+    if reverse:
+        # instance is the user
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            invalidate_managed_courts(instance.pk)
+    elif action in ('post_add', 'post_remove'):
+        invalidate_managed_courts(*pk_set)
+    elif action == 'pre_clear':
+        invalidate_managed_courts(
+            *instance.managers.values_list('id', flat=True))
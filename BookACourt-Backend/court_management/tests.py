@@ -1,3 +1,474 @@
-from django.test import TestCase
+from datetime import time, timedelta
+from decimal import Decimal
+from io import StringIO
+import time as clock
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from BookACourt.testing import (
+    future_date, make_booking, make_court, make_owner, make_player
+)
+from court_management import geo, search
+from court_management.access import managed_court_ids
+from court_management.admin import CourtAdmin
+from court_management.models import (
+    Court, CourtBlockedSlot, CourtCategory, CourtReview, CourtSearchDocument,
+    DynamicPricing
+)
+from court_management.occupancy import (
+    _build_masks, _cache_key, get_day_occupancy, interval_mask
+)
+from court_management.pricing import PriceTable, quote_price
+from court_management.ratings import (
+    _month_start, rebuild_review_summaries, recent_months
+)
+from user_management.models import User
+
+
+class OccupancyCacheTests(TestCase):
+    """Cached occupancy never outlives the rows it was built from"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.player = make_player()
+        cls.court = make_court(make_owner())
+        cls.date = future_date()
+
+    def setUp(self):
+        cache.clear()
+
+    def book(self, start, end):
+        with self.captureOnCommitCallbacks(execute=True):
+            return make_booking(
+                self.court, self.player, self.date, start, end)
+
+    def test_changes_are_seen_on_next_read(self):
+        self.assertTrue(get_day_occupancy(self.court.id, self.date).is_free(
+            time(10), time(11)))
+
+        booking = self.book(time(10), time(11))
+        self.assertFalse(get_day_occupancy(self.court.id, self.date).is_free(
+            time(10), time(11)))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            CourtBlockedSlot.objects.create(
+                court=self.court,
+                blocked_date=self.date,
+                start_time=time(12),
+                end_time=time(13)
+            )
+        self.assertEqual(get_day_occupancy(self.court.id, self.date).conflict(
+            time(12), time(13)), 'blocked')
+
+        booking.status = 'CANCELLED'
+        with self.captureOnCommitCallbacks(execute=True):
+            booking.save()
+        self.assertTrue(get_day_occupancy(self.court.id, self.date).is_free(
+            time(10), time(11)))
+
+    def test_whole_slot_masks(self):
+        self.assertEqual(interval_mask(time(10, 5), time(11)), 0b1111 << 40)
+        self.assertEqual(
+            interval_mask(time(10, 5), time(11), whole_slots=True),
+            0b111 << 41)
+        self.assertEqual(
+            interval_mask(time(10, 5), time(10, 10), whole_slots=True), 0)
+        # Seconds never move a start into the next slot
+        self.assertEqual(
+            interval_mask(time(10, 14, 30), time(10, 15)), 1 << 40)
+        self.assertEqual(
+            interval_mask(time(23), time(0), whole_slots=True), 0b1111 << 92)
+
+    def test_late_rebuild_does_not_hide_a_booking(self):
+        # A rebuild reads its version and the empty day, then a booking
+        # commits before the rebuild writes its result
+        key = _cache_key(self.court.id, self.date)
+        self.book(time(10), time(11))
+        cache.set(key, tuple(_build_masks([], [])))
+
+        occupancy = get_day_occupancy(self.court.id, self.date)
+        self.assertEqual(occupancy.booked, interval_mask(time(10), time(11)))
+
+
+class RatingDeltaTests(TestCase):
+    """Review signals keep the court rating equal to a full recount"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.court = make_court(make_owner())
+
+    def review(self, index, rating):
+        return CourtReview.objects.create(
+            court=self.court, player=make_player(index), rating=rating)
+
+    def assertRating(self, rating_sum, count, average):
+        self.court.refresh_from_db()
+        self.assertEqual(
+            (self.court.rating_sum, self.court.total_reviews,
+             self.court.average_rating),
+            (rating_sum, count, Decimal(average))
+        )
+
+    def test_create_rounds_half_up(self):
+        # 33 / 8 = 4.125, which a DOUBLE ROUND() on MySQL stores as 4.12
+        for index, rating in enumerate([5, 5, 5, 5, 5, 4, 2, 2]):
+            self.review(index, rating)
+        self.assertRating(33, 8, '4.13')
+
+    def test_edit(self):
+        self.review(0, 5)
+        review = self.review(1, 2)
+        self.assertRating(7, 2, '3.50')
+
+        review.rating = 3
+        review.save()
+        self.assertRating(8, 2, '4.00')
+
+    def test_visibility_toggle(self):
+        self.review(0, 5)
+        review = self.review(1, 4)
+        self.review(2, 4)
+
+        review.is_visible = False
+        review.save(update_fields=['is_visible'])
+        self.assertRating(9, 2, '4.50')
+
+        review.is_visible = True
+        review.save(update_fields=['is_visible'])
+        self.assertRating(13, 3, '4.33')
+
+    def test_delete(self):
+        first = self.review(0, 5)
+        second = self.review(1, 2)
+
+        second.delete()
+        self.assertRating(5, 1, '5.00')
+        first.delete()
+        self.assertRating(0, 0, '0.00')
+
+
+class ReviewSummaryRebuildTests(TestCase):
+    """Rebuilt monthly buckets follow local month boundaries"""
+
+    def test_monthly_buckets(self):
+        court = make_court(make_owner())
+        this_month, last_month, oldest = recent_months()
+        minute = timedelta(minutes=1)
+        for index, (rating, created_at) in enumerate([
+            (5, _month_start(this_month) + minute),
+            (3, _month_start(this_month) - minute),
+            (4, _month_start(last_month)),
+            (2, _month_start(oldest) - minute),
+        ]):
+            review = CourtReview.objects.create(
+                court=court, player=make_player(index), rating=rating)
+            CourtReview.objects.filter(pk=review.pk).update(
+                created_at=created_at)
+
+        rebuild_review_summaries([court.id])
+        court.review_summary.refresh_from_db()
+        self.assertEqual(court.review_summary.monthly, {
+            this_month: [5, 1],
+            last_month: [7, 2],
+        })
+        self.assertEqual(court.review_summary.total_reviews, 4)
+
+
+class RecalculateCommandTests(TransactionTestCase):
+    """recalculate repairs drifted ratings, shard by shard"""
+
+    def setUp(self):
+        owner = make_owner()
+        players = [make_player(index) for index in range(2)]
+        # Worker threads read on their own connections, so nothing here
+        # may sit in an open test transaction
+        self.courts = [
+            make_court(owner, name=f'Court {index}') for index in range(6)
+        ]
+        for court in self.courts:
+            for player, rating in zip(players, [5, 2]):
+                CourtReview.objects.create(
+                    court=court, player=player, rating=rating)
+        Court.objects.update(
+            rating_sum=0, total_reviews=0, average_rating=0)
+
+    def recalculate(self, *args):
+        out = StringIO()
+        call_command('recalculate', *args, stdout=out)
+        return out.getvalue()
+
+    def ratings(self):
+        return list(Court.objects.order_by('id').values_list(
+            'rating_sum', 'total_reviews', 'average_rating'))
+
+    def test_dry_run_reports_without_writing(self):
+        output = self.recalculate('--dry-run', '--shards', '2')
+
+        self.assertIn('Would update 6 of 6 court(s)', output)
+        self.assertIn(
+            f'Court 0 (#{self.courts[0].id}): 0.00 (0 reviews) -> '
+            f'3.50 (2 reviews)', output)
+        self.assertEqual(self.ratings(), [(0, 0, Decimal('0.00'))] * 6)
+
+    def test_shards_cover_every_court(self):
+        output = self.recalculate('--shards', '4', '--batch-size', '2')
+
+        self.assertIn('across 4 shard(s)', output)
+        self.assertIn('Updated 6 of 6 court(s)', output)
+        self.assertEqual(self.ratings(), [(7, 2, Decimal('3.50'))] * 6)
+        self.assertEqual(self.recalculate('--shards', '4').count('->'), 0)
+        self.assertIn('Updated 0 of 6', self.recalculate())
+
+    def test_single_shard_only_touches_its_range(self):
+        # Six ids in three shards of two: shard 1 is the middle pair
+        output = self.recalculate('--shards', '3', '--shard', '1')
+
+        self.assertIn('Updated 2 of 2 court(s)', output)
+        self.assertEqual(self.ratings(), [
+            (0, 0, Decimal('0.00')),
+            (0, 0, Decimal('0.00')),
+            (7, 2, Decimal('3.50')),
+            (7, 2, Decimal('3.50')),
+            (0, 0, Decimal('0.00')),
+            (0, 0, Decimal('0.00')),
+        ])
+
+    def test_rejects_bad_shards(self):
+        with self.assertRaisesMessage(CommandError, 'at least 1'):
+            self.recalculate('--shards', '0')
+        with self.assertRaisesMessage(CommandError, 'between 0 and 2'):
+            self.recalculate('--shards', '3', '--shard', '3')
+
+
+class LocalVersionExpiryTests(TestCase):
+    """Per-process indexes catch up with other workers under LocMem"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.court = make_court(
+            make_owner(), name='Lakeside', latitude=27.7, longitude=85.3)
+
+    def setUp(self):
+        cache.clear()
+
+    def later(self, seconds):
+        # LocMem expires entries by time.time()
+        now = clock.time()
+        return mock.patch('time.time', return_value=now + seconds)
+
+    def test_geo_index_rebuilds_after_expiry(self):
+        self.assertEqual(len(geo.get_index().nearby(27.7, 85.3, 1)), 1)
+
+        # Moved by another worker whose version bump this cache never sees
+        Court.objects.filter(pk=self.court.pk).update(latitude=28.7)
+        self.assertEqual(len(geo.get_index().nearby(27.7, 85.3, 1)), 1)
+
+        with self.later(geo.LOCAL_VERSION_TIMEOUT + 1):
+            self.assertEqual(geo.get_index().nearby(27.7, 85.3, 1), [])
+
+    def test_search_index_resyncs_after_expiry(self):
+        backend = search.InvertedIndexBackend()
+        self.assertEqual(len(backend.search('lakeside', None)), 1)
+
+        CourtSearchDocument.objects.filter(court=self.court).update(
+            title='Riverside', updated_at=timezone.now())
+        self.assertEqual(backend.search('riverside', None), [])
+
+        with self.later(search.LOCAL_VERSION_TIMEOUT + 1):
+            self.assertEqual(len(backend.search('riverside', None)), 1)
+
+
+class CategoryCourtCountTests(TestCase):
+    """Cached category court counts follow court changes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tennis = CourtCategory.objects.create(name='Tennis')
+        cls.futsal = CourtCategory.objects.create(name='Futsal')
+        owner = make_owner()
+        cls.courts = [
+            make_court(owner, name=f'Court {index}', category=cls.tennis)
+            for index in range(2)
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def counts(self):
+        return CourtCategory.active_court_counts()
+
+    def run_action(self, action):
+        admin = CourtAdmin(Court, None)
+        with mock.patch.object(admin, 'message_user'), \
+                self.captureOnCommitCallbacks(execute=True):
+            getattr(admin, action)(None, Court.objects.filter(
+                pk=self.courts[0].pk))
+
+    def test_admin_actions(self):
+        self.assertEqual(self.counts(), {self.tennis.id: 2})
+        self.run_action('deactivate_courts')
+        self.assertEqual(self.counts(), {self.tennis.id: 1})
+        self.run_action('activate_courts')
+        self.assertEqual(self.counts(), {self.tennis.id: 2})
+
+    def test_court_save(self):
+        self.assertEqual(self.counts(), {self.tennis.id: 2})
+        court = self.courts[1]
+        court.category = self.futsal
+        with self.captureOnCommitCallbacks(execute=True):
+            court.save()
+        self.assertEqual(
+            self.counts(), {self.tennis.id: 1, self.futsal.id: 1})
+
+    def test_local_cache_expires(self):
+        self.assertEqual(self.counts(), {self.tennis.id: 2})
+        # Changed without a signal, as another worker's change looks here
+        Court.objects.filter(pk=self.courts[0].pk).update(is_active=False)
+        self.assertEqual(self.counts(), {self.tennis.id: 2})
+
+        now = clock.time()
+        timeout = CourtCategory.LOCAL_COURT_COUNTS_TIMEOUT
+        with mock.patch('time.time', return_value=now + timeout + 1):
+            self.assertEqual(self.counts(), {self.tennis.id: 1})
+
+
+EVERY_DAY = '0,1,2,3,4,5,6'
+
+
+class PriceTableTests(SimpleTestCase):
+    """Compiled prices in rupees, minute by minute"""
+
+    def price(self, rules, start, end, weekday=0):
+        table = PriceTable.compile(100, [
+            (rule_start, rule_end, EVERY_DAY, rate)
+            for rule_start, rule_end, rate in rules
+        ])
+        return table.price(weekday, start, end)
+
+    def test_overlapping_rules_charge_the_highest_rate(self):
+        rules = [(time(17), time(20), 300), (time(18), time(19), 400),
+                 (time(18), time(21), 250)]
+        # 300 + 400 + 300 + 250
+        self.assertEqual(
+            self.price(rules, time(17), time(21)), Decimal('1250.00'))
+        self.assertEqual(
+            self.price(rules, time(18, 30), time(19, 30)), Decimal('350.00'))
+
+    def test_rule_ending_at_midnight(self):
+        rules = [(time(22), time(0), 200)]
+        self.assertEqual(self.price(rules, time(22), time(0)), Decimal('400.00'))
+        self.assertEqual(self.price(rules, time(21), time(0)), Decimal('500.00'))
+        self.assertEqual(
+            self.price(rules, time(23, 30), time(0)), Decimal('100.00'))
+
+    def test_booking_spanning_two_windows(self):
+        rules = [(time(6), time(9), 150), (time(9), time(12), 250)]
+        # 30 minutes at 150 and 30 at 250
+        self.assertEqual(
+            self.price(rules, time(8, 30), time(9, 30)), Decimal('200.00'))
+        # 30 minutes at the base rate, then 30 at 150
+        self.assertEqual(
+            self.price(rules, time(5, 30), time(6, 30)), Decimal('125.00'))
+        # Forty minutes at 100 an hour
+        self.assertEqual(
+            self.price(rules, time(12, 10), time(12, 50)), Decimal('66.67'))
+
+    def test_rules_apply_on_their_days_only(self):
+        table = PriceTable.compile(
+            100, [(time(10), time(11), '5,6', 500)])
+        self.assertEqual(table.price(4, time(10), time(11)), Decimal('100.00'))
+        self.assertEqual(table.price(5, time(10), time(11)), Decimal('500.00'))
+
+
+class PriceTableCacheTests(TestCase):
+    """Cached price tables follow the court's pricing rules"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.court = make_court(make_owner())
+        cls.date = future_date()
+
+    def setUp(self):
+        cache.clear()
+
+    def quote(self):
+        return quote_price(self.court, self.date, time(18), time(20))
+
+    def add_rule(self, **fields):
+        with self.captureOnCommitCallbacks(execute=True):
+            return DynamicPricing.objects.create(
+                court=self.court, days_of_week=EVERY_DAY, **fields)
+
+    def test_inactive_rules_are_ignored(self):
+        self.add_rule(start_time=time(18), end_time=time(20),
+                      hourly_rate=300, is_active=False)
+        self.assertEqual(self.quote(), Decimal('200.00'))
+
+    def test_saving_and_deleting_a_rule_invalidates(self):
+        self.assertEqual(self.quote(), Decimal('200.00'))
+
+        rule = self.add_rule(
+            start_time=time(19), end_time=time(20), hourly_rate=300)
+        self.assertEqual(self.quote(), Decimal('400.00'))
+
+        rule.hourly_rate = 250
+        with self.captureOnCommitCallbacks(execute=True):
+            rule.save()
+        self.assertEqual(self.quote(), Decimal('350.00'))
+
+        rule.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            rule.save()
+        self.assertEqual(self.quote(), Decimal('200.00'))
+
+        rule.is_active = True
+        with self.captureOnCommitCallbacks(execute=True):
+            rule.save()
+        self.assertEqual(self.quote(), Decimal('350.00'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            rule.delete()
+        self.assertEqual(self.quote(), Decimal('200.00'))
+
+
+class ManagedCourtLookupTests(TestCase):
+    """can_manage_court costs one lookup per request, then none"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = make_owner()
+        cls.courts = [make_court(cls.owner, name=f'Court {index}')
+                      for index in range(3)]
+        other = make_court(make_owner(phone_number='+9779800000009'))
+        cls.other_id = other.pk
+        cls.player = make_player()
+
+    def setUp(self):
+        cache.clear()
+
+    def test_checks_share_one_lookup(self):
+        owner = User.objects.get(pk=self.owner.pk)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertTrue(all(
+                owner.can_manage_court(court) for court in self.courts))
+            self.assertFalse(owner.can_manage_court(self.other_id))
+        # Owned and managed court ids
+        self.assertEqual(len(queries), 2)
+
+        # The next request's user instance reads the cache
+        owner = User.objects.get(pk=self.owner.pk)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertTrue(owner.can_manage_court(self.courts[0].pk))
+        self.assertEqual(len(queries), 0)
+
+    def test_players_need_no_lookup(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertFalse(self.player.can_manage_court(self.courts[0]))
+            self.assertEqual(managed_court_ids(self.player), frozenset())
+        self.assertEqual(len(queries), 0)
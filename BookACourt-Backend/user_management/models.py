@@ -137,13 +137,12 @@ class User(AbstractBaseUser, PermissionsMixin):
         return self.role == UserRole.PLAYER
 
     def can_manage_court(self, court):
-        """Check if user can manage a specific court"""
+        """Check if user can manage a specific court (a Court or its id)"""
         if self.is_super_user:
             return True
-        if self.is_court_owner:
-            return court.owner == self
-        if self.is_court_manager:
-            return court.managers.filter(id=self.id).exists()
+        if self.is_court_owner or self.is_court_manager:
+            from court_management.access import managed_court_ids
+            return getattr(court, 'pk', court) in managed_court_ids(self)
         return False
 
 